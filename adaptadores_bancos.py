@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 ADAPTADORES DE BANCOS
+Registo de adaptadores (um por banco) que leem uma exportação numa só
+passagem, e escrita das transações em partições data/raw/<mes>_<ano>/ (e listagem
+dessas partições)
+"""
+
+import codecs
+import csv
+import itertools
+import os
+import re
+import shutil
+from pathlib import Path
+
+from conversao_vetorizada import converter_datas, converter_montantes
+
+CAMPOS_SAIDA = ['Date', 'Bank', 'Description', 'Valor', 'Debit', 'Credit', 'Categoria', 'Confianca', 'Observacao']
+NOMES_MESES = ['janeiro', 'fevereiro', 'marco', 'abril', 'maio', 'junho',
+               'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
+MESES = {**{nome: numero for numero, nome in enumerate(NOMES_MESES, 1)}, 'março': 3}
+BYTES_DETECAO = 4096
+LINHAS_MAX_CABECALHO = 200
+LINHAS_POR_LOTE = 10000
+
+ADAPTADORES = {}
+
+
+def registar_adaptador(chave, banco_nome):
+    """Regista um gerador `ler(input_file, banco_nome)` que produz transações.
+
+    `chave` é o nome curto usado nas partições (ex.: 'millennium' ->
+    millennium_novembro_2025.csv) e na linha de comandos.
+    """
+    def decorador(funcao):
+        ADAPTADORES[chave] = (banco_nome, funcao)
+        return funcao
+    return decorador
+
+
+def ler_exportacao(chave, input_file):
+    banco_nome, funcao = ADAPTADORES[chave]
+    return funcao(input_file, banco_nome)
+
+
+def _transacao(data, banco_nome, descricao, montante):
+    if montante > 0:
+        debit = 0.0
+        credit = montante
+        valor = montante
+    else:
+        debit = abs(montante)
+        credit = 0.0
+        valor = abs(montante)
+
+    return {
+        'Date': data,
+        'Bank': banco_nome,
+        'Description': descricao,
+        'Valor': valor,
+        'Debit': debit,
+        'Credit': credit,
+        'Categoria': '',
+        'Confianca': 0.0,
+        'Observacao': ''
+    }
+
+
+def _transacoes(campos, banco_nome, formato_data, ate_espaco=False):
+    """Converte tuplos (data, descrição, montante) em transações.
+
+    Datas e montantes são convertidos em bloco (conversao_vetorizada), em
+    lotes de LINHAS_POR_LOTE; as linhas com data ou montante inválidos
+    são ignoradas.
+    """
+    while True:
+        lote = list(itertools.islice(campos, LINHAS_POR_LOTE))
+        if not lote:
+            return
+
+        datas, descricoes, montantes = zip(*lote)
+        datas, datas_rejeitadas = converter_datas(datas, formato_data, ate_espaco)
+        montantes, montantes_rejeitados = converter_montantes(montantes)
+        validas = ~(datas_rejeitadas | montantes_rejeitados)
+
+        for data, descricao, montante in zip(
+            datas[validas].astype(str).tolist(),
+            itertools.compress(descricoes, validas.tolist()),
+            montantes[validas].tolist()
+        ):
+            yield _transacao(data, banco_nome, descricao, montante)
+
+
+def detetar_codificacao(input_file):
+    """Codificação da exportação a partir do BOM e dos primeiros KB (uma só leitura)"""
+    with open(input_file, 'rb') as f:
+        amostra = f.read(BYTES_DETECAO)
+
+    if amostra.startswith(codecs.BOM_UTF16_LE) or amostra.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16'
+    if amostra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+
+    if amostra.count(0) > len(amostra) // 4:
+        pares = amostra[0::2].count(0)
+        impares = amostra[1::2].count(0)
+        return 'utf-16-le' if impares >= pares else 'utf-16-be'
+
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def _e_cabecalho(linha):
+    return 'Data lançamento' in linha and 'Data valor' in linha
+
+
+def _e_cabecalho_parcial(linha):
+    return 'Data lançamento' in linha or 'Data de lançamento' in linha
+
+
+def linhas_millennium(f):
+    """Gera as linhas (dict) da exportação a partir do cabeçalho.
+
+    Lê o preâmbulo linha a linha até ao cabeçalho completo ('Data lançamento'
+    e 'Data valor'); se só houver um cabeçalho parcial, usa o primeiro
+    encontrado. Só as linhas desde o cabeçalho parcial ficam em memória, e no
+    máximo LINHAS_MAX_CABECALHO. Devolve None se não houver cabeçalho.
+    """
+    pendentes = []
+    for linha in f:
+        if _e_cabecalho(linha):
+            pendentes = [linha]
+            break
+        if pendentes:
+            pendentes.append(linha)
+            if len(pendentes) >= LINHAS_MAX_CABECALHO:
+                break
+        elif _e_cabecalho_parcial(linha):
+            pendentes = [linha]
+    else:
+        if not pendentes:
+            return None
+
+    return csv.DictReader(itertools.chain(pendentes, f), delimiter=';')
+
+
+def _campos_millennium(rows):
+    for row in rows:
+        if row is None or not row:
+            continue
+
+        data_lanc = (row.get('Data lançamento') or '').strip()
+        descricao = (row.get('Descrição') or '').strip()
+        montante_str = (row.get('Montante') or '').strip()
+
+        if data_lanc and descricao and montante_str:
+            yield data_lanc, descricao, montante_str
+
+
+@registar_adaptador('millennium', 'Millennium')
+def ler_millennium(input_file, banco_nome='Millennium'):
+    """Exportação Millennium (UTF-16 ou outra, ';', montantes portugueses)"""
+    codificacao = detetar_codificacao(input_file)
+    with open(input_file, 'r', encoding=codificacao, errors='replace', newline='') as f:
+        rows = linhas_millennium(f)
+        if rows is None:
+            raise ValueError('Cabeçalho não encontrado')
+
+        yield from _transacoes(_campos_millennium(rows), banco_nome, '%d-%m-%Y')
+
+
+def _campos_revolut(rows):
+    for row in rows:
+        data_inicio = (row.get('Data de início') or '').strip()
+        descricao = (row.get('Descrição') or '').strip()
+        montante_str = (row.get('Montante') or '').strip()
+
+        if data_inicio and descricao and montante_str:
+            yield data_inicio, descricao, montante_str
+
+
+@registar_adaptador('revolut', 'Revolut')
+def ler_revolut(input_file, banco_nome='Revolut'):
+    """Extrato Revolut (UTF-8, ',', 'Data de início' com hora)"""
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
+        yield from _transacoes(_campos_revolut(csv.DictReader(f)), banco_nome, '%Y-%m-%d', ate_espaco=True)
+
+
+def caminho_particao(raiz, chave, ano, mes):
+    nome_mes = NOMES_MESES[mes - 1]
+    return os.path.join(raiz, f'{nome_mes}_{ano}', f'{chave}_{nome_mes}_{ano}.csv')
+
+
+def descobrir_particoes(raiz='data/raw'):
+    """Encontra data/raw/<mes>_<ano>/<banco>_<mes>_<ano>.csv, por ordem cronológica"""
+    particoes = []
+    for pasta in Path(raiz).iterdir():
+        m = re.fullmatch(r'([a-zç]+)_(\d{4})', pasta.name)
+        if not pasta.is_dir() or not m or m.group(1) not in MESES:
+            continue
+        mes, ano = m.group(1), int(m.group(2))
+        for ficheiro in pasta.glob(f'*_{mes}_{ano}.csv'):
+            banco = ficheiro.name[:-len(f'_{mes}_{ano}.csv')]
+            if not re.fullmatch(r'[a-z0-9]+', banco):
+                continue
+            particoes.append(((ano, MESES[mes], banco), str(ficheiro), f"{banco.capitalize()} {mes.capitalize()} {ano}"))
+
+    return [(caminho, nome) for _, caminho, nome in sorted(particoes)]
+
+
+class EscritorParticoes:
+    """Escreve transações em data/raw/<mes>_<ano>/<banco>_<mes>_<ano>.csv.
+
+    As transações de cada exportação vão, com buffer, para um temporário por
+    partição (<partição>.<n>.tmp), aberto na primeira transação que lhe
+    pertence. No fim de cada exportação, concluir() guarda os temporários e
+    descartar() apaga-os (exportação inválida a meio). Só fechar() reescreve
+    as partições com exportações concluídas (<partição>.tmp + os.replace):
+    várias exportações do mesmo banco numa execução acumulam na mesma
+    partição e uma partição sem exportações concluídas fica como estava.
+    `retidas(chave, ano, mes)`, se dada, devolve as transações a manter no
+    início de uma partição reescrita (as de exportações ingeridas noutras
+    execuções).
+    """
+
+    def __init__(self, raiz='data/raw', buffer=1 << 20, retidas=None):
+        self.raiz = raiz
+        self.buffer = buffer
+        self.retidas = retidas
+        self.contagens = {}
+        self.particoes = {}
+        self._abertos = {}
+        self._concluidos = {}
+        self._exportacao = 0
+
+    def escrever(self, chave, transacao):
+        particao = (chave, transacao['Date'][:7])
+        aberto = self._abertos.get(particao)
+        if aberto is None:
+            ano, mes = int(particao[1][:4]), int(particao[1][5:7])
+            caminho = caminho_particao(self.raiz, chave, ano, mes)
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            temporario = f'{caminho}.{self._exportacao}.tmp'
+            f = open(temporario, 'w', newline='', encoding='utf-8', buffering=self.buffer)
+            aberto = self._abertos[particao] = [temporario, f, csv.DictWriter(f, fieldnames=CAMPOS_SAIDA), 0]
+
+        aberto[2].writerow(transacao)
+        aberto[3] += 1
+
+    def _fechar_abertos(self):
+        abertos, self._abertos = self._abertos, {}
+        self._exportacao += 1
+        for _, f, _, _ in abertos.values():
+            f.close()
+        return abertos
+
+    def concluir(self):
+        """Guarda as transações da exportação atual para a reescrita das partições"""
+        for particao, (temporario, _, _, total) in self._fechar_abertos().items():
+            self._concluidos.setdefault(particao, []).append((temporario, total))
+
+    def descartar(self):
+        """Apaga as transações da exportação atual (as partições não lhes tocam)"""
+        for temporario, _, _, _ in self._fechar_abertos().values():
+            os.remove(temporario)
+
+    def fechar(self):
+        """Conclui a exportação atual e reescreve as partições que receberam transações"""
+        self.concluir()
+        concluidos, self._concluidos = self._concluidos, {}
+        for (chave, ano_mes), temporarios in concluidos.items():
+            ano, mes = int(ano_mes[:4]), int(ano_mes[5:7])
+            caminho = caminho_particao(self.raiz, chave, ano, mes)
+            total = 0
+            with open(f'{caminho}.tmp', 'w', newline='', encoding='utf-8', buffering=self.buffer) as f:
+                writer = csv.DictWriter(f, fieldnames=CAMPOS_SAIDA)
+                writer.writeheader()
+                if self.retidas is not None:
+                    for retida in self.retidas(chave, ano, mes):
+                        writer.writerow(retida)
+                        total += 1
+                for temporario, linhas in temporarios:
+                    with open(temporario, 'r', newline='', encoding='utf-8') as origem:
+                        shutil.copyfileobj(origem, f)
+                    total += linhas
+            os.replace(f'{caminho}.tmp', caminho)
+            for temporario, _ in temporarios:
+                os.remove(temporario)
+            self.contagens[caminho] = total
+            self.particoes.setdefault(chave, []).append(caminho)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *_):
+        if tipo is None:
+            self.fechar()
+            return
+        # Erro inesperado: nenhuma partição é reescrita
+        self.descartar()
+        for temporarios in self._concluidos.values():
+            for temporario, _ in temporarios:
+                os.remove(temporario)
+        self._concluidos = {}
@@ -1,9 +1,8 @@
 import pandas as pd
 
-processed_file = '/Users/bilal/Programaçao/financas pessoais/data/processed/novembro_dezembro_2025_classificado.csv'
-df = pd.read_csv(processed_file)
+from livro_transacoes import consultar_transacoes
 
-df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+df = consultar_transacoes(anos=[2025], meses=[11, 12])
 
 transferencias = df[df['Categoria'] == 'Transferência Interna'].sort_values('Date')
 
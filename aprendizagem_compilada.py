@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 APRENDIZAGEM COMPILADA
+Junta as escolhas manuais do GestorAprendizagem numa tabela de overrides
+(descrição normalizada + crédito/débito -> categoria) consultada antes das regras
+
+As escolhas vivem num registo só de acrescento (JSONL, uma linha por
+registo: metadata, sessao, escolha, fim); o resumo por sessão (o antigo
+JSON) é uma vista gerada ao compactar. Desfazer/refazer uma validação no
+dashboard acrescenta um registo de compensação (anulacao/reposicao) que
+retira ou volta a juntar essa escolha à tabela.
+
+Uso:
+    python3 aprendizagem_compilada.py compactar    # regenera o resumo por sessão
+"""
+
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+CAMINHO_APRENDIZAGEM = 'APRENDIZAGEM_MANUAL_NOVEMBRO_DEZEMBRO.jsonl'
+CAMINHO_RESUMO_APRENDIZAGEM = 'APRENDIZAGEM_MANUAL_NOVEMBRO_DEZEMBRO.json'
+CAMINHO_TABELA = 'data/cache/aprendizagem_compilada.json'
+CONFIANCA_APRENDIZAGEM = 0.95
+
+
+def chave_aprendizagem(descricao, credito):
+    return f"{'c' if credito else 'd'}|{' '.join(str(descricao).lower().split())}"
+
+
+def registo_compensacao(tipo, descricao, credito, categoria):
+    """Registo 'anulacao' (desfazer) ou 'reposicao' (refazer) de uma escolha já registada"""
+    return {
+        'registo': tipo,
+        'timestamp': datetime.now().isoformat(),
+        'transacao': {'descricao': str(descricao), 'tipo': 'credit' if credito else 'debit'},
+        'categoria': categoria
+    }
+
+
+def linha_registo(registo):
+    return json.dumps(registo, ensure_ascii=False) + '\n'
+
+
+def acrescentar_registos(registos, caminho=CAMINHO_APRENDIZAGEM):
+    """Acrescenta os registos ao JSONL numa só escrita e com um só fsync"""
+    linhas = [linha_registo(registo) for registo in registos]
+    if not os.path.exists(caminho) or os.path.getsize(caminho) == 0:
+        linhas.insert(0, linha_registo({'registo': 'metadata', 'criado': datetime.now().isoformat()}))
+    with open(caminho, 'a', encoding='utf-8') as f:
+        f.write(''.join(linhas))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def ler_registos(caminho=CAMINHO_APRENDIZAGEM):
+    """Registos completos do JSONL (ignora uma última linha ainda a meio)"""
+    if not os.path.exists(caminho):
+        return
+    with open(caminho, 'rb') as f:
+        for linha in f:
+            if not linha.endswith(b'\n'):
+                break
+            yield json.loads(linha)
+
+
+def migrar_aprendizagem(caminho_resumo=CAMINHO_RESUMO_APRENDIZAGEM, caminho=CAMINHO_APRENDIZAGEM):
+    """Converte o antigo JSON por sessões para o registo JSONL (uma vez)"""
+    if os.path.exists(caminho) or not os.path.exists(caminho_resumo):
+        return False
+    try:
+        with open(caminho_resumo, 'r', encoding='utf-8') as f:
+            aprendizagem = json.load(f)
+    except Exception:
+        return False
+
+    registos = [{'registo': 'metadata', 'criado': aprendizagem.get('metadata', {}).get('criado')}]
+    for sessao in aprendizagem.get('sessoes', []):
+        identificador = sessao['inicio']
+        registos.append({'registo': 'sessao', 'sessao': identificador, 'inicio': sessao['inicio'],
+                         'tipo': sessao.get('tipo', 'validacao_dashboard')})
+        registos += [{'registo': 'escolha', 'sessao': identificador, **escolha} for escolha in sessao.get('escolhas', [])]
+        if sessao.get('finalizada'):
+            registos.append({'registo': 'fim', 'sessao': identificador, 'fim': sessao.get('fim'),
+                             'total_escolhas': sessao.get('total_escolhas'),
+                             'total_reclassificadas': sessao.get('total_reclassificadas')})
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(''.join(linha_registo(registo) for registo in registos))
+    os.replace(temporario, caminho)
+    return True
+
+
+def compactar_aprendizagem(caminho=CAMINHO_APRENDIZAGEM, caminho_resumo=CAMINHO_RESUMO_APRENDIZAGEM):
+    """Gera o resumo por sessão (formato do antigo JSON) a partir do registo"""
+    resumo = {'sessoes': [], 'metadata': {}}
+    sessoes = {}
+    for registo in ler_registos(caminho):
+        tipo = registo.pop('registo')
+        if tipo == 'metadata':
+            resumo['metadata']['criado'] = registo.get('criado')
+            continue
+        identificador = registo.pop('sessao', None)
+        if tipo == 'sessao':
+            sessoes[identificador] = {**registo, 'escolhas': [], 'finalizada': False}
+            resumo['sessoes'].append(sessoes[identificador])
+        elif tipo == 'escolha' and identificador in sessoes:
+            sessoes[identificador]['escolhas'].append(registo)
+        elif tipo == 'fim' and identificador in sessoes:
+            sessoes[identificador].update(registo, finalizada=True)
+        elif tipo in ('anulacao', 'reposicao'):
+            resumo.setdefault('compensacoes', []).append({'registo': tipo, **registo})
+    resumo['metadata']['ultima_atualizacao'] = datetime.now().isoformat()
+
+    temporario = f"{caminho_resumo}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(resumo, f, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho_resumo)
+    return len(resumo['sessoes'])
+
+
+class TabelaAprendizagem:
+    """Tabela de overrides com atualização incremental.
+
+    Guarda até que byte do registo JSONL já incorporou; ao atualizar só lê
+    as linhas acrescentadas desde então. Cada chave guarda as escolhas
+    ativas por ordem (uma anulação retira a última igual). `politica` decide
+    a categoria de cada chave: 'ultima' (última escolha) ou 'maioria' (mais
+    escolhida, com a última como desempate). Depois de `atualizar`,
+    `alteradas` tem as chaves tocadas (None se a tabela foi reconstruída).
+    """
+
+    def __init__(self, caminho_aprendizagem=CAMINHO_APRENDIZAGEM, caminho_tabela=CAMINHO_TABELA, politica='ultima'):
+        self.caminho_aprendizagem = caminho_aprendizagem
+        self.caminho_tabela = caminho_tabela
+        self.politica = politica
+        self._estado_vazio()
+        self._carregar_tabela()
+        self.alteradas = set()
+
+    def _estado_vazio(self):
+        self.origem = None
+        self.assinatura = None
+        self.deslocamento = 0
+        self.historico = {}
+        self.categorias = {}
+
+    def _carregar_tabela(self):
+        if not os.path.exists(self.caminho_tabela):
+            return
+        try:
+            with open(self.caminho_tabela, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+        except Exception:
+            return
+        if dados.get('politica') != self.politica or 'historico' not in dados:
+            return
+
+        self.origem = dados.get('origem')
+        self.assinatura = tuple(dados['assinatura']) if dados.get('assinatura') else None
+        self.deslocamento = dados['deslocamento']
+        self.historico = dados['historico']
+        self.categorias = dados.get('categorias', {})
+
+    def _salvar_tabela(self):
+        os.makedirs(os.path.dirname(self.caminho_tabela) or '.', exist_ok=True)
+        temporario = f"{self.caminho_tabela}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({
+                'politica': self.politica,
+                'origem': self.origem,
+                'assinatura': list(self.assinatura) if self.assinatura else None,
+                'deslocamento': self.deslocamento,
+                'historico': self.historico,
+                'categorias': self.categorias
+            }, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho_tabela)
+
+    def _decidir(self, chave):
+        historico = self.historico.get(chave)
+        if not historico:
+            self.historico.pop(chave, None)
+            self.categorias.pop(chave, None)
+            return
+
+        ultima = historico[-1]
+        if self.politica == 'maioria':
+            contagens = Counter(historico)
+            maximo = max(contagens.values())
+            if contagens[ultima] != maximo:
+                ultima = next(cat for cat, n in contagens.items() if n == maximo)
+
+        if ultima == 'Nao Categorizado':
+            self.categorias.pop(chave, None)
+        else:
+            self.categorias[chave] = ultima
+
+    def incorporar(self, escolha):
+        """Junta uma escolha (formato do GestorAprendizagem) ou um registo de compensação à tabela"""
+        transacao = escolha.get('transacao', {})
+        if escolha.get('registo') in ('anulacao', 'reposicao'):
+            categoria = escolha.get('categoria')
+        else:
+            categoria = escolha.get('escolha_utilizador', {}).get('categoria')
+        if not categoria or 'descricao' not in transacao:
+            return
+
+        chave = chave_aprendizagem(transacao['descricao'], transacao.get('tipo') == 'credit')
+        historico = self.historico.setdefault(chave, [])
+        if self.alteradas is not None:
+            self.alteradas.add(chave)
+        if escolha.get('registo') == 'anulacao':
+            if categoria in historico:
+                del historico[len(historico) - 1 - historico[::-1].index(categoria)]
+        else:
+            historico.append(categoria)
+        self._decidir(chave)
+
+    def atualizar(self):
+        """Incorpora as escolhas acrescentadas ao registo de aprendizagem (se mudou)"""
+        migrar_aprendizagem(caminho=self.caminho_aprendizagem)
+        if not os.path.exists(self.caminho_aprendizagem):
+            return 0
+
+        estado = os.stat(self.caminho_aprendizagem)
+        assinatura = (estado.st_mtime_ns, estado.st_size)
+        self.alteradas = set()
+        if assinatura == self.assinatura:
+            return 0
+
+        novas = 0
+        try:
+            with open(self.caminho_aprendizagem, 'rb') as f:
+                cabecalho = f.readline()
+                origem = json.loads(cabecalho).get('criado') if cabecalho.endswith(b'\n') else None
+                if origem != self.origem or estado.st_size < self.deslocamento:
+                    self._estado_vazio()
+                    self.origem = origem
+                    self.alteradas = None
+                self.deslocamento = max(self.deslocamento, len(cabecalho))
+
+                f.seek(self.deslocamento)
+                for linha in f:
+                    if not linha.endswith(b'\n'):
+                        # Linha ainda a ser escrita: fica para a próxima atualização
+                        break
+                    self.deslocamento += len(linha)
+                    registo = json.loads(linha)
+                    if registo.get('registo') in ('escolha', 'anulacao', 'reposicao'):
+                        self.incorporar(registo)
+                        novas += 1
+        except Exception:
+            return novas
+
+        self.assinatura = assinatura
+        self._salvar_tabela()
+        return novas
+
+    def obter(self, descricao, credito):
+        return self.categorias.get(chave_aprendizagem(descricao, credito))
+
+    def procurar_lote(self, descricoes, creditos):
+        """Categoria aprendida por linha (None quando não há override)"""
+        creditos = np.asarray(creditos, dtype=bool)
+        resultado = np.full(len(creditos), None, dtype=object)
+        if not self.categorias or not len(creditos):
+            return resultado
+
+        codigos, unicas = pd.factorize(np.asarray(descricoes, dtype=object), use_na_sentinel=False)
+        for credito in (True, False):
+            aprendidas = np.array([self.obter(d, credito) for d in unicas], dtype=object)
+            linhas = creditos == credito
+            resultado[linhas] = aprendidas[codigos[linhas]]
+        return resultado
+
+
+def main():
+    if sys.argv[1:] != ['compactar']:
+        print(__doc__.split('Uso:')[1].rstrip())
+        sys.exit(2)
+    migrar_aprendizagem()
+    sessoes = compactar_aprendizagem()
+    print(f"✅ Resumo com {sessoes} sessões em {CAMINHO_RESUMO_APRENDIZAGEM}")
+
+
+if __name__ == '__main__':
+    main()
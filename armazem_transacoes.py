@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 ARMAZÉM DE TRANSAÇÕES
+Transações classificadas em Parquet, partidas por ano/mês/banco
+(data/processed/transacoes/ano=2025/mes=11/banco=Millennium/transacoes.parquet),
+com colunas tipadas, leitura só das colunas e partições pedidas e CSV a pedido
+
+Uso:
+    python3 armazem_transacoes.py importar data/processed/novembro_dezembro_2025_classificado.csv
+    python3 armazem_transacoes.py exportar saida.csv --ano 2025 --mes 11 --banco Millennium
+"""
+
+import argparse
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from identificadores import calcular_ids
+
+RAIZ_ARMAZEM = 'data/processed/transacoes'
+NOME_PARTICAO = 'transacoes.parquet'
+COLUNAS = ['Date', 'Bank', 'Description', 'Valor', 'Debit', 'Credit',
+           'Categoria', 'Confianca', 'Observacao', 'Id', 'HashRegras']
+ESQUEMA = pa.schema([
+    ('Date', pa.date32()),
+    ('Bank', pa.dictionary(pa.int32(), pa.string())),
+    ('Description', pa.string()),
+    ('Valor', pa.float64()),
+    ('Debit', pa.float64()),
+    ('Credit', pa.float64()),
+    ('Categoria', pa.dictionary(pa.int32(), pa.string())),
+    ('Confianca', pa.float64()),
+    ('Observacao', pa.string()),
+    ('Id', pa.string()),
+    ('HashRegras', pa.string()),
+])
+CATEGORICAS = ['Bank', 'Categoria']
+
+
+def caminho_particao(ano, mes, banco, raiz=RAIZ_ARMAZEM):
+    return os.path.join(raiz, f'ano={ano}', f'mes={mes:02d}', f'banco={banco}', NOME_PARTICAO)
+
+
+def particoes(raiz=RAIZ_ARMAZEM, anos=None, meses=None, bancos=None):
+    """Partições (ano, mes, banco, caminho) que passam os filtros, por ordem.
+
+    Os filtros só olham para os nomes das pastas; os ficheiros das
+    partições excluídas nunca são abertos.
+    """
+    encontradas = []
+    for caminho in Path(raiz).glob(f'ano=*/mes=*/banco=*/{NOME_PARTICAO}'):
+        m = re.fullmatch(r'ano=(\d{4})/mes=(\d{2})/banco=(.+)', caminho.parent.relative_to(raiz).as_posix())
+        if not m:
+            continue
+        ano, mes, banco = int(m.group(1)), int(m.group(2)), m.group(3)
+        if (anos is None or ano in anos) and (meses is None or mes in meses) and (bancos is None or banco in bancos):
+            encontradas.append((ano, mes, banco, str(caminho)))
+    return sorted(encontradas)
+
+
+def versao(raiz=RAIZ_ARMAZEM):
+    """Assinatura barata (caminho, mtime) das partições, para invalidar caches"""
+    return tuple((caminho, os.path.getmtime(caminho)) for *_, caminho in particoes(raiz))
+
+
+def _tabela(df):
+    """DataFrame -> tabela Arrow com o ESQUEMA (datas e montantes normalizados)"""
+    df = df.reindex(columns=COLUNAS)
+    colunas = {
+        'Date': pd.to_datetime(df['Date'], format='mixed').dt.date,
+        'Description': df['Description'].astype(object).where(df['Description'].notna(), None),
+    }
+    for coluna in ('Valor', 'Debit', 'Credit', 'Confianca'):
+        colunas[coluna] = pd.to_numeric(df[coluna]).astype(float)
+    for coluna in ('Bank', 'Categoria', 'Observacao', 'Id', 'HashRegras'):
+        valores = df[coluna].astype(object)
+        colunas[coluna] = valores.where(valores.notna(), None).map(lambda v: v if v is None else str(v))
+
+    return pa.Table.from_pydict(
+        {coluna: pa.array(colunas[coluna].tolist(), type=ESQUEMA.field(coluna).type) for coluna in COLUNAS},
+        schema=ESQUEMA
+    )
+
+
+def gravar_transacoes(df, raiz=RAIZ_ARMAZEM):
+    """Grava as transações, substituindo só as partições (ano, mês, banco) presentes em `df`.
+
+    Cada partição é escrita num temporário e trocada de forma atómica.
+    Devolve os caminhos escritos.
+    """
+    if df.empty:
+        return []
+
+    datas = pd.to_datetime(df['Date'], format='mixed')
+    chaves = pd.DataFrame({'ano': datas.dt.year, 'mes': datas.dt.month, 'banco': df['Bank'].astype(str)})
+    escritos = []
+    for (ano, mes, banco), indices in chaves.groupby(['ano', 'mes', 'banco'], sort=True).groups.items():
+        caminho = caminho_particao(int(ano), int(mes), banco, raiz)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        pq.write_table(_tabela(df.loc[indices]), temporario)
+        os.replace(temporario, caminho)
+        escritos.append(caminho)
+    return escritos
+
+
+def ler_transacoes(colunas=None, anos=None, meses=None, bancos=None, raiz=RAIZ_ARMAZEM, categoricas=True):
+    """Lê as transações das partições pedidas (todas por omissão).
+
+    `colunas` limita as colunas lidas dos ficheiros. Date vem como
+    datetime64, montantes como float e Bank/Categoria como categóricas
+    (ou texto, com categoricas=False, para quem vai alterar os valores).
+    """
+    colunas = list(colunas) if colunas is not None else COLUNAS
+    tabelas = [pq.read_table(caminho, columns=colunas) for *_, caminho in particoes(raiz, anos, meses, bancos)]
+    if not tabelas:
+        tabelas = [ESQUEMA.empty_table().select(colunas)]
+
+    df = pa.concat_tables(tabelas, promote_options='permissive').to_pandas(date_as_object=False)
+    if 'Date' in df.columns:
+        df['Date'] = df['Date'].astype('datetime64[ns]')
+    if not categoricas:
+        for coluna in CATEGORICAS:
+            if coluna in df.columns:
+                df[coluna] = df[coluna].astype(object)
+    return df
+
+
+def exportar_csv(caminho, raiz=RAIZ_ARMAZEM, **filtros):
+    """Vista CSV (formato do antigo ficheiro consolidado) das partições pedidas"""
+    df = ler_transacoes(raiz=raiz, categoricas=False, **filtros)
+    df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+    df.to_csv(caminho, index=False, encoding='utf-8')
+    return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Armazém Parquet das transações classificadas")
+    parser.add_argument('--raiz', default=RAIZ_ARMAZEM, help="Pasta do armazém")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    importar = comandos.add_parser('importar', help="Importa um CSV consolidado para o armazém")
+    importar.add_argument('csv')
+
+    exportar = comandos.add_parser('exportar', help="Exporta partições do armazém para CSV")
+    exportar.add_argument('csv')
+    exportar.add_argument('--ano', type=int, nargs='+')
+    exportar.add_argument('--mes', type=int, nargs='+')
+    exportar.add_argument('--banco', nargs='+')
+    args = parser.parse_args()
+
+    if args.comando == 'importar':
+        df = pd.read_csv(args.csv)
+        if 'Id' not in df.columns:
+            df['Id'] = calcular_ids(df)
+        escritos = gravar_transacoes(df, args.raiz)
+        print(f"✅ {len(escritos)} partições gravadas em {args.raiz}")
+    else:
+        total = exportar_csv(args.csv, args.raiz, anos=args.ano, meses=args.mes, bancos=args.banco)
+        print(f"✅ {total} transações exportadas para {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,12 @@
 import subprocess
 import sys
 import os
-import pandas as pd
+
+from manifesto_dados import Manifesto, etapa_classificacao, imprimir_resumo
+from registo_edicoes import RegistoEdicoes
+
+# = armazem_transacoes.RAIZ_ARMAZEM; importado só quando há trabalho (pandas/pyarrow pesam ~0.5s)
+RAIZ_ARMAZEM = 'data/processed/transacoes'
 
 def run_command(cmd, description):
     print(f"📝 {description}...")
@@ -25,34 +30,38 @@ def main():
         print("❌ ERRO: Pasta data/raw/ não encontrada!")
         sys.exit(1)
     
+    # Cada etapa só corre se as suas entradas (ou saídas) mudaram desde a última vez
+    manifesto = Manifesto()
     print("📋 1. Processando CSVs...")
-    if not run_command('python3 preparar_csvs_nov_dez.py', 'Preparação de CSVs'):
+    if manifesto.etapas_atualizadas('ingestao'):
+        manifesto.salvar()
+        print("⏭️  Exportações sem alterações")
+    elif not run_command('python3 preparar_csvs_nov_dez.py --alteradas', 'Preparação de CSVs'):
         sys.exit(1)
     
     print()
     print("📋 2. Consolidando dados...")
-    if not run_command('python3 processar_novembro_dezembro_2025.py', 'Consolidação de dados'):
+    # Edições do dashboard pendentes no livro contam como alteração das saídas
+    # (há edições por descarregar enquanto o registo de edições não estiver vazio)
+    if RegistoEdicoes().linhas:
+        from livro_transacoes import descarregar_livro
+        descarregar_livro(raiz=RAIZ_ARMAZEM)
+    manifesto = Manifesto()
+    if manifesto.etapa_atualizada(etapa_classificacao(RAIZ_ARMAZEM)):
+        manifesto.salvar()
+        print("⏭️  Partições, regras e aprendizagem sem alterações")
+    elif not run_command('python3 processar_novembro_dezembro_2025.py --incremental', 'Consolidação de dados'):
         sys.exit(1)
     
     print()
     print("📊 3. Resumo dos dados processados:")
     print("-" * 50)
     
-    try:
-        df = pd.read_csv('data/processed/novembro_dezembro_2025_classificado.csv')
-        
-        total = len(df)
-        classificadas = len(df[df['Categoria'] != 'Nao Categorizado'])
-        por_classificar = len(df[df['Categoria'] == 'Nao Categorizado'])
-        
-        print(f"   Total de transações: {total}")
-        print(f"   Classificadas: {classificadas} ({classificadas/total*100:.1f}%)")
-        print(f"   Por classificar: {por_classificar} ({por_classificar/total*100:.1f}%)")
-        print(f"\n   Período: {df['Date'].min()} a {df['Date'].max()}")
-        print(f"   Bancos: {', '.join(df['Bank'].unique())}")
-        
-    except Exception as e:
-        print(f"   ⚠️  Não foi possível carregar o resumo: {e}")
+    resumo = Manifesto().etapas.get(etapa_classificacao(RAIZ_ARMAZEM), {}).get('resumo')
+    if resumo:
+        imprimir_resumo(resumo)
+    else:
+        print("   ⚠️  Não foi possível carregar o resumo")
     
     print("-" * 50)
     print()
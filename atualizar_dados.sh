@@ -9,35 +9,43 @@ if [ ! -d "data/raw" ]; then
     exit 1
 fi
 
-echo "2. Processando CSVs..."
-python3 preparar_csvs_nov_dez.py
+ARMAZEM="data/processed/transacoes"
 
-if [ $? -ne 0 ]; then
-    echo "ERRO: Falha ao processar CSVs"
-    exit 1
+# Cada etapa só corre se as suas entradas mudaram (data/manifesto.json)
+echo "2. Processando CSVs..."
+if python3 manifesto_dados.py verificar ingestao; then
+    echo "   Exportações sem alterações"
+else
+    python3 preparar_csvs_nov_dez.py --alteradas
+
+    if [ $? -ne 0 ]; then
+        echo "ERRO: Falha ao processar CSVs"
+        exit 1
+    fi
 fi
 
 echo "3. Consolidando dados..."
-python3 processar_novembro_dezembro_2025.py
-
-if [ $? -ne 0 ]; then
-    echo "ERRO: Falha ao consolidar dados"
-    exit 1
+# Edições do dashboard pendentes no livro contam como alteração das saídas
+# (há edições por descarregar enquanto o registo de edições não estiver vazio)
+if [ -s "data/processed/edicoes.jsonl" ]; then
+    python3 livro_transacoes.py descarregar --raiz "$ARMAZEM" > /dev/null
+fi
+if python3 manifesto_dados.py verificar "classificacao:$ARMAZEM"; then
+    echo "   Partições, regras e aprendizagem sem alterações"
+else
+    python3 processar_novembro_dezembro_2025.py --incremental
+
+    if [ $? -ne 0 ]; then
+        echo "ERRO: Falha ao consolidar dados"
+        exit 1
+    fi
 fi
 
 echo ""
 echo "4. Dados processados com sucesso!"
 echo ""
 echo "Resumo:"
-python3 << 'EOF'
-import pandas as pd
-df = pd.read_csv('data/processed/novembro_dezembro_2025_classificado.csv')
-print(f"Total de transações: {len(df)}")
-print(f"Classificadas: {len(df[df['Categoria'] != 'Nao Categorizado'])}")
-print(f"Por classificar: {len(df[df['Categoria'] == 'Nao Categorizado'])}")
-print(f"\nDatas: {df['Date'].min()} a {df['Date'].max()}")
-print(f"Bancos: {', '.join(df['Bank'].unique())}")
-EOF
+python3 manifesto_dados.py resumo "$ARMAZEM"
 
 echo ""
 echo "5. Para atualizar no GitHub, execute:"
@@ -1,95 +1,59 @@
 import pandas as pd
 import json
 from pathlib import Path
-import chardet
 
-def detect_encoding(file_path):
-    with open(file_path, 'rb') as f:
-        result = chardet.detect(f.read())
-    return result['encoding']
+from indice_pesquisa import pesquisar_transacoes
+from livro_transacoes import consultar_transacoes
+from reconciliacao import imprimir_reconciliacao, reconciliar
+from transferencias_internas import JANELA_DIAS, conflitos_transferencias, pares_transferencias
 
-def load_raw_csv(file_path):
-    encoding = detect_encoding(file_path)
-    df = pd.read_csv(file_path, encoding=encoding, sep=';' if ';' in open(file_path, 'r', encoding=encoding).readline() else ',')
-    return df
+def imprimir_par(df, par):
+    debito, credito = df.loc[par.debito], df.loc[par.credito]
+    print(f"\n{par.Ligacao} ({par.dias} dias):")
+    print(f"  Débito:  {debito['Date']:%Y-%m-%d} {debito['Bank']} '{debito['Description']}' {debito['Debit']:.2f}€ [{debito['Categoria']}]")
+    print(f"  Crédito: {credito['Date']:%Y-%m-%d} {credito['Bank']} '{credito['Description']}' {credito['Credit']:.2f}€ [{credito['Categoria']}]")
+
+def imprimir_transacao(idx, row):
+    print(f"\nLinha {idx}:")
+    print(f"  Data: {row['Date']:%Y-%m-%d}")
+    print(f"  Banco: {row['Bank']}")
+    print(f"  Descrição: {row['Description']}")
+    print(f"  Montante: {row['Valor']}€")
+    print(f"  Débito: {row['Debit']}€")
+    print(f"  Crédito: {row['Credit']}€")
+    print(f"  Categoria: {row['Categoria']}")
+    print(f"  Observação: {row['Observacao']}")
 
 def analise_bcp_500():
     print("\n" + "="*80)
     print("ANÁLISE DO BCP 500€ (2025-11-21)")
     print("="*80)
     
-    millennium_file = Path("/Users/bilal/Programaçao/financas pessoais/data/raw/novembro_2025/millennium_novembro_2025.csv")
-    processed_file = Path("/Users/bilal/Programaçao/financas pessoais/data/processed/novembro_dezembro_2025_classificado.csv")
-    
-    if not millennium_file.exists():
-        print(f"❌ Arquivo raw não encontrado: {millennium_file}")
-        return
-    
-    df_raw = load_raw_csv(millennium_file)
-    df_processed = pd.read_csv(processed_file)
-    
-    print("\n📄 COLUNAS DO ARQUIVO RAW:")
-    print(df_raw.columns.tolist())
-    
-    print("\n🔍 BUSCANDO BCP 500€ NO RAW:")
-    bcp_raw = df_raw[
-        (df_raw.astype(str).apply(lambda x: x.str.contains('20394/050598373', case=False, na=False)).any(axis=1)) |
-        (df_raw.astype(str).apply(lambda x: x.str.contains('BANCO COMERCIAL PORTUG', case=False, na=False)).any(axis=1))
-    ]
-    
-    if len(bcp_raw) > 0:
-        print(f"✅ Encontrados {len(bcp_raw)} pagamentos BCP no RAW")
-        print("\nDETALHES DOS PAGAMENTOS BCP NO RAW:")
-        for idx, row in bcp_raw.iterrows():
-            print(f"\nLinha {idx}:")
-            for col in bcp_raw.columns:
-                print(f"  {col}: {row[col]}")
-    else:
-        print("❌ NÃO encontrados pagamentos BCP no RAW")
-    
-    print("\n🔍 BUSCANDO BCP 500€ NO PROCESSADO:")
-    bcp_processed = df_processed[
-        (df_processed['Description'].str.contains('20394/050598373', case=False, na=False)) |
-        (df_processed['Description'].str.contains('BANCO COMERCIAL PORTUG', case=False, na=False))
-    ]
-    
-    if len(bcp_processed) > 0:
-        print(f"✅ Encontrados {len(bcp_processed)} pagamentos BCP no PROCESSADO")
-        print("\nDETALHES DOS PAGAMENTOS BCP NO PROCESSADO:")
-        for idx, row in bcp_processed.iterrows():
-            print(f"\nLinha {idx}:")
-            print(f"  Data: {row['Date']}")
-            print(f"  Descrição: {row['Description']}")
-            print(f"  Montante: {row.get('Valor', 'N/A')}€")
-            print(f"  Débito: {row.get('Debit', 'N/A')}€")
-            print(f"  Crédito: {row.get('Credit', 'N/A')}€")
-            print(f"  Categoria: {row['Categoria']}")
-            print(f"  Observação: {row.get('Observacao', 'N/A')}")
+    print("\n🔍 BUSCANDO BCP 500€ NO RAW (COM A CLASSIFICAÇÃO PROCESSADA):")
+    # Índice de pesquisa: cada linha raw já vem com a contraparte processada (pelo Id)
+    bcp = pesquisar_transacoes(['20394/050598373', 'BANCO COMERCIAL PORTUG'], bancos=['Millennium'])
+    
+    if len(bcp) > 0:
+        print(f"✅ Encontrados {len(bcp)} pagamentos BCP")
+        print("\nDETALHES DOS PAGAMENTOS BCP:")
+        for idx, row in bcp.iterrows():
+            imprimir_transacao(idx, row)
+            if pd.isna(row['Categoria']):
+                print("  ⚠️  SEM CONTRAPARTE NO PROCESSADO")
     else:
-        print("❌ NÃO encontrados pagamentos BCP no PROCESSADO")
+        print("❌ NÃO encontrados pagamentos BCP")
     
     print("\n🔍 ESPECIFICAMENTE BCP 500€ EM 2025-11-21:")
-    bcp_500 = df_processed[
-        (df_processed['Description'].str.contains('BANCO COMERCIAL PORTUG', case=False, na=False)) &
-        (df_processed['Date'] == '2025-11-21') &
-        (df_processed['Valor'] == 500.0)
-    ]
+    bcp_500 = pesquisar_transacoes(['BANCO COMERCIAL PORTUG'], valor=500.0, desde='2025-11-21', ate='2025-11-21')
     
     if len(bcp_500) > 0:
         print(f"✅ Encontrado BCP 500€:")
         for idx, row in bcp_500.iterrows():
-            print(f"\nLinha {idx}:")
-            print(f"  Data: {row['Date']}")
-            print(f"  Descrição: {row['Description']}")
-            print(f"  Montante: {row.get('Valor', 'N/A')}€")
-            print(f"  Débito: {row.get('Debit', 'N/A')}€")
-            print(f"  Crédito: {row.get('Credit', 'N/A')}€")
-            print(f"  Categoria: {row['Categoria']}")
-            print(f"  Observação: {row.get('Observacao', 'N/A')}")
+            imprimir_transacao(idx, row)
             
-            if row.get('Debit', 0) > 0:
+            if row['Debit'] > 0:
                 print("\n⚠️  ESTÁ CLASSIFICADO COMO DÉBITO (SAÍDA DE DINHEIRO)")
-            if row.get('Credit', 0) > 0:
+            if row['Credit'] > 0:
                 print("\n⚠️  ESTÁ CLASSIFICADO COMO CRÉDITO (ENTRADA DE DINHEIRO)")
     else:
         print("❌ NÃO encontrado BCP 500€ específico")
@@ -99,79 +63,29 @@ def analise_cartao_8373():
     print("ANÁLISE DO CARTÃO *8373 (2025-11-19 - 178€)")
     print("="*80)
     
-    revolut_file = Path("/Users/bilal/Programaçao/financas pessoais/data/raw/novembro_2025/revolut_novembro_2025.csv")
-    processed_file = Path("/Users/bilal/Programaçao/financas pessoais/data/processed/novembro_dezembro_2025_classificado.csv")
-    
-    if not revolut_file.exists():
-        print(f"❌ Arquivo raw não encontrado: {revolut_file}")
-        return
-    
-    df_raw = load_raw_csv(revolut_file)
-    df_processed = pd.read_csv(processed_file)
-    
-    print("\n📄 COLUNAS DO ARQUIVO RAW:")
-    print(df_raw.columns.tolist())
-    
-    print("\n🔍 BUSCANDO CARTÃO *8373 NO RAW:")
-    cartao_raw = df_raw[
-        (df_raw.astype(str).apply(lambda x: x.str.contains('8373', case=False, na=False)).any(axis=1)) |
-        (df_raw.astype(str).apply(lambda x: x.str.contains('Top up by', case=False, na=False)).any(axis=1))
-    ]
-    
-    if len(cartao_raw) > 0:
-        print(f"✅ Encontrados {len(cartao_raw)} transações com *8373/Top up no RAW")
-        print("\nDETALHES DAS TRANSAÇÕES *8373 NO RAW:")
-        for idx, row in cartao_raw.iterrows():
-            print(f"\nLinha {idx}:")
-            for col in cartao_raw.columns:
-                print(f"  {col}: {row[col]}")
-    else:
-        print("❌ NÃO encontradas transações com *8373 no RAW")
+    print("\n🔍 BUSCANDO CARTÃO *8373 / TOP UP NO RAW (COM A CLASSIFICAÇÃO PROCESSADA):")
+    cartao = pesquisar_transacoes(['8373', 'Top up'])
     
-    print("\n🔍 BUSCANDO CARTÃO *8373 NO PROCESSADO:")
-    cartao_processed = df_processed[
-        (df_processed['Description'].str.contains('8373', case=False, na=False)) |
-        (df_processed['Description'].str.contains('Top up', case=False, na=False))
-    ]
-    
-    if len(cartao_processed) > 0:
-        print(f"✅ Encontrados {len(cartao_processed)} transações com *8373 no PROCESSADO")
-        print("\nDETALHES DAS TRANSAÇÕES *8373 NO PROCESSADO:")
-        for idx, row in cartao_processed.iterrows():
-            print(f"\nLinha {idx}:")
-            print(f"  Data: {row['Date']}")
-            print(f"  Descrição: {row['Description']}")
-            print(f"  Montante: {row.get('Valor', 'N/A')}€")
-            print(f"  Débito: {row.get('Debit', 'N/A')}€")
-            print(f"  Crédito: {row.get('Credit', 'N/A')}€")
-            print(f"  Categoria: {row['Categoria']}")
-            print(f"  Observação: {row.get('Observacao', 'N/A')}")
+    if len(cartao) > 0:
+        print(f"✅ Encontrados {len(cartao)} transações com *8373/Top up")
+        print("\nDETALHES DAS TRANSAÇÕES *8373:")
+        for idx, row in cartao.iterrows():
+            imprimir_transacao(idx, row)
             
-            if row.get('Credit', 0) > 0:
+            if row['Credit'] > 0:
                 print("  ⚠️  CRÉDITO (ENTRADA DE DINHEIRO)")
-            if row.get('Debit', 0) > 0:
+            if row['Debit'] > 0:
                 print("  ⚠️  DÉBITO (SAÍDA DE DINHEIRO)")
     else:
-        print("❌ NÃO encontradas transações com *8373 no PROCESSADO")
+        print("❌ NÃO encontradas transações com *8373")
     
     print("\n🔍 ESPECIFICAMENTE CARTÃO *8373 178€ EM 2025-11-19:")
-    cartao_178 = df_processed[
-        (df_processed['Description'].str.contains('8373', case=False, na=False)) &
-        (df_processed['Date'] == '2025-11-19') &
-        (df_processed['Valor'] == 178.0)
-    ]
+    cartao_178 = pesquisar_transacoes(['8373'], valor=178.0, desde='2025-11-19', ate='2025-11-19')
     
     if len(cartao_178) > 0:
         print(f"✅ Encontrado cartão *8373 178€:")
         for idx, row in cartao_178.iterrows():
-            print(f"\nLinha {idx}:")
-            print(f"  Data: {row['Date']}")
-            print(f"  Descrição: {row['Description']}")
-            print(f"  Montante: {row.get('Valor', 'N/A')}€")
-            print(f"  Débito: {row.get('Debit', 'N/A')}€")
-            print(f"  Crédito: {row.get('Credit', 'N/A')}€")
-            print(f"  Categoria: {row['Categoria']}")
-            print(f"  Observação: {row.get('Observacao', 'N/A')}")
+            imprimir_transacao(idx, row)
             
             if row['Categoria'] == 'Receitas - Soluções IA':
                 print("\n⚠️  CLASSIFICADO COMO 'Receitas - Soluções IA' (INCORRETO SEGUNDO UTILIZADOR)")
@@ -180,145 +94,50 @@ def analise_cartao_8373():
     else:
         print("❌ NÃO encontrado cartão *8373 178€ específico")
 
-def comparar_totais():
+def analise_transferencias_internas():
     print("\n" + "="*80)
-    print("COMPARAÇÃO DE TOTAIS RAW VS PROCESSADO")
+    print(f"TRANSFERÊNCIAS INTERNAS EMPARELHADAS (DÉBITO ↔ CRÉDITO, JANELA DE {JANELA_DIAS} DIAS)")
     print("="*80)
     
-    millennium_nov_file = Path("/Users/bilal/Programaçao/financas pessoais/data/raw/novembro_2025/millennium_novembro_2025.csv")
-    revolut_nov_file = Path("/Users/bilal/Programaçao/financas pessoais/data/raw/novembro_2025/revolut_novembro_2025.csv")
-    millennium_dez_file = Path("/Users/bilal/Programaçao/financas pessoais/data/raw/dezembro_2025/millennium_dezembro_2025.csv")
-    revolut_dez_file = Path("/Users/bilal/Programaçao/financas pessoais/data/raw/dezembro_2025/revolut_dezembro_2025.csv")
-    processed_file = Path("/Users/bilal/Programaçao/financas pessoais/data/processed/novembro_dezembro_2025_classificado.csv")
+    df = consultar_transacoes(['Id', 'Date', 'Bank', 'Description', 'Debit', 'Credit', 'Categoria',
+                               'Confianca', 'Observacao'])
+    pares = pares_transferencias(df)
+    conflitos = conflitos_transferencias(df, pares=pares)
     
-    if not millennium_nov_file.exists() or not revolut_nov_file.exists() or not millennium_dez_file.exists() or not revolut_dez_file.exists():
-        print("❌ Arquivos raw não encontrados")
+    if len(pares) == 0 and len(conflitos) == 0:
+        print("❌ NÃO encontrados pares débito/crédito entre contas")
         return
     
-    df_millennium_nov = load_raw_csv(millennium_nov_file)
-    df_revolut_nov = load_raw_csv(revolut_nov_file)
-    df_millennium_dez = load_raw_csv(millennium_dez_file)
-    df_revolut_dez = load_raw_csv(revolut_dez_file)
-    df_processed = pd.read_csv(processed_file)
-    
-    df_millennium_total = pd.concat([df_millennium_nov, df_millennium_dez], ignore_index=True)
-    df_revolut_total = pd.concat([df_revolut_nov, df_revolut_dez], ignore_index=True)
-    
-    print("\n📊 TOTAIS RAW (MILLENNIUM - NOVEMBRO):")
-    print(f"Total linhas: {len(df_millennium_nov)}")
-    
-    debito_col = None
-    credito_col = None
-    for col in df_millennium_nov.columns:
-        col_lower = col.lower()
-        if 'debit' in col_lower or 'débito' in col_lower:
-            debito_col = col
-        if 'credit' in col_lower or 'crédito' in col_lower:
-            credito_col = col
-    
-    if debito_col:
-        total_debito = df_millennium_nov[debito_col].sum()
-        print(f"Total Débito: {total_debito:.2f}€")
-    if credito_col:
-        total_credito = df_millennium_nov[credito_col].sum()
-        print(f"Total Crédito: {total_credito:.2f}€")
-    
-    print("\n📊 TOTAIS RAW (REVOLUT - NOVEMBRO):")
-    print(f"Total linhas: {len(df_revolut_nov)}")
-    
-    debito_col = None
-    credito_col = None
-    for col in df_revolut_nov.columns:
-        col_lower = col.lower()
-        if 'debit' in col_lower or 'débito' in col_lower:
-            debito_col = col
-        if 'credit' in col_lower or 'crédito' in col_lower:
-            credito_col = col
-    
-    if debito_col:
-        total_debito = df_revolut_nov[debito_col].sum()
-        print(f"Total Débito: {total_debito:.2f}€")
-    if credito_col:
-        total_credito = df_revolut_nov[credito_col].sum()
-        print(f"Total Crédito: {total_credito:.2f}€")
-    
-    print("\n📊 TOTAIS RAW (MILLENNIUM - DEZEMBRO):")
-    print(f"Total linhas: {len(df_millennium_dez)}")
-    
-    debito_col = None
-    credito_col = None
-    for col in df_millennium_dez.columns:
-        col_lower = col.lower()
-        if 'debit' in col_lower or 'débito' in col_lower:
-            debito_col = col
-        if 'credit' in col_lower or 'crédito' in col_lower:
-            credito_col = col
-    
-    if debito_col:
-        total_debito = df_millennium_dez[debito_col].sum()
-        print(f"Total Débito: {total_debito:.2f}€")
-    if credito_col:
-        total_credito = df_millennium_dez[credito_col].sum()
-        print(f"Total Crédito: {total_credito:.2f}€")
+    print(f"✅ Encontrados {len(pares)} pares")
+    for par in pares.itertuples(index=False):
+        imprimir_par(df, par)
     
-    print("\n📊 TOTAIS RAW (REVOLUT - DEZEMBRO):")
-    print(f"Total linhas: {len(df_revolut_dez)}")
-    
-    debito_col = None
-    credito_col = None
-    for col in df_revolut_dez.columns:
-        col_lower = col.lower()
-        if 'debit' in col_lower or 'débito' in col_lower:
-            debito_col = col
-        if 'credit' in col_lower or 'crédito' in col_lower:
-            credito_col = col
-    
-    if debito_col:
-        total_debito = df_revolut_dez[debito_col].sum()
-        print(f"Total Débito: {total_debito:.2f}€")
-    if credito_col:
-        total_credito = df_revolut_dez[credito_col].sum()
-        print(f"Total Crédito: {total_credito:.2f}€")
-    
-    print("\n📊 TOTAIS RAW (TODOS OS ARQUIVOS):")
-    print(f"Total linhas Millennium: {len(df_millennium_total)}")
-    print(f"Total linhas Revolut: {len(df_revolut_total)}")
-    print(f"Total linhas RAW: {len(df_millennium_total) + len(df_revolut_total)}")
-    
-    total_debito_mill = df_millennium_total['Debit'].sum()
-    total_credito_mill = df_millennium_total['Credit'].sum()
-    total_debito_rev = df_revolut_total['Debit'].sum()
-    total_credito_rev = df_revolut_total['Credit'].sum()
-    
-    print(f"Total Débito Millennium: {total_debito_mill:.2f}€")
-    print(f"Total Crédito Millennium: {total_credito_mill:.2f}€")
-    print(f"Total Débito Revolut: {total_debito_rev:.2f}€")
-    print(f"Total Crédito Revolut: {total_credito_rev:.2f}€")
-    print(f"TOTAL DÉBITO RAW: {total_debito_mill + total_debito_rev:.2f}€")
-    print(f"TOTAL CRÉDITO RAW: {total_credito_mill + total_credito_rev:.2f}€")
+    nao_transferencia = pares[
+        (df.loc[pares['debito'], 'Categoria'].to_numpy() != 'Transferência Interna') |
+        (df.loc[pares['credito'], 'Categoria'].to_numpy() != 'Transferência Interna')
+    ]
+    if len(nao_transferencia) > 0:
+        print(f"\n⚠️  {len(nao_transferencia)} PARES COM UM LADO FORA DE 'Transferência Interna' (REPROCESSAR PARA MARCAR)")
     
-    print("\n📊 TOTAIS PROCESSADO:")
-    print(f"Total linhas: {len(df_processed)}")
-    total_debito = df_processed['Debit'].sum()
-    total_credito = df_processed['Credit'].sum()
-    print(f"Total Débito: {total_debito:.2f}€")
-    print(f"Total Crédito: {total_credito:.2f}€")
+    if len(conflitos) > 0:
+        print(f"\n⚠️  {len(conflitos)} PARES COM UM LADO CLASSIFICADO NOUTRA CATEGORIA (NÃO SÃO MARCADOS, REVER À MÃO)")
+        for par in conflitos.itertuples(index=False):
+            imprimir_par(df, par)
+
+def comparar_totais():
+    print("\n" + "="*80)
+    print("COMPARAÇÃO DE TOTAIS RAW VS PROCESSADO")
+    print("="*80)
     
-    df_novembro = df_processed[df_processed['Date'].str.startswith('2025-11')]
-    print(f"\n📊 TOTAIS NOVEMBRO 2025:")
-    print(f"Total linhas: {len(df_novembro)}")
-    total_debito_nov = df_novembro['Debit'].sum()
-    total_credito_nov = df_novembro['Credit'].sum()
-    print(f"Total Débito: {total_debito_nov:.2f}€")
-    print(f"Total Crédito: {total_credito_nov:.2f}€")
+    # Cada partição raw lida uma vez; totais e somas de verificação por banco/mês numa só passagem
+    comparacao = reconciliar()
+    imprimir_reconciliacao(comparacao)
     
-    df_dezembro = df_processed[df_processed['Date'].str.startswith('2025-12')]
-    print(f"\n📊 TOTAIS DEZEMBRO 2025:")
-    print(f"Total linhas: {len(df_dezembro)}")
-    total_debito_dez = df_dezembro['Debit'].sum()
-    total_credito_dez = df_dezembro['Credit'].sum()
-    print(f"Total Débito: {total_debito_dez:.2f}€")
-    print(f"Total Crédito: {total_credito_dez:.2f}€")
+    print("\n📊 TOTAIS (TODAS AS PARTIÇÕES):")
+    for lado in ('raw', 'processado'):
+        print(f"Total linhas {lado.upper()}: {int(comparacao[f'linhas_{lado}'].sum())}")
+        print(f"Total Débito {lado.upper()}: {comparacao[f'debito_{lado}'].sum() / 100:.2f}€")
+        print(f"Total Crédito {lado.upper()}: {comparacao[f'credito_{lado}'].sum() / 100:.2f}€")
 
 def verificar_aprendizagem_bcp():
     print("\n" + "="*80)
@@ -367,6 +186,7 @@ if __name__ == "__main__":
     
     analise_bcp_500()
     analise_cartao_8373()
+    analise_transferencias_internas()
     verificar_aprendizagem_bcp()
     verificar_aprendizagem_cartao()
     comparar_totais()
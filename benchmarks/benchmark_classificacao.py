@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 BENCHMARK DE INGESTÃO E CLASSIFICAÇÃO
+Mede linhas/segundo e pico de memória de processar_millennium,
+preparar_exportacoes (Revolut), conversão de montantes e datas (linha a linha
+e vetorizada), classificar_transacao e sugerir_categoria com dados
+sintéticos, e grava os resultados em JSON para comparar entre commits
+
+Uso:
+    python3 benchmarks/benchmark_classificacao.py --tamanhos 1000 100000 1000000
+    python3 benchmarks/benchmark_classificacao.py --comparar benchmarks/resultados/anterior.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import pandas as pd
+
+from benchmarks.gerador_sintetico import GeradorSintetico
+from conversao_vetorizada import converter_datas, converter_montantes, parse_montante
+from preparar_csvs_nov_dez import preparar_exportacoes, processar_millennium
+from processar_novembro_dezembro_2025 import ProcessadorNovembroDezembro
+
+PASTA_RESULTADOS = RAIZ / 'benchmarks' / 'resultados'
+
+
+def medir(funcao, linhas, memoria=True):
+    """Executa funcao() e devolve segundos, linhas/s e pico de memória (MB).
+
+    O tempo é medido numa execução sem tracemalloc (que abranda bastante o
+    código com muitas alocações); o pico de memória numa segunda execução.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        funcao()
+        segundos = time.perf_counter() - inicio
+
+        pico = None
+        if memoria:
+            tracemalloc.start()
+            funcao()
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    return {
+        'linhas': linhas,
+        'segundos': round(segundos, 4),
+        'linhas_por_segundo': round(linhas / segundos, 1) if segundos else None,
+        'pico_memoria_mb': round(pico / 1024 / 1024, 2) if pico is not None else None
+    }
+
+
+def _sugerir_categoria():
+    try:
+        from dashboard_validacao_novembro_dezembro import sugerir_categoria
+    except ImportError:
+        return None
+    return sugerir_categoria
+
+
+def correr(tamanhos, semente, memoria=True):
+    """Mede cada tamanho; as regras e a aprendizagem vêm do diretório atual (a raiz do repositório em main())"""
+    resultados = {}
+    processador = ProcessadorNovembroDezembro()
+    processador.motor.cache = None
+    sugerir_categoria = _sugerir_categoria()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        pasta = Path(pasta)
+        for linhas in tamanhos:
+            print(f"\n📏 {linhas} linhas")
+            gerador = GeradorSintetico(semente)
+            medidas = {}
+
+            millennium = pasta / f'millennium_{linhas}.csv'
+            revolut = pasta / f'revolut_{linhas}.csv'
+            gerador.millennium(millennium, linhas)
+            gerador.revolut(revolut, linhas)
+
+            medidas['processar_millennium'] = medir(
+                lambda: processar_millennium(str(millennium), str(pasta / 'saida_millennium.csv'), 'Millennium'),
+                linhas,
+                memoria
+            )
+            medidas['preparar_revolut'] = medir(
+                lambda: preparar_exportacoes([('revolut', str(revolut))], str(pasta / 'raw')),
+                linhas,
+                memoria
+            )
+
+            datas, montantes = gerador.colunas_millennium(linhas)
+            medidas['parse_montante'] = medir(lambda: [parse_montante(m) for m in montantes], linhas, memoria)
+            medidas['converter_montantes'] = medir(lambda: converter_montantes(montantes), linhas, memoria)
+            medidas['strptime'] = medir(
+                lambda: [datetime.strptime(d.strip(), '%d-%m-%Y') for d in datas], linhas, memoria
+            )
+            medidas['converter_datas'] = medir(lambda: converter_datas(datas), linhas, memoria)
+
+            df = pd.DataFrame(gerador.normalizado(linhas))
+
+            def por_linha():
+                for transacao in df.to_dict('records'):
+                    processador.classificar_transacao(transacao)
+
+            medidas['classificar_transacao'] = medir(por_linha, linhas, memoria)
+            medidas['classificar_lote'] = medir(lambda: processador.classificar_lote(df), linhas, memoria)
+
+            if sugerir_categoria is not None:
+                def sugerir():
+                    for row in df.to_dict('records'):
+                        sugerir_categoria(row, processador.motor, processador.aprendizagem)
+
+                medidas['sugerir_categoria'] = medir(sugerir, linhas, memoria)
+
+            for nome, medida in medidas.items():
+                memoria_mb = f"{medida['pico_memoria_mb']:>8.1f} MB" if medida['pico_memoria_mb'] is not None else ''
+                print(f"   {nome:25} {medida['linhas_por_segundo']:>14,.0f} linhas/s  {memoria_mb}")
+            resultados[str(linhas)] = medidas
+
+    return resultados
+
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def comparar(atual, anterior):
+    print(f"\n📊 Comparação com {anterior['commit']} ({anterior['data']})")
+    for linhas, medidas in atual['resultados'].items():
+        for nome, medida in medidas.items():
+            antes = anterior['resultados'].get(linhas, {}).get(nome)
+            if not antes or not antes['linhas_por_segundo']:
+                continue
+            razao = medida['linhas_por_segundo'] / antes['linhas_por_segundo']
+            sinal = '🟢' if razao >= 0.95 else '🔴'
+            print(f"   {sinal} {linhas:>8} {nome:25} {razao:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da ingestão e classificação")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--sem-memoria', action='store_true', help="Não mede o pico de memória (metade do tempo)")
+    args = parser.parse_args()
+    comparar_com = os.path.abspath(args.comparar) if args.comparar else None
+    os.chdir(RAIZ)
+
+    print("=" * 60)
+    print("🏺 BENCHMARK DE INGESTÃO E CLASSIFICAÇÃO")
+    print("=" * 60)
+
+    execucao = {
+        'commit': commit_atual(),
+        'data': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'semente': args.semente,
+        'resultados': correr(args.tamanhos, args.semente, not args.sem_memoria)
+    }
+
+    PASTA_RESULTADOS.mkdir(parents=True, exist_ok=True)
+    destino = PASTA_RESULTADOS / f"{datetime.now():%Y%m%d_%H%M%S}_{execucao['commit'] or 'sem_commit'}.json"
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump(execucao, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados: {destino}")
+
+    if comparar_com:
+        with open(comparar_com, 'r', encoding='utf-8') as f:
+            comparar(execucao, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
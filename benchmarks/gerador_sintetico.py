@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 GERADOR DE TRANSAÇÕES SINTÉTICAS
+Exportações Millennium (UTF-16, ';', decimais portugueses) e Revolut
+com descrições tiradas do vocabulário real das regras V5_1
+"""
+
+import csv
+import random
+from datetime import date, timedelta
+
+from motor_regras import carregar_regras
+
+COMERCIANTES_SEM_REGRA = [
+    'papelaria central', 'loja do bairro', 'quiosque 24h', 'mercearia silva',
+    'tabacaria rossio', 'feira da ladra', 'livraria almedina'
+]
+
+
+class GeradorSintetico:
+    """Gerador determinístico (semente fixa) de exportações bancárias"""
+
+    def __init__(self, semente=42, inicio=date(2025, 11, 1), fim=date(2025, 12, 31)):
+        self.aleatorio = random.Random(semente)
+        self.inicio = inicio
+        self.dias = (fim - inicio).days + 1
+
+        regras = carregar_regras()
+        self.vocabulario = {'credit': [], 'debit': []}
+        for regra in regras.values():
+            tipicos = regra.get('valores_tipicos', [])
+            for palavra in regra.get('palavras_chave', []):
+                for tipo in ('credit', 'debit'):
+                    if regra.get('tipo') in (tipo, 'both'):
+                        self.vocabulario[tipo].append((palavra, tipicos))
+
+    def _transacao(self):
+        a = self.aleatorio
+        credito = a.random() < 0.15
+        data = self.inicio + timedelta(days=a.randrange(self.dias))
+
+        if a.random() < 0.2:
+            palavra, tipicos = a.choice(COMERCIANTES_SEM_REGRA), []
+        else:
+            palavra, tipicos = a.choice(self.vocabulario['credit' if credito else 'debit'])
+
+        if tipicos and a.random() < 0.5:
+            montante = a.choice(tipicos)
+        else:
+            montante = round(a.lognormvariate(3, 1.2), 2)
+        montante = max(montante, 0.01)
+
+        return data, palavra, montante if credito else -montante
+
+    @staticmethod
+    def _montante_pt(montante):
+        return f"{montante:,.2f}".replace(',', ' ').replace('.', ',').replace(' ', '.')
+
+    def millennium(self, caminho, linhas):
+        """Exportação Millennium: preâmbulo, cabeçalho e linhas em UTF-16-LE"""
+        a = self.aleatorio
+        with open(caminho, 'w', encoding='utf-16-le', newline='') as f:
+            f.write('﻿')
+            f.write('Movimentos de Conta\r\n')
+            f.write('Conta;0000000000000\r\n\r\n')
+            f.write('Data lançamento;Data valor;Descrição;Montante;Tipo;Saldo\r\n')
+            for _ in range(linhas):
+                data, palavra, montante = self._transacao()
+                prefixo = a.choice(['COMPRA 6340 ', 'DD ', 'TRF ', ''])
+                montante_pt = self._montante_pt(montante)
+                f.write(
+                    f"{data:%d-%m-%Y};{data:%d-%m-%Y};{prefixo}{palavra.upper()} {a.randrange(100, 999)};"
+                    f"{montante_pt};{'Crédito' if montante > 0 else 'Débito'};0,00\r\n"
+                )
+
+    def revolut(self, caminho, linhas):
+        """Exportação Revolut em UTF-8 com separador ','"""
+        a = self.aleatorio
+        with open(caminho, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Tipo', 'Produto', 'Data de início', 'Data de Conclusão', 'Descrição',
+                             'Montante', 'Comissão', 'Moeda', 'Estado', 'Saldo'])
+            for _ in range(linhas):
+                data, palavra, montante = self._transacao()
+                momento = f"{data:%Y-%m-%d} {a.randrange(24):02d}:{a.randrange(60):02d}:{a.randrange(60):02d}"
+                writer.writerow([
+                    'Pagamento com cartão' if montante < 0 else 'Carregamento', 'Atual',
+                    momento, momento, palavra.title(), f"{montante:.2f}", '0.00', 'EUR', 'CONCLUÍDA', '0.00'
+                ])
+
+    def colunas_millennium(self, linhas):
+        """Colunas 'Data lançamento' e 'Montante' tal como vêm na exportação Millennium"""
+        datas, montantes = [], []
+        for _ in range(linhas):
+            data, _, montante = self._transacao()
+            datas.append(f"{data:%d-%m-%Y}")
+            montantes.append(self._montante_pt(montante))
+        return datas, montantes
+
+    def normalizado(self, linhas):
+        """Linhas já no formato do sistema (Date/Bank/Description/Valor/Debit/Credit)"""
+        for _ in range(linhas):
+            data, palavra, montante = self._transacao()
+            yield {
+                'Date': data.strftime('%Y-%m-%d'),
+                'Bank': 'Millennium',
+                'Description': palavra.upper(),
+                'Valor': abs(montante),
+                'Debit': -montante if montante < 0 else 0.0,
+                'Credit': montante if montante > 0 else 0.0
+            }
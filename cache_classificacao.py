@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 CACHE DE CLASSIFICAÇÕES
+Memoriza em disco os resultados do motor de regras V5_1 entre execuções
+"""
+
+import json
+import math
+import os
+from collections import OrderedDict
+
+CAMINHO_CACHE = 'data/cache/classificacao_cache.json'
+
+
+def chave_cache(descricao, valor, credito):
+    """Chave: tipo (crédito/débito), montante em cêntimos e descrição normalizada.
+
+    A descrição só é passada a minúsculas (é o texto que o motor procura) e o
+    montante ao cêntimo, por isso o resultado em cache é exatamente o que o
+    motor devolveria. Um montante ilegível (NaN, infinito) fica 'nan': nunca
+    dá o bónus de valor típico, por isso o resultado só depende da descrição.
+    """
+    montante = int(round(valor * 100)) if math.isfinite(valor) else 'nan'
+    return f"{'c' if credito else 'd'}|{montante}|{str(descricao).lower()}"
+
+
+class CacheClassificacao:
+    """Cache LRU persistente de (categoria, confiança).
+
+    O ficheiro guarda o hash das regras com que foi preenchido; se o
+    ficheiro de regras mudar, a cache é descartada ao carregar.
+    """
+
+    def __init__(self, hash_regras, caminho=CAMINHO_CACHE, max_entradas=50000):
+        self.hash_regras = hash_regras
+        self.caminho = caminho
+        self.max_entradas = max_entradas
+        self.entradas = OrderedDict()
+        self.alterada = False
+        self._carregar()
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+        except Exception:
+            self.alterada = True
+            return
+
+        if dados.get('hash_regras') != self.hash_regras:
+            self.alterada = True
+            return
+
+        self.entradas = OrderedDict(
+            (chave, tuple(resultado)) for chave, resultado in dados.get('entradas', [])
+        )
+
+    def obter(self, chave):
+        resultado = self.entradas.get(chave)
+        if resultado is not None:
+            self.entradas.move_to_end(chave)
+        return resultado
+
+    def guardar(self, chave, categoria, confianca):
+        self.entradas[chave] = (categoria, float(confianca))
+        self.entradas.move_to_end(chave)
+        while len(self.entradas) > self.max_entradas:
+            self.entradas.popitem(last=False)
+        self.alterada = True
+
+    def salvar(self):
+        """Grava a cache em disco (só se mudou), de forma atómica"""
+        if not self.alterada:
+            return
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({
+                'hash_regras': self.hash_regras,
+                'entradas': [[chave, list(resultado)] for chave, resultado in self.entradas.items()]
+            }, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+        self.alterada = False
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 CONVERSÃO VETORIZADA
+Montantes portugueses ('1.234,56 €') e datas das exportações convertidos em
+bloco com as operações de texto do pandas (colunas pyarrow), com os mesmos
+resultados da conversão linha a linha
+"""
+
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Números que float() aceita sem casos especiais ('nan', 'inf', '1_000' passam por parse_montante)
+NUMERO = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+
+
+def parse_montante(montante_str: str):
+    s = (montante_str or '').strip()
+    if not s:
+        return None
+
+    s = re.sub(r'[€\s]', '', s)
+
+    if ',' in s and '.' in s:
+        s = s.replace('.', '').replace(',', '.')
+    elif ',' in s:
+        s = s.replace(',', '.')
+
+    try:
+        return float(s)
+    except Exception:
+        return None
+
+
+def _textos(valores):
+    """Coluna de texto pyarrow, com NA onde o valor não é texto"""
+    try:
+        array = pa.array(valores, type=pa.string())
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        array = pa.array([valor if isinstance(valor, str) else None for valor in valores], type=pa.string())
+    return pd.Series(pd.arrays.ArrowStringArray(array))
+
+
+def _converter_linha_a_linha(valores, indices, converter, resultado, rejeitados):
+    for i in indices.tolist():
+        valor = converter(valores[i])
+        if valor is None:
+            rejeitados[i] = True
+        else:
+            resultado[i] = valor
+
+
+def _montante_de_valor(valor):
+    if valor is not None and not isinstance(valor, str):
+        return None
+    return parse_montante(valor)
+
+
+def converter_montantes(valores):
+    """Converte uma coluna de montantes como parse_montante, em bloco.
+
+    Devolve (float64, rejeitados): NaN e True onde parse_montante devolve
+    None. '€' e espaços saem com str.replace, os separadores são trocados
+    como em parse_montante e os textos que são um NUMERO são convertidos
+    com astype (arredondamento correto, como float()); as outras linhas
+    passam por parse_montante.
+    """
+    valores = list(valores)
+    limpos = _textos(valores).str.replace(r'[€\s]', '', regex=True)
+    # Com vírgula, os pontos são de milhares (com ou sem pontos, o resultado de parse_montante é este)
+    virgula = limpos.str.contains(',', regex=False).fillna(False)
+    limpos = limpos.mask(virgula, limpos.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+
+    numeros = limpos.where(limpos.str.fullmatch(NUMERO).fillna(False))
+    resultado = numeros.astype('float64[pyarrow]').to_numpy(dtype=float, na_value=np.nan, copy=True)
+    rejeitados = np.zeros(len(valores), dtype=bool)
+    _converter_linha_a_linha(valores, np.flatnonzero(numeros.isna()), _montante_de_valor, resultado, rejeitados)
+    return resultado, rejeitados
+
+
+def converter_datas(valores, formato='%d-%m-%Y', ate_espaco=False):
+    """Converte uma coluna de datas como datetime.strptime(valor.strip(), formato).
+
+    Com `ate_espaco`, só conta o texto até ao primeiro espaço (como
+    valor.strip().split(' ')[0], para 'AAAA-MM-DD HH:MM:SS'). Devolve
+    (datetime64[D], rejeitados), com NaT onde strptime falharia. A coluna
+    é convertida com pd.to_datetime(format=...); as linhas que este não
+    converte passam por strptime.
+    """
+    def converter(valor):
+        if not isinstance(valor, str):
+            return None
+        texto = valor.strip()
+        if ate_espaco:
+            texto = texto.split(' ')[0]
+        try:
+            return np.datetime64(datetime.strptime(texto, formato).date(), 'D')
+        except ValueError:
+            return None
+
+    valores = list(valores)
+    textos = _textos(valores).str.strip()
+    if ate_espaco:
+        textos = textos.str.split(' ', n=1).str[0]
+
+    resultado = pd.to_datetime(textos, format=formato, errors='coerce').to_numpy(dtype='datetime64[D]', copy=True)
+    rejeitados = np.zeros(len(valores), dtype=bool)
+    _converter_linha_a_linha(valores, np.flatnonzero(np.isnat(resultado)), converter, resultado, rejeitados)
+    return resultado, rejeitados
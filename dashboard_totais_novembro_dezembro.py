@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
+
+from armazem_transacoes import RAIZ_ARMAZEM, particoes
+from livro_transacoes import consultar_transacoes
+from resumo_categorias import agregar, resumo_mes
 
 st.set_page_config(
     page_title="📊 Totais Novembro/Dezembro 2025",
@@ -10,14 +13,11 @@ st.set_page_config(
 
 st.title("📊 Totais Financeiros - Novembro/Dezembro 2025")
 
-arquivo_dados = 'data/processed/novembro_dezembro_2025_classificado.csv'
-
-if not Path(arquivo_dados).exists():
-    st.error(f"Ficheiro não encontrado: {arquivo_dados}")
+if not particoes(RAIZ_ARMAZEM, anos=[2025], meses=[11, 12]):
+    st.error(f"Sem partições de novembro/dezembro 2025 em: {RAIZ_ARMAZEM}")
     st.stop()
 
-df = pd.read_csv(arquivo_dados)
-df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+df = consultar_transacoes(anos=[2025], meses=[11, 12])
 
 st.sidebar.header("⚙️ Opções")
 incluir_transferencias = st.sidebar.checkbox(
@@ -26,107 +26,16 @@ incluir_transferencias = st.sidebar.checkbox(
     help="Mostrar ou esconder transferências entre contas próprias"
 )
 
-if incluir_transferencias:
-    df_filtrado = df.copy()
-else:
-    df_filtrado = df[df['Categoria'] != 'Transferência Interna'].copy()
-
-df_novembro = df_filtrado[df_filtrado['Date'].dt.month == 11]
-df_dezembro = df_filtrado[df_filtrado['Date'].dt.month == 12]
-
-ordem_categorias_excel = [
-    'Casa - Renda Fontanelas',
-    'Casa - Renda Monte da Caparica',
-    'Casa - Supermercado Bilal',
-    'Casa - Supermercado Daniela',
-    'Casa - Luz',
-    'Casa - Internet (Net)',
-    'Casa - Limpeza',
-    'Casa - Outros',
-    'Pessoal Bilal - Comer fora',
-    'Pessoal Bilal - Vestuário/calçado',
-    'Pessoal Bilal - Férias/viagens/Passeios',
-    'Pessoal Bilal - Livros/Cinema/Concertos',
-    'Pessoal Bilal - Donativos/Quotas',
-    'Pessoal Bilal - Barbeiro',
-    'Pessoal Bilal - Presentes',
-    'Pessoal Bilal - Outros',
-    'Créditos/Seguros Bilal - Pessoal Millennium',
-    'Créditos/Seguros Bilal - Wizink',
-    'Créditos/Seguros Bilal - Seg vida',
-    'Créditos/Seguros Bilal - Cliente frequente',
-    'Créditos/Seguros Bilal - Despesas bancárias Bilal',
-    'Créditos/Seguros Bilal - Despesas Bancárias Bilal',
-    'Deslocações Bilal - Transportes',
-    'Deslocações Bilal - Via Verde',
-    'Deslocações Bilal - Carro',
-    'Deslocações Bilal - Combustível',
-    'Deslocações Bilal - Estacionamento',
-    'Deslocações Bilal - ACP',
-    'Saúde - Consultas Bilal',
-    'Saúde - Consultas Daniela',
-    'Saúde - Farmácia/Prod.Nat./Exames',
-    'Saúde - Pruvit',
-    'Saúde - Ginásio',
-    'Saúde - Lifewave',
-    'Noah - Pensão de Alimentos',
-    'Noah - Pensão de alimentos',
-    'Noah - Desporto',
-    'Noah - Consultas',
-    'Noah - Roupa',
-    'Noah - Outros',
-    'Despesas Profissionais Bilal - Mensalidades (Replit, GPT, etc.)',
-    'Despesas Profissionais Bilal - Mensalidade (Replit, GPT, etc.)',
-    'Despesas Profissionais Bilal - Formação Bilal',
-    'Despesas Profissionais Bilal - Seg. Social Bilal',
-    'Despesas Profissionais Bilal - Produtos (Lifewave/Pruvit, etc.)',
-    'Despesas Profissionais Bilal - Marketing digital',
-    'Despesas Profissionais Bilal - BNI',
-    'Receitas - Sessões Bilal',
-    'Receitas - Limpezas Espaços',
-    'Receitas - Workshop TMD',
-    'Receitas - Aulas Individuais',
-    'Receitas - Soluções IA',
-    'Receitas - Lifewave',
-    'Receitas - Pruvit',
-    'Receitas - Rendas Fontanelas',
-    'Receitas - Electricidade Fontanelas',
-    'Receitas - Renda Monte da Caparica',
-    'Despesas de Crédito',
-    'Pessoal Bilal - Transferências',
-    'Estorno/Devolução',
-    'Transferência Interna'
-]
-
-def criar_resumo(df, nome_mes):
-    resumo = []
-    total_debit = 0
-    total_credit = 0
-    
-    for cat in ordem_categorias_excel:
-        if not incluir_transferencias and cat == 'Transferência Interna':
-            continue
-            
-        df_cat = df[df['Categoria'] == cat]
-        if len(df_cat) > 0:
-            debit = df_cat['Debit'].sum()
-            credit = df_cat['Credit'].sum()
-            total_debit += debit
-            total_credit += credit
-            
-            saldo = credit - debit
-            cor = "🟢" if saldo >= 0 else "🔴"
-            
-            resumo.append({
-                'Categoria': cat,
-                'Despesas (€)': debit,
-                'Receitas (€)': credit,
-                'Saldo (€)': saldo,
-                'Status': cor
-            })
-    
-    resumo_df = pd.DataFrame(resumo)
+# Um só groupby (mês, categoria, banco); as tabelas mensais saem do agregado
+agregado = agregar(df)
+
+def criar_resumo(mes, nome_mes, ano=2025):
+    resumo_df = resumo_mes(agregado, ano, mes, incluir_transferencias)
+    resumo_df = resumo_df.rename(columns={'Debit': 'Despesas (€)', 'Credit': 'Receitas (€)', 'Saldo': 'Saldo (€)'})
+    resumo_df['Status'] = ["🟢" if saldo >= 0 else "🔴" for saldo in resumo_df['Saldo (€)']]
     
+    total_debit = resumo_df['Despesas (€)'].sum()
+    total_credit = resumo_df['Receitas (€)'].sum()
     total_saldo = total_credit - total_debit
     cor_total = "🟢" if total_saldo >= 0 else "🔴"
     
@@ -147,14 +56,14 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("📅 Novembro 2025")
-    resumo_nov, nov_debit, nov_credit, nov_saldo = criar_resumo(df_novembro, "NOVEMBRO")
+    resumo_nov, nov_debit, nov_credit, nov_saldo = criar_resumo(11, "NOVEMBRO")
     st.dataframe(resumo_nov, use_container_width=True, hide_index=True)
     
     st.metric("Saldo Novembro", f"€{nov_saldo:.2f}", delta=f"{nov_saldo:.2f}")
 
 with col2:
     st.subheader("📅 Dezembro 2025")
-    resumo_dez, dez_debit, dez_credit, dez_saldo = criar_resumo(df_dezembro, "DEZEMBRO")
+    resumo_dez, dez_debit, dez_credit, dez_saldo = criar_resumo(12, "DEZEMBRO")
     st.dataframe(resumo_dez, use_container_width=True, hide_index=True)
     
     st.metric("Saldo Dezembro", f"€{dez_saldo:.2f}", delta=f"{dez_saldo:.2f}")
@@ -190,7 +99,7 @@ st.sidebar.markdown("---")
 st.sidebar.header("📥 Exportar CSV")
 
 if st.sidebar.button("Baixar Novembro"):
-    resumo_nov, _, _, _ = criar_resumo(df_novembro, "NOVEMBRO")
+    resumo_nov, _, _, _ = criar_resumo(11, "NOVEMBRO")
     csv = resumo_nov.to_csv(index=False)
     st.sidebar.download_button(
         label="Baixar Novembro CSV",
@@ -200,7 +109,7 @@ if st.sidebar.button("Baixar Novembro"):
     )
 
 if st.sidebar.button("Baixar Dezembro"):
-    resumo_dez, _, _, _ = criar_resumo(df_dezembro, "DEZEMBRO")
+    resumo_dez, _, _, _ = criar_resumo(12, "DEZEMBRO")
     csv = resumo_dez.to_csv(index=False)
     st.sidebar.download_button(
         label="Baixar Dezembro CSV",
@@ -6,43 +6,57 @@ Validação manual com sistema de aprendizagem automático
 """
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-import json
+import math
 import os
 from datetime import datetime
 from pathlib import Path
 
+from armazem_transacoes import RAIZ_ARMAZEM, particoes
+from aprendizagem_compilada import (
+    CAMINHO_APRENDIZAGEM, CAMINHO_RESUMO_APRENDIZAGEM, CONFIANCA_APRENDIZAGEM, TabelaAprendizagem,
+    acrescentar_registos, compactar_aprendizagem, migrar_aprendizagem
+)
+from indice_historico import IndiceHistorico
+from livro_transacoes import COLUNAS_EDITAVEIS, LivroTransacoes, normalizar_descricao
+from motor_regras import MotorRegras, carregar_regras_compiladas
+
 class GestorAprendizagem:
-    """Gere a gravação automática de validações no sistema de aprendizagem"""
+    """Gere a gravação automática de validações no sistema de aprendizagem.
+
+    As escolhas ficam num buffer e `gravar` acrescenta-as ao registo JSONL
+    numa só escrita (um fsync por ação, quantas linhas a ação tocar); o
+    resumo por sessão é regenerado ao finalizar a sessão.
+    """
 
-    def __init__(self, ficheiro='APRENDIZAGEM_MANUAL_NOVEMBRO_DEZEMBRO.json'):
+    def __init__(self, ficheiro=CAMINHO_APRENDIZAGEM, resumo=CAMINHO_RESUMO_APRENDIZAGEM):
         self.ficheiro = ficheiro
-        self.aprendizagem = self._carregar()
+        self.resumo = resumo
+        migrar_aprendizagem(resumo, ficheiro)
+        self.pendentes = []
         self.sessao_atual = None
 
-    def _carregar(self):
-        if os.path.exists(self.ficheiro):
-            try:
-                with open(self.ficheiro, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {"sessoes": [], "metadata": {"criado": datetime.now().isoformat()}}
-        return {"sessoes": [], "metadata": {"criado": datetime.now().isoformat()}}
-
-    def _salvar(self):
-        self.aprendizagem['metadata']['ultima_atualizacao'] = datetime.now().isoformat()
-        with open(self.ficheiro, 'w', encoding='utf-8') as f:
-            json.dump(self.aprendizagem, f, indent=2, ensure_ascii=False)
+    def gravar(self):
+        if not self.pendentes:
+            return
+        acrescentar_registos(self.pendentes, self.ficheiro)
+        self.pendentes = []
 
     def iniciar_sessao(self):
         if self.sessao_atual is None or self.sessao_atual.get('finalizada', False):
             self.sessao_atual = {
                 "inicio": datetime.now().isoformat(),
                 "tipo": "validacao_dashboard",
-                "escolhas": [],
+                "escolhas": 0,
                 "finalizada": False
             }
-            self.aprendizagem['sessoes'].append(self.sessao_atual)
+            self.pendentes.append({
+                "registo": "sessao",
+                "sessao": self.sessao_atual['inicio'],
+                "inicio": self.sessao_atual['inicio'],
+                "tipo": self.sessao_atual['tipo']
+            })
 
     def registar_escolha(self, transacao_row, categoria_antiga, categoria_nova,
                          sugestao_sistema=None, confianca_sugestao=0.0):
@@ -69,48 +83,82 @@ class GestorAprendizagem:
             "categoria_anterior": categoria_antiga
         }
 
-        self.sessao_atual['escolhas'].append(entrada)
-        self._salvar()
+        self.sessao_atual['escolhas'] += 1
+        self.pendentes.append({"registo": "escolha", "sessao": self.sessao_atual['inicio'], **entrada})
 
     def finalizar_sessao(self, total_mudancas):
         if self.sessao_atual and not self.sessao_atual.get('finalizada', False):
             self.sessao_atual['finalizada'] = True
-            self.sessao_atual['fim'] = datetime.now().isoformat()
-            self.sessao_atual['total_escolhas'] = len(self.sessao_atual['escolhas'])
-            self.sessao_atual['total_reclassificadas'] = total_mudancas
-            self._salvar()
+            self.pendentes.append({
+                "registo": "fim",
+                "sessao": self.sessao_atual['inicio'],
+                "fim": datetime.now().isoformat(),
+                "total_escolhas": self.sessao_atual['escolhas'],
+                "total_reclassificadas": total_mudancas
+            })
+        self.gravar()
+        compactar_aprendizagem(self.ficheiro, self.resumo)
 
 def carregar_categorias_disponiveis():
-    """Carrega categorias do sistema V5_1"""
-    with open('SISTEMA_MEMORIAS_REGRAS_CLASSIFICACAO_V5_1.json', 'r', encoding='utf-8') as f:
-        sistema = json.load(f)
-    
-    regras = sistema['sistema_memorias_regras']['regras_classificacao_melhoradas']
-    categorias_unicas = set()
-    
-    for regra_id, regra in regras.items():
-        categorias_unicas.add(regra['categoria'])
-    
-    return sorted(list(categorias_unicas))
+    """Carrega categorias do sistema V5_1 (a partir do artefacto compilado)"""
+    return list(carregar_regras_compiladas()['categorias'])
 
 def carregar_regras_v5_1():
-    with open('SISTEMA_MEMORIAS_REGRAS_CLASSIFICACAO_V5_1.json', 'r', encoding='utf-8') as f:
-        sistema = json.load(f)
-    return sistema['sistema_memorias_regras']['regras_classificacao_melhoradas']
-
-@st.cache_data
-def carregar_csv_local(caminho: str, mtime: float):
-    return pd.read_csv(caminho)
-
-@st.cache_data
-def carregar_mapa_historico():
-    fontes = [
-        Path('OUTUBRO_2025_VALIDADO.csv'),
-        Path('data/raw/dados_setembro_apenas.csv')
-    ]
-
+    return carregar_regras_compiladas()['regras']
+
+MESES = {"Novembro": 11, "Dezembro": 12}
+LINHAS_COMPACTACAO = 200
+TAMANHOS_PAGINA = [10, 25, 50, 100]
+
+@st.cache_resource
+def abrir_livro():
+    return LivroTransacoes()
+
+def carregar_livro(livro):
+    """Todas as transações do livro, indexadas por Id (para editar por Id)"""
+    df = livro.consultar()
+    df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+    df.index = df['Id'].values
+    return df
+
+def guardar_no_livro(livro, df, indices):
+    """Grava no livro as colunas editáveis das linhas `indices` (uma transação)"""
+    if livro is None or not indices:
+        return
+    try:
+        livro.atualizar((i, {coluna: df.at[i, coluna] for coluna in COLUNAS_EDITAVEIS}) for i in indices)
+    except Exception as e:
+        st.error(f"Erro a guardar no livro: {e}")
+
+def aplicar_na_sessao(df, alteracoes, sugestoes, motor, aprendizagem):
+    """Reflete no DataFrame da sessão as linhas repostas por desfazer/refazer.
+
+    O livro já anulou/repôs a escolha de aprendizagem dessas linhas; as
+    sugestões das descrições afetadas são recalculadas.
+    """
+    for id_transacao, valores in alteracoes:
+        if id_transacao in df.index:
+            for coluna, valor in valores.items():
+                df.at[id_transacao, coluna] = valor
+        # O selectbox guarda o seu próprio estado; sem isto mostraria o valor antigo
+        st.session_state.pop(f"cat_{id_transacao}", None)
+    ids = df.index.intersection([id_transacao for id_transacao, _ in alteracoes])
+    atualizar_sugestoes(sugestoes, df, df.loc[ids, 'Description'].unique(), motor, aprendizagem)
+
+def _fontes_historico():
+    fontes = sorted(Path('.').glob('*_VALIDADO.csv'))
+    fontes.append(Path('data/raw/dados_setembro_apenas.csv'))
+    return fontes
+
+@st.cache_data(max_entries=1)
+def carregar_historico_validado(_livro=None, versao_livro=()):
+    """Descrições validadas (normalizadas) com uma única categoria no histórico.
+
+    Junta os meses validados (*_VALIDADO.csv, setembro) e as linhas já
+    validadas manualmente no livro atual (só as colunas necessárias).
+    """
     frames = []
-    for p in fontes:
+    for p in _fontes_historico():
         if not p.exists():
             continue
         try:
@@ -119,49 +167,135 @@ def carregar_mapa_historico():
             continue
         if 'Description' not in df.columns or 'Categoria' not in df.columns:
             continue
+        frames.append(df[['Description', 'Categoria']])
 
-        tmp = df[['Description', 'Categoria']].copy()
-        tmp['Categoria'] = tmp['Categoria'].fillna('').astype(str)
-        tmp = tmp[tmp['Categoria'].str.strip().str.lower().ne('nao categorizado')]
-        tmp['_desc_norm'] = tmp['Description'].astype(str).str.lower().str.strip()
-        frames.append(tmp[['_desc_norm', 'Categoria']])
+    if _livro is not None:
+        try:
+            frames.append(_livro.consultar(['Description', 'Categoria'], observacao_prefixo='Validado manualmente'))
+        except Exception:
+            pass
 
     if not frames:
-        return {}
+        return pd.DataFrame(columns=['_desc_norm', 'Categoria'])
 
     hist = pd.concat(frames, ignore_index=True)
-    catsets = hist.groupby('_desc_norm')['Categoria'].agg(lambda s: sorted(set(s)))
-    return {desc: cats[0] for desc, cats in catsets.items() if len(cats) == 1}
+    hist['Categoria'] = hist['Categoria'].fillna('').astype(str)
+    hist = hist[hist['Categoria'].str.strip().ne('') & hist['Categoria'].str.strip().str.lower().ne('nao categorizado')]
+    hist['_desc_norm'] = hist['Description'].astype(str).str.lower().str.strip()
 
-def sugerir_categoria(row, regras):
-    descricao = str(row['Description']).lower()
-    valor = row['Valor']
-    tipo_transacao = 'credit' if row.get('Credit', 0) > 0 else 'debit'
-
-    melhor_categoria = None
-    melhor_confianca = 0.0
-
-    for _, regra in regras.items():
-        if regra.get('tipo') not in [tipo_transacao, 'both']:
-            continue
-
-        palavras_chave = regra.get('palavras_chave', [])
-        for palavra in palavras_chave:
-            if palavra.lower() in descricao:
-                confianca = float(regra.get('confianca', 0.5))
-
-                valores_tipicos = regra.get('valores_tipicos', [])
-                for v_tipico in valores_tipicos:
-                    if abs(valor - v_tipico) / max(v_tipico, 0.01) < 0.15:
-                        confianca += 0.1
-                        break
-
-                if confianca > melhor_confianca:
-                    melhor_confianca = confianca
-                    melhor_categoria = regra.get('categoria')
-                break
-
-    return melhor_categoria, melhor_confianca
+    catsets = hist.groupby('_desc_norm')['Categoria'].agg(lambda s: sorted(set(s)))
+    catsets = catsets[catsets.map(len) == 1]
+    return pd.DataFrame({'_desc_norm': catsets.index, 'Categoria': catsets.map(lambda cats: cats[0]).values})
+
+def carregar_mapa_historico(livro=None, versao_livro=()):
+    hist = carregar_historico_validado(livro, versao_livro)
+    return dict(zip(hist['_desc_norm'], hist['Categoria']))
+
+@st.cache_resource(max_entries=1)
+def _indice_historico(hist):
+    return IndiceHistorico(hist['_desc_norm'], hist['Categoria'])
+
+def carregar_indice_historico(livro=None, versao_livro=()):
+    """Índice TF-IDF do histórico validado; só é reconstruído quando o conteúdo do histórico muda"""
+    return _indice_historico(carregar_historico_validado(livro, versao_livro))
+
+@st.cache_resource
+def _motor_regras(hash_regras):
+    motor = MotorRegras.de_ficheiro()
+    motor.usar_cache()
+    return motor
+
+def carregar_motor_regras():
+    return _motor_regras(carregar_regras_compiladas()['hash'])
+
+@st.cache_resource
+def _tabela_aprendizagem():
+    return TabelaAprendizagem()
+
+def carregar_tabela_aprendizagem():
+    tabela = _tabela_aprendizagem()
+    tabela.atualizar()
+    return tabela
+
+def sugerir_categoria(row, motor, aprendizagem=None):
+    credito = row.get('Credit', 0) > 0
+    if aprendizagem is not None:
+        aprendida = aprendizagem.obter(row['Description'], credito)
+        if aprendida:
+            return aprendida, CONFIANCA_APRENDIZAGEM
+    return motor.classificar(row['Description'], row['Valor'], credito)
+
+def sugerir_lote(df, motor, aprendizagem=None):
+    """Sugestao/ConfiancaSugestao de todas as linhas numa passagem vetorizada (= sugerir_categoria)"""
+    creditos = (df['Credit'] > 0).to_numpy()
+    if aprendizagem is not None:
+        sugestoes = aprendizagem.procurar_lote(df['Description'], creditos)
+    else:
+        sugestoes = np.full(len(df), None, dtype=object)
+    por_regras = pd.isna(sugestoes) | (sugestoes == '')
+    confiancas = np.full(len(df), CONFIANCA_APRENDIZAGEM)
+    if por_regras.any():
+        sugestoes[por_regras], confiancas[por_regras] = motor.classificar_lote(
+            df['Description'].to_numpy()[por_regras],
+            df['Valor'].to_numpy()[por_regras],
+            creditos[por_regras]
+        )
+    return pd.DataFrame({'Sugestao': sugestoes, 'ConfiancaSugestao': confiancas}, index=df.index)
+
+def versao_aprendizagem(aprendizagem):
+    """Estado da tabela de aprendizagem: muda com qualquer escolha registada (de qualquer sessão)"""
+    return aprendizagem.origem, aprendizagem.deslocamento
+
+def chaves_aprendizagem(df):
+    """chave_aprendizagem de cada linha, vetorizada"""
+    descricoes = df['Description'].astype(str).str.lower().str.split().str.join(' ')
+    return pd.Series(np.where(df['Credit'] > 0, 'c|', 'd|'), index=df.index) + descricoes
+
+@st.cache_data(max_entries=4, show_spinner="A calcular sugestões...")
+def calcular_sugestoes(_df, _motor, _aprendizagem, versao_dados, hash_regras, versao_aprendizagem):
+    """Sugestões de todo o conjunto, uma vez por versão dos dados, das regras e da aprendizagem"""
+    sugestoes = sugerir_lote(_df, _motor, _aprendizagem)
+    _motor.cache.salvar()
+    return sugestoes
+
+def sugestoes_da_sessao(df, motor, aprendizagem, versao_dados):
+    """Coluna de sugestões da sessão (indexada como `df`); os reruns não avaliam regras.
+
+    A cópia da sessão só é substituída quando mudam os dados, as regras ou
+    a aprendizagem (escolhas de outras sessões ou do processador); as
+    escolhas feitas nesta sessão atualizam apenas as suas linhas
+    (`atualizar_sugestoes`).
+    """
+    chave = (versao_dados, motor.hash_regras, versao_aprendizagem(aprendizagem))
+    estado = st.session_state.get('sugestoes')
+    if estado is None or estado[0] != chave:
+        sugestoes = calcular_sugestoes(
+            df[['Description', 'Valor', 'Credit']], motor, aprendizagem, *chave
+        )
+        estado = st.session_state['sugestoes'] = (chave, sugestoes)
+    return estado[1]
+
+def atualizar_sugestoes(sugestoes, df, descricoes, motor, aprendizagem):
+    """Recalcula só as linhas das `descricoes` validadas e das chaves de aprendizagem que mudaram.
+
+    A chave da sessão só avança para a nova versão da aprendizagem se esta
+    atualização viu todas as escolhas desde a última (outra sessão pode
+    ter lido algumas antes); senão o próximo rerun recalcula tudo.
+    """
+    antes = versao_aprendizagem(aprendizagem)
+    aprendizagem.atualizar()
+    if aprendizagem.alteradas is None:
+        st.session_state.pop('sugestoes', None)
+        return
+    chaves = chaves_aprendizagem(df)
+    validadas = chaves_aprendizagem(df[df['Description'].isin(descricoes)])
+    afetadas = df.index[chaves.isin(aprendizagem.alteradas) | chaves.isin(validadas)]
+    if len(afetadas):
+        sugestoes.loc[afetadas] = sugerir_lote(df.loc[afetadas], motor, aprendizagem)
+
+    estado = st.session_state.get('sugestoes')
+    if estado is not None and estado[1] is sugestoes and estado[0][2] == antes:
+        st.session_state['sugestoes'] = (estado[0][:2] + (versao_aprendizagem(aprendizagem),), sugestoes)
 
 def main():
     st.set_page_config(
@@ -183,15 +317,20 @@ def main():
     4. 🚀 Sistema melhora classificações futuras
     """)
 
-    gestor = GestorAprendizagem()
-    regras = carregar_regras_v5_1()
+    # Uma sessão de aprendizagem por sessão do browser (não por rerun)
+    if 'gestor' not in st.session_state:
+        st.session_state['gestor'] = GestorAprendizagem()
+    gestor = st.session_state['gestor']
+    motor = carregar_motor_regras()
+    aprendizagem = carregar_tabela_aprendizagem()
 
-    caminho_default = str(Path('data/processed/novembro_dezembro_2025_classificado.csv'))
+    raiz_armazem = RAIZ_ARMAZEM
+    existe_armazem = bool(particoes(raiz_armazem))
 
     st.sidebar.markdown("## 📂 Dados")
     usar_ficheiro_local = st.sidebar.checkbox(
-        "Usar ficheiro local (recomendado)",
-        value=os.path.exists(caminho_default)
+        "Usar armazém local (recomendado)",
+        value=existe_armazem
     )
 
     uploaded_file = None
@@ -205,19 +344,26 @@ def main():
     df = None
     fonte_dados = None
     fonte_key = None
-    if usar_ficheiro_local and os.path.exists(caminho_default):
+    livro = None
+    if usar_ficheiro_local and existe_armazem:
         try:
-            mtime = os.path.getmtime(caminho_default)
-            df = carregar_csv_local(caminho_default, mtime).copy()
-            fonte_dados = f"Ficheiro local: {caminho_default}"
-            fonte_key = f"{caminho_default}:{mtime}"
+            livro = abrir_livro()
+            livro.sincronizar()
+            fonte_dados = f"Livro local: {livro.caminho} (armazém {raiz_armazem})"
+            # Só muda quando o livro recarrega partições; as edições já estão na sessão
+            fonte_key = f"{livro.caminho}:{livro.versao()[0]}"
+            if st.session_state.get('fonte_key') != fonte_key or 'df_editado' not in st.session_state:
+                df = carregar_livro(livro)
+            else:
+                df = st.session_state['df_editado']
         except Exception as e:
-            st.error(f"Erro a ler ficheiro local: {e}")
+            livro = None
+            st.error(f"Erro a ler livro local: {e}")
     elif uploaded_file is not None:
         try:
             df = pd.read_csv(uploaded_file)
             fonte_dados = "Upload"
-            fonte_key = "Upload"
+            fonte_key = f"Upload:{uploaded_file.file_id}"
         except Exception as e:
             st.error(f"Erro a ler CSV carregado: {e}")
 
@@ -235,6 +381,8 @@ def main():
         categorias_disponiveis = carregar_categorias_disponiveis()
         categorias_disponiveis.insert(0, 'Nao Categorizado')
 
+        sugestoes = sugestoes_da_sessao(df, motor, aprendizagem, st.session_state['fonte_key'])
+
         st.sidebar.markdown("## 📊 Estatísticas")
         total = len(df)
         classificadas = len(df[df['Categoria'] != 'Nao Categorizado'])
@@ -244,6 +392,26 @@ def main():
         st.sidebar.metric("Classificadas", classificadas, delta=f"{classificadas/total*100:.1f}%")
         st.sidebar.metric("Por Classificar", por_classificar)
 
+        if livro is not None:
+            st.sidebar.markdown("## ↩️ Edições")
+            col_desfazer, col_refazer = st.sidebar.columns(2)
+            if col_desfazer.button("↩️ Desfazer", disabled=not livro.registo.desfazer_pilha, use_container_width=True):
+                aplicar_na_sessao(df, livro.desfazer(), sugestoes, motor, aprendizagem)
+                st.rerun()
+            if col_refazer.button("↪️ Refazer", disabled=not livro.registo.refazer_pilha, use_container_width=True):
+                aplicar_na_sessao(df, livro.refazer(), sugestoes, motor, aprendizagem)
+                st.rerun()
+            st.sidebar.caption(f"{livro.registo.linhas} registos de edição por compactar")
+            if livro.registo.linhas >= LINHAS_COMPACTACAO:
+                # Compactar esvazia o histórico de desfazer: só a pedido do utilizador
+                st.sidebar.warning(
+                    "O registo de edições está grande. Compactar grava as edições no armazém "
+                    "e apaga o histórico de desfazer/refazer."
+                )
+                if st.sidebar.button("🗜️ Compactar registo", use_container_width=True):
+                    livro.descarregar()
+                    st.rerun()
+
         st.sidebar.markdown("## ⚡ Atalhos")
         limiar_auto = st.sidebar.slider(
             "Confiança mínima para auto-aplicar",
@@ -254,44 +422,57 @@ def main():
         )
 
         if st.sidebar.button("⚡ Auto-aplicar sugestões confiáveis", use_container_width=True):
-            aplicadas = 0
-            for idx, row in df[df['Categoria'] == 'Nao Categorizado'].iterrows():
-                sugestao, confianca = sugerir_categoria(row, regras)
-                if sugestao and confianca >= limiar_auto:
-                    df.at[idx, 'Categoria'] = sugestao
-                    df.at[idx, 'Confianca'] = round(float(confianca), 2)
-                    df.at[idx, 'Observacao'] = 'Auto-aplicado (V5_1)'
-                    aplicadas += 1
-
-            if usar_ficheiro_local and aplicadas > 0:
-                try:
-                    df.to_csv(caminho_default, index=False)
-                except Exception as e:
-                    st.error(f"Erro a guardar CSV: {e}")
+            confiaveis = (
+                (df['Categoria'] == 'Nao Categorizado')
+                & sugestoes['Sugestao'].notna() & (sugestoes['Sugestao'] != '')
+                & (sugestoes['ConfiancaSugestao'] >= limiar_auto)
+            )
+            alteradas = df.index[confiaveis].tolist()
+            df.loc[alteradas, 'Categoria'] = sugestoes.loc[alteradas, 'Sugestao']
+            df.loc[alteradas, 'Confianca'] = sugestoes.loc[alteradas, 'ConfiancaSugestao'].astype(float).round(2)
+            df.loc[alteradas, 'Observacao'] = 'Auto-aplicado (V5_1)'
+
+            guardar_no_livro(livro, df, alteradas)
             
-            st.sidebar.success(f"Aplicadas: {aplicadas}")
+            st.sidebar.success(f"Aplicadas: {len(alteradas)}")
             st.rerun()
 
-        if st.sidebar.button("📚 Preencher por histórico (match exato)", use_container_width=True):
-            mapa = carregar_mapa_historico()
-            aplicadas = 0
-            if mapa:
-                for idx, row in df[df['Categoria'] == 'Nao Categorizado'].iterrows():
-                    desc_norm = str(row['Description']).lower().strip()
-                    cat = mapa.get(desc_norm)
-                    if cat:
-                        df.at[idx, 'Categoria'] = cat
-                        df.at[idx, 'Confianca'] = 0.95
-                        df.at[idx, 'Observacao'] = 'Auto-aplicado (histórico)'
-                        aplicadas += 1
-
-            if usar_ficheiro_local and aplicadas > 0:
-                try:
-                    df.to_csv(caminho_default, index=False)
-                except Exception as e:
-                    st.error(f"Erro a guardar CSV: {e}")
+        limiar_historico = st.sidebar.slider(
+            "Semelhança mínima (histórico aproximado)",
+            min_value=0.50,
+            max_value=1.00,
+            value=0.80,
+            step=0.01
+        )
+
+        if st.sidebar.button("📚 Preencher por histórico", use_container_width=True):
+            versao_livro = livro.versao() if livro is not None else ()
+            mapa = carregar_mapa_historico(livro, versao_livro)
+            indice = carregar_indice_historico(livro, versao_livro)
+            alteradas = []
+            aproximadas = 0
+            for idx, row in df[df['Categoria'] == 'Nao Categorizado'].iterrows():
+                desc_norm = str(row['Description']).lower().strip()
+                cat = mapa.get(desc_norm)
+                if cat:
+                    df.at[idx, 'Categoria'] = cat
+                    df.at[idx, 'Confianca'] = 0.95
+                    df.at[idx, 'Observacao'] = 'Auto-aplicado (histórico)'
+                    alteradas.append(idx)
+                    continue
+
+                encontrado = indice.procurar(desc_norm, limiar_historico) if len(indice) else None
+                if encontrado:
+                    _, cat, semelhanca = encontrado
+                    df.at[idx, 'Categoria'] = cat
+                    df.at[idx, 'Confianca'] = round(0.95 * semelhanca, 2)
+                    df.at[idx, 'Observacao'] = 'Auto-aplicado (histórico aproximado)'
+                    alteradas.append(idx)
+                    aproximadas += 1
+
+            guardar_no_livro(livro, df, alteradas)
             
-            st.sidebar.success(f"Aplicadas: {aplicadas}")
+            st.sidebar.success(f"Aplicadas: {len(alteradas)} ({aproximadas} por semelhança)")
             st.rerun()
 
         col1, col2, col3 = st.columns(3)
@@ -319,28 +500,61 @@ def main():
             index=0
         )
 
-        df_filtrado = df.copy()
+        por_pagina = st.selectbox("Transações por página", TAMANHOS_PAGINA, index=1)
+
+        # Filtros novos voltam à primeira página
+        chave_filtros = (mes_selecionado, filtro_categoria, filtro_banco, por_pagina)
+        if st.session_state.get('filtros_pagina') != chave_filtros:
+            st.session_state['filtros_pagina'] = chave_filtros
+            st.session_state['pagina'] = 1
+
+        if livro is not None:
+            # Filtros, contagem de repetições, ordenação e página resolvidos no livro:
+            # só as linhas da página saem do SQLite
+            filtros = dict(
+                anos=[2025] if mes_selecionado != "Todos" else None,
+                meses=[MESES[mes_selecionado]] if mes_selecionado != "Todos" else None,
+                categorias=[filtro_categoria] if filtro_categoria != "Todas" else None,
+                bancos=[filtro_banco] if filtro_banco != "Todos" else None
+            )
+            total_filtrado = livro.contar(**filtros)
+        else:
+            df_filtrado = df.copy()
 
-        if mes_selecionado != "Todos":
-            if mes_selecionado == "Novembro":
-                df_filtrado = df_filtrado[df_filtrado['Date'].str.startswith('2025-11')]
-            else:
-                df_filtrado = df_filtrado[df_filtrado['Date'].str.startswith('2025-12')]
+            if mes_selecionado != "Todos":
+                df_filtrado = df_filtrado[df_filtrado['Date'].str.startswith(f"2025-{MESES[mes_selecionado]:02d}")]
 
-        if filtro_categoria != "Todas":
-            df_filtrado = df_filtrado[df_filtrado['Categoria'] == filtro_categoria]
+            if filtro_categoria != "Todas":
+                df_filtrado = df_filtrado[df_filtrado['Categoria'] == filtro_categoria]
 
-        if filtro_banco != "Todos":
-            df_filtrado = df_filtrado[df_filtrado['Bank'] == filtro_banco]
+            if filtro_banco != "Todos":
+                df_filtrado = df_filtrado[df_filtrado['Bank'] == filtro_banco]
 
-        df_filtrado = df_filtrado.copy()
-        df_filtrado['_desc_norm'] = df_filtrado['Description'].astype(str).str.lower().str.strip()
-        repeticoes = df_filtrado['_desc_norm'].value_counts()
-        df_filtrado['Repeticoes'] = df_filtrado['_desc_norm'].map(repeticoes).fillna(1).astype(int)
-        df_filtrado = df_filtrado.sort_values(by=['Repeticoes', 'Date'], ascending=[False, False])
+            total_filtrado = len(df_filtrado)
 
-        st.subheader(f"📋 Transações ({len(df_filtrado)} mostradas)")
+        paginas = max(1, math.ceil(total_filtrado / por_pagina))
+        st.session_state['pagina'] = min(st.session_state.get('pagina', 1), paginas)
+        pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1, key='pagina')
+        inicio = (pagina - 1) * por_pagina
 
+        if livro is not None:
+            df_filtrado = livro.pagina(por_pagina, inicio, **filtros)
+            df_filtrado['Date'] = df_filtrado['Date'].dt.strftime('%Y-%m-%d')
+            df_filtrado.index = df_filtrado['Id'].values
+        else:
+            df_filtrado = df_filtrado.copy()
+            df_filtrado['_desc_norm'] = df_filtrado['Description'].astype(str).str.lower().str.strip()
+            repeticoes = df_filtrado['_desc_norm'].value_counts()
+            df_filtrado['Repeticoes'] = df_filtrado['_desc_norm'].map(repeticoes).fillna(1).astype(int)
+            df_filtrado = df_filtrado.sort_values(by=['Repeticoes', 'Date'], ascending=[False, False])
+            df_filtrado = df_filtrado.iloc[inicio:inicio + por_pagina]
+
+        st.subheader(
+            f"📋 Transações ({total_filtrado} filtradas; "
+            f"{inicio + 1 if len(df_filtrado) else 0}–{inicio + len(df_filtrado)} mostradas)"
+        )
+
+        # Só as linhas da página são desenhadas e só para elas se calcula a sugestão
         for idx, row in df_filtrado.iterrows():
             with st.expander(f"🔁 {row['Repeticoes']}x | 📅 {row['Date']} | {row['Bank']} | {row['Description'][:60]}...", expanded=False):
                 col1, col2, col3 = st.columns([2, 1, 1])
@@ -349,7 +563,7 @@ def main():
                     st.write(f"**Descrição:** {row['Description']}")
                     st.write(f"**Valor:** €{row['Valor']:.2f} {'(Crédito)' if row['Credit'] > 0 else '(Débito)'}")
 
-                    sugestao_sistema, confianca_sistema = sugerir_categoria(row, regras)
+                    sugestao_sistema, confianca_sistema = sugestoes.loc[idx, ['Sugestao', 'ConfiancaSugestao']]
 
                     if sugestao_sistema and confianca_sistema >= 0.70:
                         st.info(f"💡 Sugestão do sistema: **{sugestao_sistema}** (confiança: {confianca_sistema:.0%})")
@@ -380,11 +594,9 @@ def main():
                                 confianca_sistema
                             )
                             
-                            if usar_ficheiro_local:
-                                try:
-                                    df.to_csv(caminho_default, index=False)
-                                except Exception as e:
-                                    st.error(f"Erro a guardar CSV: {e}")
+                            gestor.gravar()
+                            guardar_no_livro(livro, df, [idx])
+                            atualizar_sugestoes(sugestoes, df, [row['Description']], motor, aprendizagem)
                             
                             st.success(f"✅ Categoria atualizada: {nova_categoria}")
                             st.rerun()
@@ -393,11 +605,14 @@ def main():
 
                     aplicar_lote = col3_2.button("🔁 Aplicar a iguais", key=f"save_all_{idx}")
                     if aplicar_lote:
-                        desc_norm = str(row['Description']).lower().strip()
-                        mask = (df['Bank'] == row['Bank']) & (df['Description'].astype(str).str.lower().str.strip() == desc_norm)
-                        indices = df.index[mask].tolist()
+                        desc_norm = normalizar_descricao(row['Description'])
+                        if livro is not None:
+                            indices = livro.consultar(['Id'], bancos=[row['Bank']], descricoes=[desc_norm])['Id'].tolist()
+                        else:
+                            mask = (df['Bank'] == row['Bank']) & (df['Description'].astype(str).str.lower().str.strip() == desc_norm)
+                            indices = df.index[mask].tolist()
 
-                        alterados = 0
+                        alterados = []
                         for i in indices:
                             if df.at[i, 'Categoria'] != nova_categoria:
                                 old_cat = df.at[i, 'Categoria']
@@ -405,7 +620,7 @@ def main():
                                 df.at[i, 'Observacao'] = 'Validado manualmente (lote)'
 
                                 transacao_row = df.loc[i]
-                                sugestao, confianca = sugerir_categoria(transacao_row, regras)
+                                sugestao, confianca = sugestoes.loc[i, ['Sugestao', 'ConfiancaSugestao']]
 
                                 gestor.registar_escolha(
                                     transacao_row,
@@ -414,23 +629,26 @@ def main():
                                     sugestao,
                                     confianca if confianca else 0.0
                                 )
-                                alterados += 1
+                                alterados.append(i)
 
-                        if usar_ficheiro_local and alterados > 0:
-                            try:
-                                df.to_csv(caminho_default, index=False)
-                            except Exception as e:
-                                st.error(f"Erro a guardar CSV: {e}")
+                        # Uma escrita para o lote inteiro, quantas linhas tiver
+                        gestor.gravar()
+                        guardar_no_livro(livro, df, alterados)
+                        atualizar_sugestoes(sugestoes, df, [row['Description']], motor, aprendizagem)
                         
-                        st.success(f"✅ Aplicado a {alterados} transações iguais ({row['Bank']})")
+                        st.success(f"✅ Aplicado a {len(alterados)} transações iguais ({row['Bank']})")
                         st.rerun()
 
         if st.button("💾 Guardar Todas as Mudanças e Descarregar"):
-            if usar_ficheiro_local:
+            if livro is not None:
                 try:
-                    df.to_csv(caminho_default, index=False)
+                    escritos = livro.descarregar()
+                    st.info(
+                        f"💾 {len(escritos)} partições gravadas em {raiz_armazem}"
+                        + ("" if livro.registo.linhas else "; o histórico de desfazer/refazer foi limpo")
+                    )
                 except Exception as e:
-                    st.error(f"Erro a guardar CSV: {e}")
+                    st.error(f"Erro a guardar no armazém: {e}")
             output = df.to_csv(index=False)
             st.download_button(
                 label="📥 Descarregar CSV Validado",
@@ -442,10 +660,12 @@ def main():
             gestor.finalizar_sessao(len(df[df['Categoria'] != 'Nao Categorizado']))
             st.success("✅ Sessão de aprendizagem gravada!")
     else:
-        if os.path.exists(caminho_default):
-            st.info("Ativa 'Usar ficheiro local' na sidebar para carregar automaticamente.")
+        if existe_armazem:
+            st.info("Ativa 'Usar armazém local' na sidebar para carregar automaticamente.")
         else:
-            st.info("Coloca o ficheiro em data/processed/novembro_dezembro_2025_classificado.csv ou faz upload.")
+            st.info(f"Corre processar_novembro_dezembro_2025.py para criar {raiz_armazem} ou faz upload de um CSV.")
+
+    motor.cache.salvar()
 
 if __name__ == "__main__":
     main()
@@ -1,95 +1,17 @@
 import pandas as pd
 
-processed_file = '/Users/bilal/Programaçao/financas pessoais/data/processed/novembro_dezembro_2025_classificado.csv'
-df = pd.read_csv(processed_file)
+from livro_transacoes import consultar_transacoes
+from resumo_categorias import agregar, resumo_mes, totais_mensais
 
-df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+df = consultar_transacoes(anos=[2025], meses=[11, 12])
 
-df_sem_transferencias = df[df['Categoria'] != 'Transferência Interna']
+# Um só groupby (mês, categoria, banco); resumos e totais saem do agregado
+agregado = agregar(df)
 
-ordem_categorias_excel = [
-    'Casa - Renda Fontanelas',
-    'Casa - Renda Monte da Caparica',
-    'Casa - Supermercado Bilal',
-    'Casa - Supermercado Daniela',
-    'Casa - Luz',
-    'Casa - Internet (Net)',
-    'Casa - Limpeza',
-    'Casa - Outros',
-    'Pessoal Bilal - Comer fora',
-    'Pessoal Bilal - Vestuário/calçado',
-    'Pessoal Bilal - Férias/viagens/Passeios',
-    'Pessoal Bilal - Livros/Cinema/Concertos',
-    'Pessoal Bilal - Donativos/Quotas',
-    'Pessoal Bilal - Barbeiro',
-    'Pessoal Bilal - Presentes',
-    'Pessoal Bilal - Outros',
-    'Créditos/Seguros Bilal - Pessoal Millennium',
-    'Créditos/Seguros Bilal - Wizink',
-    'Créditos/Seguros Bilal - Seg vida',
-    'Créditos/Seguros Bilal - Cliente frequente',
-    'Créditos/Seguros Bilal - Despesas bancárias Bilal',
-    'Créditos/Seguros Bilal - Despesas Bancárias Bilal',
-    'Deslocações Bilal - Transportes',
-    'Deslocações Bilal - Via Verde',
-    'Deslocações Bilal - Carro',
-    'Deslocações Bilal - Combustível',
-    'Deslocações Bilal - Estacionamento',
-    'Deslocações Bilal - ACP',
-    'Saúde - Consultas Bilal',
-    'Saúde - Consultas Daniela',
-    'Saúde - Farmácia/Prod.Nat./Exames',
-    'Saúde - Pruvit',
-    'Saúde - Ginásio',
-    'Saúde - Lifewave',
-    'Noah - Pensão de Alimentos',
-    'Noah - Pensão de alimentos',
-    'Noah - Desporto',
-    'Noah - Consultas',
-    'Noah - Roupa',
-    'Noah - Outros',
-    'Despesas Profissionais Bilal - Mensalidades (Replit, GPT, etc.)',
-    'Despesas Profissionais Bilal - Mensalidade (Replit, GPT, etc.)',
-    'Despesas Profissionais Bilal - Formação Bilal',
-    'Despesas Profissionais Bilal - Seg. Social Bilal',
-    'Despesas Profissionais Bilal - Produtos (Lifewave/Pruvit, etc.)',
-    'Despesas Profissionais Bilal - Marketing digital',
-    'Despesas Profissionais Bilal - BNI',
-    'Receitas - Sessões Bilal',
-    'Receitas - Limpezas Espaços',
-    'Receitas - Workshop TMD',
-    'Receitas - Aulas Individuais',
-    'Receitas - Soluções IA',
-    'Receitas - Lifewave',
-    'Receitas - Pruvit',
-    'Receitas - Rendas Fontanelas',
-    'Receitas - Electricidade Fontanelas',
-    'Receitas - Renda Monte da Caparica',
-    'Despesas de Crédito',
-    'Pessoal Bilal - Transferências',
-    'Estorno/Devolução'
-]
-
-df_novembro = df_sem_transferencias[df_sem_transferencias['Date'].dt.month == 11]
-df_dezembro = df_sem_transferencias[df_sem_transferencias['Date'].dt.month == 12]
-
-def gerar_resumo(df, nome_mes, arquivo_saida):
-    resumo = []
-    total_debit = 0
-    total_credit = 0
-    
-    categorias_usadas = set(df['Categoria'].unique())
-    
-    for cat in ordem_categorias_excel:
-        df_cat = df[df['Categoria'] == cat]
-        if len(df_cat) > 0:
-            debit = df_cat['Debit'].sum()
-            credit = df_cat['Credit'].sum()
-            total_debit += debit
-            total_credit += credit
-            resumo.append({'Categoria': cat, 'Debit': debit, 'Credit': credit})
-    
-    resumo_df = pd.DataFrame(resumo)
+def gerar_resumo(mes, nome_mes, arquivo_saida, ano=2025):
+    resumo_df = resumo_mes(agregado, ano, mes, incluir_transferencias=False)[['Categoria', 'Debit', 'Credit']]
+    total_debit = resumo_df['Debit'].sum()
+    total_credit = resumo_df['Credit'].sum()
     
     total_row = pd.DataFrame([{
         'Categoria': 'TOTAL',
@@ -110,13 +32,13 @@ def gerar_resumo(df, nome_mes, arquivo_saida):
     print(f"\n✅ Ficheiro gerado: {arquivo_saida}")
 
 gerar_resumo(
-    df_novembro, 
+    11, 
     'NOVEMBRO', 
     '/Users/bilal/Programaçao/financas pessoais/categorias_novembro_2025_organizadas.csv'
 )
 
 gerar_resumo(
-    df_dezembro, 
+    12, 
     'DEZEMBRO', 
     '/Users/bilal/Programaçao/financas pessoais/categorias_dezembro_2025_organizadas.csv'
 )
@@ -125,10 +47,12 @@ print(f"\n{'='*80}")
 print("RESUMO COMPARATIVO")
 print(f"{'='*80}")
 
-total_novembro_debit = df_novembro['Debit'].sum()
-total_novembro_credit = df_novembro['Credit'].sum()
-total_dezembro_debit = df_dezembro['Debit'].sum()
-total_dezembro_credit = df_dezembro['Credit'].sum()
+# Um mês sem movimentos (fora transferências) conta como 0, não falta
+totais = totais_mensais(agregado, incluir_transferencias=False).reindex(
+    pd.MultiIndex.from_tuples([(2025, 11), (2025, 12)], names=['Ano', 'Mes']), fill_value=0
+)
+total_novembro_debit, total_novembro_credit = totais.loc[(2025, 11), ['Debit', 'Credit']]
+total_dezembro_debit, total_dezembro_credit = totais.loc[(2025, 12), ['Debit', 'Credit']]
 
 print(f"Novembro:")
 print(f"  Despesas: €{total_novembro_debit:.2f}")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 IDENTIFICADORES DE TRANSAÇÕES
+Hash de conteúdo estável para cada transação (Date, Bank, Description, montante)
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+def canonizar(descricao):
+    return ' '.join(str(descricao).lower().split())
+
+
+def base_id(data, banco, descricao_canonica, montante):
+    """Parte do Id comum a transações iguais (data, banco, descrição, montante com sinal)"""
+    return f"{data}|{banco}|{descricao_canonica}|{montante:.2f}"
+
+
+def hash_id(base, ordinal):
+    return hashlib.sha1(f"{base}|{ordinal}".encode('utf-8')).hexdigest()[:16]
+
+
+def descricao_canonica(descricoes):
+    """Descrições em minúsculas e com espaços colapsados (Series).
+
+    Normaliza só as descrições únicas e volta a expandir pelos códigos.
+    """
+    codigos, unicas = pd.factorize(descricoes.fillna('').astype(str))
+    canonicas = np.array([canonizar(d) for d in unicas], dtype=object)
+    return pd.Series(canonicas[codigos], index=descricoes.index)
+
+
+def calcular_ids(df):
+    """Id estável por transação.
+
+    Usa data, banco, descrição canónica e montante com sinal (crédito -
+    débito). Transações idênticas no mesmo dia recebem um ordinal (0, 1, ...)
+    pela ordem em que aparecem, para que cada uma tenha um id distinto e
+    reproduzível entre execuções.
+    """
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+
+    montante = np.round(df['Credit'].astype(float) - df['Debit'].astype(float), 2)
+    base = pd.Series([
+        base_id(data, banco, descricao, valor)
+        for data, banco, descricao, valor in zip(
+            df['Date'].astype(str).tolist(),
+            df['Bank'].astype(str).tolist(),
+            descricao_canonica(df['Description']).tolist(),
+            montante.tolist()
+        )
+    ], dtype=object)
+    ordinal = base.groupby(base, sort=False).cumcount()
+    return pd.Series(
+        [hash_id(b, o) for b, o in zip(base.tolist(), ordinal.tolist())],
+        index=df.index,
+        dtype=object
+    )
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 ÍNDICE DE HISTÓRICO
+Índice invertido TF-IDF (palavras + trigramas) sobre descrições já validadas,
+para encontrar a descrição histórica mais próxima de uma nova transação
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+
+_PALAVRA = re.compile(r'\w+')
+
+
+def normalizar_descricao(descricao):
+    return str(descricao).lower().strip()
+
+
+def extrair_termos(descricao):
+    """Palavras da descrição e trigramas de caracteres de cada palavra.
+
+    Os trigramas toleram pequenas variações entre meses (nomes truncados,
+    sufixos diferentes); as palavras inteiras pesam mais quando coincidem.
+    """
+    termos = []
+    for palavra in _PALAVRA.findall(normalizar_descricao(descricao)):
+        termos.append(palavra)
+        marcada = f"#{palavra}#"
+        termos.extend(f"3:{marcada[i:i + 3]}" for i in range(len(marcada) - 2))
+    return termos
+
+
+class IndiceHistorico:
+    """Índice invertido com pesos TF-IDF e similaridade do cosseno.
+
+    Termos presentes em mais de `max_df` dos documentos (ex.: 'compra',
+    'contactless') são ignorados nas listas invertidas para manter as
+    consultas abaixo do milissegundo em históricos grandes.
+    """
+
+    def __init__(self, descricoes, categorias, max_df=0.5):
+        self.descricoes = list(descricoes)
+        self.categorias = list(categorias)
+        self.idf = {}
+        self.postings = defaultdict(list)
+
+        contagens = [Counter(extrair_termos(d)) for d in self.descricoes]
+        total = len(contagens)
+        frequencia_doc = Counter()
+        for contagem in contagens:
+            frequencia_doc.update(contagem.keys())
+
+        limite = max_df * total if total >= 20 else total
+        for termo, df in frequencia_doc.items():
+            if df <= limite:
+                self.idf[termo] = math.log((1 + total) / (1 + df)) + 1.0
+
+        for doc, contagem in enumerate(contagens):
+            pesos = {t: (1 + math.log(n)) * self.idf[t] for t, n in contagem.items() if t in self.idf}
+            norma = math.sqrt(sum(p * p for p in pesos.values())) or 1.0
+            for termo, peso in pesos.items():
+                self.postings[termo].append((doc, peso / norma))
+
+    def __len__(self):
+        return len(self.descricoes)
+
+    def procurar(self, descricao, limiar=0.0):
+        """Devolve (descrição, categoria, semelhança) mais próxima, ou None"""
+        contagem = Counter(t for t in extrair_termos(descricao) if t in self.idf)
+        if not contagem:
+            return None
+
+        pesos = {t: (1 + math.log(n)) * self.idf[t] for t, n in contagem.items()}
+        norma = math.sqrt(sum(p * p for p in pesos.values()))
+
+        pontuacoes = defaultdict(float)
+        for termo, peso in pesos.items():
+            peso /= norma
+            for doc, peso_doc in self.postings[termo]:
+                pontuacoes[doc] += peso * peso_doc
+
+        doc, semelhanca = max(pontuacoes.items(), key=lambda item: item[1])
+        if semelhanca < limiar:
+            return None
+        return self.descricoes[doc], self.categorias[doc], semelhanca
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 ÍNDICE DE IMPRESSÕES
+Índice persistente (SQLite) da impressão de cada transação ingerida: hash
+de banco + data + descrição normalizada + montante com sinal + ordinal da
+ocorrência (o mesmo Id de identificadores.calcular_ids). A ingestão
+consulta-o por chave primária, em lotes, sem recarregar o histórico: uma
+transação já vista noutra exportação (exportações sobrepostas) vai para
+a quarentena em vez de entrar duas vezes nas partições
+
+Uso:
+    python3 indice_impressoes.py relatorio                 # duplicados em quarentena
+    python3 indice_impressoes.py relatorio --csv quarentena.csv
+    python3 indice_impressoes.py esquecer data/raw/dezembro_2025/MOVS_0_212026.csv   # exportação descartada
+"""
+
+import argparse
+import itertools
+import os
+import sqlite3
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from identificadores import base_id, canonizar, hash_id
+
+CAMINHO_INDICE = 'data/indice_impressoes.db'
+LINHAS_POR_LOTE = 10000
+LOTE_SQL = 500
+CAMPOS_TRANSACAO = ['Date', 'Bank', 'Description', 'Valor', 'Debit', 'Credit']
+
+ESQUEMA_SQL = """
+CREATE TABLE IF NOT EXISTS impressoes (
+    impressao TEXT PRIMARY KEY, origem TEXT, chave TEXT, ano INTEGER, mes INTEGER, posicao INTEGER,
+    Date TEXT, Bank TEXT, Description TEXT, Valor REAL, Debit REAL, Credit REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_impressoes_origem ON impressoes (origem);
+CREATE INDEX IF NOT EXISTS idx_impressoes_particao ON impressoes (chave, ano, mes);
+
+CREATE TABLE IF NOT EXISTS quarentena (
+    impressao TEXT, origem TEXT, origem_original TEXT, momento TEXT,
+    Date TEXT, Bank TEXT, Description TEXT, Valor REAL, Debit REAL, Credit REAL
+);
+CREATE INDEX IF NOT EXISTS idx_quarentena_origem ON quarentena (origem);
+"""
+
+
+def origem_exportacao(caminho):
+    return os.path.normpath(caminho)
+
+
+class IndiceImpressoes:
+    """Impressões já ingeridas, por exportação de origem.
+
+    Reingerir a mesma exportação não conta como duplicado: `filtrar`
+    apaga primeiro o que ela tinha registado, na mesma transação SQLite
+    que as impressões novas, e só confirmar() a grava; se a leitura falhar,
+    descartar() repõe a exportação como estava. As linhas ficam guardadas
+    para que uma partição reescrita mantenha as transações de exportações
+    que esta execução não reingeriu (`retidas`).
+    """
+
+    def __init__(self, caminho=CAMINHO_INDICE):
+        self.caminho = caminho
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        self.conexao = sqlite3.connect(caminho)
+        self.conexao.executescript(ESQUEMA_SQL)
+        self.duplicados = Counter()
+        self._origem = None
+
+    def fechar(self):
+        self.conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+    def _apagar(self, origem):
+        self.conexao.execute("DELETE FROM impressoes WHERE origem = ?", (origem,))
+        self.conexao.execute("DELETE FROM quarentena WHERE origem = ?", (origem,))
+
+    def esquecer(self, origens):
+        """Apaga as impressões e a quarentena de exportações descartadas"""
+        with self.conexao:
+            for origem in origens:
+                self._apagar(origem)
+
+    def confirmar(self):
+        """Grava a exportação lida por `filtrar`"""
+        self.conexao.commit()
+
+    def descartar(self):
+        """Desfaz a leitura em curso: a exportação fica com as impressões que tinha"""
+        self.conexao.rollback()
+        self.duplicados.pop(self._origem, None)
+
+    def _origens(self, impressoes):
+        """{impressão: origem} das impressões já registadas (consulta pela chave primária)"""
+        existentes = {}
+        for inicio in range(0, len(impressoes), LOTE_SQL):
+            lote = impressoes[inicio:inicio + LOTE_SQL]
+            existentes.update(self.conexao.execute(
+                f"SELECT impressao, origem FROM impressoes WHERE impressao IN ({', '.join('?' * len(lote))})", lote
+            ))
+        return existentes
+
+    def filtrar(self, chave, origem, transacoes):
+        """Devolve as transações novas; as já vistas noutra exportação vão para a quarentena.
+
+        As impressões são calculadas pela ordem da exportação (o ordinal
+        conta as repetições dentro dela) e verificadas e registadas em
+        lotes de LINHAS_POR_LOTE. As impressões anteriores da exportação
+        são apagadas antes do primeiro lote e tudo fica numa transação
+        aberta até confirmar() ou descartar().
+        """
+        self._origem = origem
+        self._apagar(origem)
+        ocorrencias = Counter()
+        posicao = 0
+        while True:
+            lote = list(itertools.islice(transacoes, LINHAS_POR_LOTE))
+            if not lote:
+                return
+
+            impressoes = []
+            for transacao in lote:
+                montante = float(np.round(transacao['Credit'] - transacao['Debit'], 2))
+                base = base_id(transacao['Date'], transacao['Bank'], canonizar(transacao['Description']), montante)
+                impressoes.append(hash_id(base, ocorrencias[base]))
+                ocorrencias[base] += 1
+
+            existentes = self._origens(impressoes)
+            novas, duplicadas = [], []
+            momento = datetime.now().isoformat()
+            for impressao, transacao in zip(impressoes, lote):
+                valores = tuple(transacao[campo] for campo in CAMPOS_TRANSACAO)
+                original = existentes.get(impressao)
+                if original is None:
+                    data = transacao['Date']
+                    novas.append((impressao, origem, chave, int(data[:4]), int(data[5:7]), posicao) + valores)
+                    posicao += 1
+                    yield transacao
+                else:
+                    duplicadas.append((impressao, origem, original, momento) + valores)
+
+            self.conexao.executemany(f"INSERT INTO impressoes VALUES ({', '.join('?' * 12)})", novas)
+            self.conexao.executemany(f"INSERT INTO quarentena VALUES ({', '.join('?' * 10)})", duplicadas)
+            self.duplicados[origem] += len(duplicadas)
+
+    def retidas(self, chave, ano, mes, excluir=()):
+        """Transações da partição vindas de exportações fora de `excluir`, pela ordem original"""
+        excluir = list(excluir)
+        filtro = f" AND origem NOT IN ({', '.join('?' * len(excluir))})" if excluir else ''
+        cursor = self.conexao.execute(
+            f"SELECT {', '.join(CAMPOS_TRANSACAO)} FROM impressoes"
+            f" WHERE chave = ? AND ano = ? AND mes = ?{filtro} ORDER BY origem, posicao",
+            [chave, ano, mes] + excluir
+        )
+        for linha in cursor:
+            yield {**dict(zip(CAMPOS_TRANSACAO, linha)), 'Categoria': '', 'Confianca': 0.0, 'Observacao': ''}
+
+    def relatorio(self, origem=None):
+        """Duplicados em quarentena (todos ou de uma exportação)"""
+        filtro, parametros = (" WHERE origem = ?", [origem]) if origem else ('', [])
+        return pd.read_sql_query(
+            f"SELECT origem, origem_original, momento, {', '.join(CAMPOS_TRANSACAO)} FROM quarentena{filtro}"
+            " ORDER BY origem, Date",
+            self.conexao,
+            params=parametros
+        )
+
+
+def imprimir_relatorio(quarentena):
+    if quarentena.empty:
+        print("✅ Sem duplicados em quarentena")
+        return
+    print(f"⚠️  {len(quarentena)} transações duplicadas em quarentena:")
+    for (origem, original), grupo in quarentena.groupby(['origem', 'origem_original'], sort=True):
+        print(f"  - {origem}: {len(grupo)} já ingeridas de {original}"
+              f" ({grupo['Date'].min()} a {grupo['Date'].max()})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice de impressões das transações ingeridas")
+    parser.add_argument('--indice', default=CAMINHO_INDICE, help="Ficheiro SQLite do índice")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    relatorio = comandos.add_parser('relatorio', help="Duplicados em quarentena")
+    relatorio.add_argument('--origem', help="Só os duplicados desta exportação")
+    relatorio.add_argument('--csv', help="Grava o relatório completo neste CSV")
+
+    esquecer = comandos.add_parser('esquecer', help="Retira exportações do índice (deixam de ser retidas)")
+    esquecer.add_argument('exportacoes', nargs='+')
+    args = parser.parse_args()
+
+    with IndiceImpressoes(args.indice) as indice:
+        if args.comando == 'esquecer':
+            indice.esquecer([origem_exportacao(caminho) for caminho in args.exportacoes])
+            print(f"✅ {len(args.exportacoes)} exportações retiradas do índice")
+            return
+        quarentena = indice.relatorio(args.origem and origem_exportacao(args.origem))
+    imprimir_relatorio(quarentena)
+    if args.csv:
+        quarentena.to_csv(args.csv, index=False, encoding='utf-8')
+        print(f"📄 Relatório: {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
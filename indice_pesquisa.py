@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 ÍNDICE DE PESQUISA
+Índice de texto persistente (SQLite FTS5 com trigramas) sobre as partições
+raw data/raw/<mes>_<ano>/: pesquisa por substring (sem distinguir
+maiúsculas) na data, banco, descrição e montantes, mais filtros por
+montante e intervalo de datas, sem ler nem converter as partições. Cada
+linha raw guarda o Id do armazém, por isso a contraparte processada vem
+do livro pelo índice de Id. Só as partições novas ou alteradas (mtime e
+tamanho) são reindexadas
+
+Uso:
+    python3 indice_pesquisa.py 8373 "Top up by"                  # qualquer dos termos
+    python3 indice_pesquisa.py "BANCO COMERCIAL" --valor 500 --desde 2025-11-21 --ate 2025-11-21
+"""
+
+import argparse
+import os
+import sqlite3
+
+import pandas as pd
+
+from adaptadores_bancos import descobrir_particoes
+from identificadores import calcular_ids
+from livro_transacoes import CAMINHO_LIVRO, LivroTransacoes
+
+CAMINHO_PESQUISA = 'data/indice_pesquisa.db'
+COLUNAS_RAW = ['Date', 'Bank', 'Description', 'Valor', 'Debit', 'Credit']
+COLUNAS_PROCESSADAS = ['Id', 'Categoria', 'Confianca', 'Observacao']
+MIN_TRIGRAMA = 3
+
+ESQUEMA_SQL = """
+CREATE TABLE IF NOT EXISTS linhas (
+    particao TEXT, posicao INTEGER, Id TEXT,
+    Date TEXT, Bank TEXT, Description TEXT, Valor REAL, Debit REAL, Credit REAL, texto TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_linhas_particao ON linhas (particao);
+CREATE INDEX IF NOT EXISTS idx_linhas_date ON linhas (Date);
+CREATE INDEX IF NOT EXISTS idx_linhas_valor ON linhas (Valor);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS pesquisa USING fts5(
+    texto, content='linhas', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS linhas_inserir AFTER INSERT ON linhas BEGIN
+    INSERT INTO pesquisa (rowid, texto) VALUES (NEW.rowid, NEW.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS linhas_apagar AFTER DELETE ON linhas BEGIN
+    INSERT INTO pesquisa (pesquisa, rowid, texto) VALUES ('delete', OLD.rowid, OLD.texto);
+END;
+
+CREATE TABLE IF NOT EXISTS particoes (caminho TEXT PRIMARY KEY, mtime REAL, tamanho INTEGER);
+"""
+
+
+def _texto(df):
+    """Texto pesquisável de cada linha: data, banco, descrição e montantes ('178.00')"""
+    montantes = [df[coluna].map('{:.2f}'.format) for coluna in ('Valor', 'Debit', 'Credit')]
+    return df['Date'].str.cat([df['Bank'], df['Description'], *montantes], sep=' ')
+
+
+class IndicePesquisa:
+    """Índice FTS5 das partições raw, atualizado partição a partição.
+
+    `pesquisar` junta os termos com OU (como as análises da auditoria) e
+    aplica os filtros de montante/data pelos índices da tabela `linhas`.
+    Termos com menos de três caracteres não têm trigramas e são
+    procurados com LIKE.
+    """
+
+    def __init__(self, caminho=CAMINHO_PESQUISA, raiz='data/raw'):
+        self.caminho = caminho
+        self.raiz = raiz
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        self.conexao = sqlite3.connect(caminho)
+        self.conexao.executescript(ESQUEMA_SQL)
+
+    def fechar(self):
+        self.conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+    def atualizar(self):
+        """Reindexa as partições novas/alteradas e retira as que desapareceram; devolve quantas mudaram"""
+        conhecidas = {
+            caminho: (mtime, tamanho)
+            for caminho, mtime, tamanho in self.conexao.execute("SELECT caminho, mtime, tamanho FROM particoes")
+        }
+        atuais = {caminho: (os.path.getmtime(caminho), os.path.getsize(caminho))
+                  for caminho, _ in descobrir_particoes(self.raiz)}
+
+        alteradas = 0
+        with self.conexao:
+            for caminho in conhecidas.keys() - atuais.keys():
+                self.conexao.execute("DELETE FROM linhas WHERE particao = ?", (caminho,))
+                self.conexao.execute("DELETE FROM particoes WHERE caminho = ?", (caminho,))
+                alteradas += 1
+            for caminho, assinatura in atuais.items():
+                if conhecidas.get(caminho) == assinatura:
+                    continue
+                self._indexar(caminho, *assinatura)
+                alteradas += 1
+        return alteradas
+
+    def _indexar(self, caminho, mtime, tamanho):
+        df = pd.read_csv(caminho, usecols=COLUNAS_RAW, dtype={'Date': str, 'Bank': str, 'Description': str},
+                         keep_default_na=False, encoding='utf-8')
+        # Ids por partição = Ids do armazém: transações iguais têm a mesma data e banco
+        df['Id'] = calcular_ids(df)
+        df['texto'] = _texto(df)
+        df['particao'], df['posicao'] = caminho, range(len(df))
+
+        colunas = ['particao', 'posicao', 'Id'] + COLUNAS_RAW + ['texto']
+        self.conexao.execute("DELETE FROM linhas WHERE particao = ?", (caminho,))
+        self.conexao.executemany(
+            f"INSERT INTO linhas ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+            df[colunas].itertuples(index=False, name=None)
+        )
+        self.conexao.execute("INSERT OR REPLACE INTO particoes VALUES (?, ?, ?)", (caminho, mtime, tamanho))
+
+    def pesquisar(self, termos=(), valor=None, valor_min=None, valor_max=None, desde=None, ate=None,
+                  bancos=None, limite=None):
+        """Linhas raw com algum dos `termos` (substring) que passam os filtros, por data"""
+        condicoes, parametros = [], []
+        longos = [termo for termo in termos if len(termo) >= MIN_TRIGRAMA]
+        curtos = [termo for termo in termos if len(termo) < MIN_TRIGRAMA]
+        alternativas = []
+        if longos:
+            alternativas.append("rowid IN (SELECT rowid FROM pesquisa WHERE pesquisa MATCH ?)")
+            parametros.append(' OR '.join('"' + termo.replace('"', '""') + '"' for termo in longos))
+        for termo in curtos:
+            alternativas.append("texto LIKE ?")
+            parametros.append(f"%{termo}%")
+        if alternativas:
+            condicoes.append(f"({' OR '.join(alternativas)})")
+
+        for condicao, parametro in (("Valor = ?", valor), ("Valor >= ?", valor_min), ("Valor <= ?", valor_max),
+                                    ("Date >= ?", desde), ("Date <= ?", ate)):
+            if parametro is not None:
+                condicoes.append(condicao)
+                parametros.append(parametro if 'Valor' in condicao else str(parametro))
+        if bancos is not None:
+            condicoes.append(f"Bank IN ({', '.join('?' * len(bancos))})")
+            parametros += list(bancos)
+
+        onde = f" WHERE {' AND '.join(condicoes)}" if condicoes else ''
+        df = pd.read_sql_query(
+            f"SELECT particao, posicao, Id, {', '.join(COLUNAS_RAW)} FROM linhas{onde}"
+            f" ORDER BY Date, particao, posicao{' LIMIT ?' if limite else ''}",
+            self.conexao,
+            params=parametros + ([limite] if limite else [])
+        )
+        df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+        return df
+
+
+def com_processado(df, caminho_livro=CAMINHO_LIVRO):
+    """Junta a cada linha raw a sua contraparte processada (Categoria, Confianca, Observacao)"""
+    livro = LivroTransacoes(caminho_livro)
+    try:
+        livro.sincronizar()
+        processadas = livro.consultar(COLUNAS_PROCESSADAS, ids=df['Id'].unique().tolist()) if len(df) else None
+    finally:
+        livro.fechar()
+    if processadas is None:
+        return df.reindex(columns=list(df.columns) + COLUNAS_PROCESSADAS[1:])
+    return df.merge(processadas.drop_duplicates('Id'), on='Id', how='left')
+
+
+def pesquisar_transacoes(termos=(), caminho=CAMINHO_PESQUISA, raiz='data/raw', **filtros):
+    """Atalho para os scripts: atualiza o índice, pesquisa e junta a contraparte processada"""
+    with IndicePesquisa(caminho, raiz) as indice:
+        indice.atualizar()
+        return com_processado(indice.pesquisar(termos, **filtros))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pesquisa nas transações raw (com a contraparte processada)")
+    parser.add_argument('termos', nargs='*', help="Substrings a procurar (qualquer delas)")
+    parser.add_argument('--valor', type=float, help="Montante exato (Valor)")
+    parser.add_argument('--valor-min', type=float)
+    parser.add_argument('--valor-max', type=float)
+    parser.add_argument('--desde', help="Data inicial (AAAA-MM-DD)")
+    parser.add_argument('--ate', help="Data final (AAAA-MM-DD)")
+    parser.add_argument('--banco', nargs='+')
+    parser.add_argument('--limite', type=int)
+    parser.add_argument('--indice', default=CAMINHO_PESQUISA, help="Ficheiro SQLite do índice")
+    parser.add_argument('--raiz', default='data/raw', help="Pasta das partições raw")
+    args = parser.parse_args()
+
+    df = pesquisar_transacoes(
+        args.termos, args.indice, args.raiz, valor=args.valor, valor_min=args.valor_min,
+        valor_max=args.valor_max, desde=args.desde, ate=args.ate, bancos=args.banco, limite=args.limite
+    )
+    print(f"🔍 {len(df)} transações encontradas")
+    if len(df):
+        print(df[['Date', 'Bank', 'Description', 'Debit', 'Credit', 'Categoria', 'Observacao']].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 LIVRO DE TRANSAÇÕES
+Cópia SQLite do armazém Parquet, com índices em Date, Bank, Categoria e
+descrição normalizada: leituras filtradas sem percorrer tudo e edições do
+dashboard como UPDATEs de uma linha, em vez de regravar ficheiros
+
+As partições do armazém são (re)carregadas quando o ficheiro muda; as
+editadas ficam marcadas e só voltam ao Parquet ao descarregar. Cada edição
+é primeiro acrescentada ao registo de edições (registo_edicoes.py), que é
+reaplicado sobre partições recarregadas e esvaziado ao descarregar.
+Desfazer/refazer uma validação manual também anula/repõe a escolha
+correspondente no registo de aprendizagem.
+
+Uso:
+    python3 livro_transacoes.py sincronizar    # recarrega partições alteradas
+    python3 livro_transacoes.py descarregar    # grava no armazém as partições editadas
+    python3 livro_transacoes.py desfazer       # desfaz a última edição (refazer: refaz)
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from aprendizagem_compilada import CAMINHO_APRENDIZAGEM, acrescentar_registos, registo_compensacao
+from armazem_transacoes import COLUNAS, RAIZ_ARMAZEM, gravar_transacoes, ler_transacoes, particoes
+from registo_edicoes import CAMINHO_REGISTO, RegistoEdicoes
+
+CAMINHO_LIVRO = 'data/processed/livro_transacoes.db'
+COLUNAS_EDITAVEIS = ['Categoria', 'Confianca', 'Observacao']
+LOTE_SQL = 500
+
+ESQUEMA_SQL = """
+CREATE TABLE IF NOT EXISTS transacoes (
+    Id TEXT, Date TEXT, Bank TEXT, Description TEXT,
+    Valor REAL, Debit REAL, Credit REAL,
+    Categoria TEXT, Confianca REAL, Observacao TEXT, HashRegras TEXT,
+    DescricaoNorm TEXT, Ano INTEGER, Mes INTEGER, Posicao INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_transacoes_id ON transacoes (Id);
+CREATE INDEX IF NOT EXISTS idx_transacoes_date ON transacoes (Date);
+CREATE INDEX IF NOT EXISTS idx_transacoes_bank ON transacoes (Bank);
+CREATE INDEX IF NOT EXISTS idx_transacoes_categoria ON transacoes (Categoria);
+CREATE INDEX IF NOT EXISTS idx_transacoes_descricao ON transacoes (DescricaoNorm);
+CREATE INDEX IF NOT EXISTS idx_transacoes_particao ON transacoes (Ano, Mes, Bank, Posicao);
+
+CREATE TABLE IF NOT EXISTS particoes (
+    Ano INTEGER, Mes INTEGER, Bank TEXT, caminho TEXT, mtime REAL, suja INTEGER DEFAULT 0,
+    PRIMARY KEY (Ano, Mes, Bank)
+);
+
+CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor INTEGER);
+INSERT OR IGNORE INTO meta VALUES ('carregamentos', 0), ('edicoes', 0);
+
+CREATE TRIGGER IF NOT EXISTS marcar_particao_suja
+AFTER UPDATE OF Categoria, Confianca, Observacao ON transacoes
+BEGIN
+    UPDATE particoes SET suja = 1 WHERE Ano = NEW.Ano AND Mes = NEW.Mes AND Bank = NEW.Bank;
+    UPDATE meta SET valor = valor + 1 WHERE chave = 'edicoes';
+END;
+"""
+
+
+def normalizar_descricao(descricao):
+    """Mesma normalização do dashboard (minúsculas, sem espaços nas pontas)"""
+    return str(descricao).lower().strip()
+
+
+def _escalar(valor):
+    """Valor Python simples (sem NaN nem escalares NumPy), para SQLite e JSON"""
+    if pd.isna(valor):
+        return None
+    return valor.item() if hasattr(valor, 'item') else valor
+
+
+def _em(coluna, valores):
+    return f"{coluna} IN ({', '.join('?' * len(valores))})", list(valores)
+
+
+class LivroTransacoes:
+    """Livro SQLite sincronizado com o armazém Parquet.
+
+    `consultar` filtra por índices; `atualizar` acrescenta as alterações
+    ao registo de edições e aplica-as por Id numa só transação, marcando
+    as partições tocadas, que `descarregar` grava de volta no armazém
+    (compactando o registo). `sincronizar` recarrega as partições cujo
+    ficheiro mudou e reaplica por cima as edições ainda no registo.
+    `desfazer`/`refazer` compensam no registo de aprendizagem as escolhas
+    das validações manuais que revertem/reaplicam.
+
+    A ligação é partilhada entre as threads do Streamlit (cache_resource):
+    todas as leituras e escritas passam pelo mesmo bloqueio.
+    """
+
+    def __init__(self, caminho=CAMINHO_LIVRO, raiz=RAIZ_ARMAZEM, caminho_registo=CAMINHO_REGISTO,
+                 caminho_aprendizagem=CAMINHO_APRENDIZAGEM):
+        self.caminho = caminho
+        self.raiz = raiz
+        self.caminho_aprendizagem = caminho_aprendizagem
+        self.registo = RegistoEdicoes(caminho_registo)
+        self._bloqueio = threading.RLock()
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.executescript(ESQUEMA_SQL)
+
+    def fechar(self):
+        self.conexao.close()
+
+    def versao(self):
+        """(carregamentos, edições): muda quando o livro recarrega partições ou é editado"""
+        with self._bloqueio:
+            valores = dict(self.conexao.execute("SELECT chave, valor FROM meta"))
+        return valores['carregamentos'], valores['edicoes']
+
+    def sincronizar(self):
+        """Recarrega as partições novas/alteradas e apaga as que saíram do armazém.
+
+        Devolve o número de partições recarregadas ou removidas.
+        """
+        atuais = {(ano, mes, banco): caminho for ano, mes, banco, caminho in particoes(self.raiz)}
+
+        alteradas = 0
+        with self._bloqueio, self.conexao:
+            # O registo pode ter sido esvaziado por outro processo (descarregar_livro)
+            self.registo.recarregar()
+            conhecidas = {
+                (ano, mes, banco): mtime
+                for ano, mes, banco, mtime in self.conexao.execute("SELECT Ano, Mes, Bank, mtime FROM particoes")
+            }
+            for chave in conhecidas.keys() - atuais.keys():
+                self.conexao.execute("DELETE FROM transacoes WHERE Ano = ? AND Mes = ? AND Bank = ?", chave)
+                self.conexao.execute("DELETE FROM particoes WHERE Ano = ? AND Mes = ? AND Bank = ?", chave)
+                alteradas += 1
+
+            for (ano, mes, banco), caminho in atuais.items():
+                mtime = os.path.getmtime(caminho)
+                if conhecidas.get((ano, mes, banco)) == mtime:
+                    continue
+                self._carregar_particao(ano, mes, banco, caminho, mtime)
+                alteradas += 1
+
+            if alteradas:
+                self._aplicar(self.registo.estado_final().items())
+                self.conexao.execute("UPDATE meta SET valor = valor + 1 WHERE chave = 'carregamentos'")
+        return alteradas
+
+    def _carregar_particao(self, ano, mes, banco, caminho, mtime):
+        df = ler_transacoes(anos=[ano], meses=[mes], bancos=[banco], raiz=self.raiz, categoricas=False)
+        df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+        df = df.astype(object).where(df.notna(), None)
+        df['DescricaoNorm'] = df['Description'].map(normalizar_descricao)
+        df['Ano'], df['Mes'], df['Posicao'] = ano, mes, range(len(df))
+
+        colunas = COLUNAS + ['DescricaoNorm', 'Ano', 'Mes', 'Posicao']
+        self.conexao.execute("DELETE FROM transacoes WHERE Ano = ? AND Mes = ? AND Bank = ?", (ano, mes, banco))
+        self.conexao.executemany(
+            f"INSERT INTO transacoes ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+            df[colunas].itertuples(index=False, name=None)
+        )
+        self.conexao.execute(
+            "INSERT OR REPLACE INTO particoes (Ano, Mes, Bank, caminho, mtime, suja) VALUES (?, ?, ?, ?, ?, 0)",
+            (ano, mes, banco, caminho, mtime)
+        )
+
+    def _onde(self, anos=None, meses=None, bancos=None, categorias=None, descricoes=None,
+              desde=None, ate=None, observacao_prefixo=None, ids=None):
+        """Cláusula WHERE e parâmetros dos filtros de `consultar`"""
+        condicoes, parametros = [], []
+        for coluna, valores in (('Ano', anos), ('Mes', meses), ('Bank', bancos),
+                                ('Categoria', categorias), ('DescricaoNorm', descricoes), ('Id', ids)):
+            if valores is not None:
+                condicao, valores = _em(coluna, valores)
+                condicoes.append(condicao)
+                parametros += valores
+        if desde is not None:
+            condicoes.append("Date >= ?")
+            parametros.append(str(desde))
+        if ate is not None:
+            condicoes.append("Date <= ?")
+            parametros.append(str(ate))
+        if observacao_prefixo is not None:
+            condicoes.append("substr(Observacao, 1, ?) = ?")
+            parametros += [len(observacao_prefixo), observacao_prefixo]
+        return (f" WHERE {' AND '.join(condicoes)}" if condicoes else ''), parametros
+
+    def consultar(self, colunas=None, **filtros):
+        """Transações que passam os filtros, pela ordem do armazém.
+
+        Filtros: anos, meses, bancos, categorias, descricoes (comparada com
+        a descrição normalizada), desde/ate (datas ISO, inclusivas),
+        observacao_prefixo e ids (pelo índice de Id). Date vem como
+        datetime64, como em `ler_transacoes(categoricas=False)`.
+        """
+        colunas = list(colunas) if colunas is not None else COLUNAS
+        onde, parametros = self._onde(**filtros)
+        with self._bloqueio:
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(colunas)} FROM transacoes{onde} ORDER BY Ano, Mes, Bank, Posicao",
+                self.conexao,
+                params=parametros
+            )
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+        return df
+
+    def contar(self, **filtros):
+        onde, parametros = self._onde(**filtros)
+        with self._bloqueio:
+            return self.conexao.execute(f"SELECT COUNT(*) FROM transacoes{onde}", parametros).fetchone()[0]
+
+    def pagina(self, limite, deslocamento=0, colunas=None, **filtros):
+        """Uma página das transações filtradas, das descrições mais repetidas para as menos.
+
+        Repeticoes conta as linhas filtradas com a mesma descrição
+        normalizada; dentro de cada contagem, das mais recentes para as mais
+        antigas. Só as linhas da página saem do SQLite.
+        """
+        colunas = list(colunas) if colunas is not None else COLUNAS
+        onde, parametros = self._onde(**filtros)
+        with self._bloqueio:
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(colunas)}, COUNT(*) OVER (PARTITION BY DescricaoNorm) AS Repeticoes"
+                f" FROM transacoes{onde}"
+                " ORDER BY Repeticoes DESC, Date DESC, Ano, Mes, Bank, Posicao LIMIT ? OFFSET ?",
+                self.conexao,
+                params=parametros + [limite, deslocamento]
+            )
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+        return df
+
+    def _valores_atuais(self, ids):
+        """{Id: {coluna editável: valor}} lidos pelo índice de Id"""
+        atuais = {}
+        for inicio in range(0, len(ids), LOTE_SQL):
+            condicao, parametros = _em('Id', ids[inicio:inicio + LOTE_SQL])
+            for id_transacao, *valores in self.conexao.execute(
+                f"SELECT Id, {', '.join(COLUNAS_EDITAVEIS)} FROM transacoes WHERE {condicao}", parametros
+            ):
+                atuais[id_transacao] = dict(zip(COLUNAS_EDITAVEIS, valores))
+        return atuais
+
+    def _aplicar(self, alteracoes):
+        """UPDATEs de uma linha por Id, agrupados pelas colunas alteradas (sem transação própria)"""
+        por_colunas = {}
+        for id_transacao, valores in alteracoes:
+            desconhecidas = set(valores) - set(COLUNAS_EDITAVEIS)
+            if desconhecidas:
+                raise ValueError(f"Colunas não editáveis: {sorted(desconhecidas)}")
+            colunas = tuple(sorted(valores))
+            por_colunas.setdefault(colunas, []).append(tuple(valores[coluna] for coluna in colunas) + (id_transacao,))
+
+        total = 0
+        for colunas, linhas in por_colunas.items():
+            atribuicoes = ', '.join(f"{coluna} = ?" for coluna in colunas)
+            self.conexao.executemany(f"UPDATE transacoes SET {atribuicoes} WHERE Id = ?", linhas)
+            total += len(linhas)
+        return total
+
+    def atualizar(self, alteracoes):
+        """Aplica `alteracoes` [(Id, {coluna: valor})] numa só transação.
+
+        As alterações são primeiro acrescentadas ao registo de edições
+        (com os valores anteriores, para desfazer); cada uma é depois um
+        UPDATE de uma linha pelo índice de Id e as partições tocadas ficam
+        marcadas para `descarregar`.
+        """
+        alteracoes = [
+            (id_transacao, {coluna: _escalar(valor) for coluna, valor in valores.items()})
+            for id_transacao, valores in alteracoes
+        ]
+        if not alteracoes:
+            return 0
+
+        with self._bloqueio:
+            atuais = self._valores_atuais([id_transacao for id_transacao, _ in alteracoes])
+            self.registo.registar([
+                {
+                    'Id': id_transacao,
+                    'antes': {coluna: atuais.get(id_transacao, {}).get(coluna) for coluna in valores},
+                    'depois': valores
+                }
+                for id_transacao, valores in alteracoes
+            ])
+            with self.conexao:
+                return self._aplicar(alteracoes)
+
+    def _compensar_aprendizagem(self, alteracoes, tipo):
+        """Acrescenta ao registo de aprendizagem a anulação/reposição das validações manuais em `alteracoes`"""
+        validadas = {
+            alteracao['Id']: alteracao['depois']['Categoria']
+            for alteracao in alteracoes
+            if 'Categoria' in alteracao['depois']
+            and str(alteracao['depois'].get('Observacao') or '').startswith('Validado manualmente')
+        }
+        if not validadas:
+            return 0
+        linhas = self.consultar(['Id', 'Description', 'Credit'], ids=list(validadas)).drop_duplicates('Id')
+        acrescentar_registos([
+            registo_compensacao(tipo, linha.Description, linha.Credit > 0, validadas[linha.Id])
+            for linha in linhas.itertuples(index=False)
+        ], self.caminho_aprendizagem)
+        return len(linhas)
+
+    def desfazer(self):
+        """Desfaz a última edição ativa; devolve [(Id, valores repostos)]"""
+        with self._bloqueio:
+            self.registo.recarregar()
+            pilha = self.registo.desfazer_pilha
+            alteracoes = self.registo.edicoes[pilha[-1]] if pilha else []
+            repostos = self.registo.desfazer()
+            with self.conexao:
+                self._aplicar(repostos)
+            self._compensar_aprendizagem(alteracoes, 'anulacao')
+            return repostos
+
+    def refazer(self):
+        """Refaz a última edição desfeita; devolve [(Id, valores aplicados)]"""
+        with self._bloqueio:
+            self.registo.recarregar()
+            pilha = self.registo.refazer_pilha
+            alteracoes = self.registo.edicoes[pilha[-1]] if pilha else []
+            aplicados = self.registo.refazer()
+            with self.conexao:
+                self._aplicar(aplicados)
+            self._compensar_aprendizagem(alteracoes, 'reposicao')
+            return aplicados
+
+    def particoes_sujas(self):
+        with self._bloqueio:
+            return list(self.conexao.execute("SELECT Ano, Mes, Bank, caminho, mtime FROM particoes WHERE suja = 1"))
+
+    def descarregar(self):
+        """Grava no armazém as partições editadas e compacta o registo de edições.
+
+        Uma partição cujo ficheiro mudou entretanto não é sobrescrita (a
+        próxima sincronização recarrega-a e reaplica o registo, que por
+        isso só é esvaziado quando todas as partições editadas foram
+        gravadas). Compactar esvazia também o histórico de desfazer/refazer.
+        Devolve os caminhos escritos.
+        """
+        with self._bloqueio:
+            return self._descarregar()
+
+    def _descarregar(self):
+        escritos = []
+        adiadas = 0
+        for ano, mes, banco, caminho, mtime in self.particoes_sujas():
+            if not os.path.exists(caminho) or os.path.getmtime(caminho) != mtime:
+                adiadas += 1
+                continue
+
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(COLUNAS)} FROM transacoes WHERE Ano = ? AND Mes = ? AND Bank = ? ORDER BY Posicao",
+                self.conexao,
+                params=(ano, mes, banco)
+            )
+            escritos += gravar_transacoes(df, self.raiz)
+            with self.conexao:
+                self.conexao.execute(
+                    "UPDATE particoes SET mtime = ?, suja = 0 WHERE Ano = ? AND Mes = ? AND Bank = ?",
+                    (os.path.getmtime(caminho), ano, mes, banco)
+                )
+        if not adiadas:
+            self.registo.compactar()
+        return escritos
+
+
+def consultar_transacoes(colunas=None, caminho=CAMINHO_LIVRO, raiz=RAIZ_ARMAZEM, **filtros):
+    """Atalho para os scripts: sincroniza o livro e devolve a consulta"""
+    livro = LivroTransacoes(caminho, raiz)
+    try:
+        livro.sincronizar()
+        return livro.consultar(colunas, **filtros)
+    finally:
+        livro.fechar()
+
+
+def descarregar_livro(caminho=CAMINHO_LIVRO, raiz=RAIZ_ARMAZEM, caminho_registo=CAMINHO_REGISTO):
+    """Grava no armazém as edições pendentes (do livro ou só do registo de edições)"""
+    if not os.path.exists(caminho) and not RegistoEdicoes(caminho_registo).linhas:
+        return []
+    livro = LivroTransacoes(caminho, raiz, caminho_registo)
+    try:
+        livro.sincronizar()
+        return livro.descarregar()
+    finally:
+        livro.fechar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Livro SQLite das transações classificadas")
+    parser.add_argument('comando', choices=['sincronizar', 'descarregar', 'desfazer', 'refazer'])
+    parser.add_argument('--livro', default=CAMINHO_LIVRO, help="Ficheiro SQLite do livro")
+    parser.add_argument('--raiz', default=RAIZ_ARMAZEM, help="Pasta do armazém")
+    args = parser.parse_args()
+
+    if args.comando == 'sincronizar':
+        livro = LivroTransacoes(args.livro, args.raiz)
+        alteradas = livro.sincronizar()
+        livro.fechar()
+        print(f"✅ {alteradas} partições recarregadas em {args.livro}")
+    elif args.comando == 'descarregar':
+        escritos = descarregar_livro(args.livro, args.raiz)
+        print(f"✅ {len(escritos)} partições gravadas em {args.raiz}")
+    else:
+        livro = LivroTransacoes(args.livro, args.raiz)
+        livro.sincronizar()
+        alteradas = livro.desfazer() if args.comando == 'desfazer' else livro.refazer()
+        livro.fechar()
+        print(f"✅ {len(alteradas)} transações repostas" if alteradas else "Nada para " + args.comando)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 MANIFESTO DOS DADOS
+Tamanho, mtime e hash de cada ficheiro bruto e das saídas de cada etapa
+(ingestão por banco, classificação), para só refazer as etapas cujas
+entradas mudaram
+
+Uso:
+    python3 manifesto_dados.py verificar ingestao       # sai com 0 se atualizada(s)
+    python3 manifesto_dados.py verificar classificacao:data/processed/transacoes
+    python3 manifesto_dados.py resumo data/processed/transacoes
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+CAMINHO_MANIFESTO = 'data/manifesto.json'
+BLOCO_HASH = 1 << 20
+
+
+def hash_conteudo(caminho):
+    """SHA-256 do conteúdo, lido em blocos"""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(BLOCO_HASH), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def etapa_classificacao(saida):
+    return f'classificacao:{saida}'
+
+
+class Manifesto:
+    """Assinaturas dos ficheiros e registo das etapas do pipeline.
+
+    `ficheiros` guarda (tamanho, mtime, hash) de cada ficheiro visto; o
+    hash só é recalculado quando o stat muda. Cada etapa guarda o hash das
+    entradas e das saídas com que correu pela última vez: está atualizada
+    se todas continuarem iguais (um ficheiro em falta conta como alterado).
+    """
+
+    def __init__(self, caminho=CAMINHO_MANIFESTO):
+        self.caminho = caminho
+        self.ficheiros = {}
+        self.etapas = {}
+        self.alterado = False
+        self._carregar()
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+        except Exception:
+            self.alterado = True
+            return
+
+        self.ficheiros = dados.get('ficheiros', {})
+        self.etapas = dados.get('etapas', {})
+
+    def assinatura(self, caminho):
+        """{'tamanho', 'mtime_ns', 'hash'} do ficheiro, ou None se não existir"""
+        try:
+            estado = os.stat(caminho)
+        except OSError:
+            return None
+
+        conhecida = self.ficheiros.get(caminho)
+        if conhecida and (conhecida['tamanho'], conhecida['mtime_ns']) == (estado.st_size, estado.st_mtime_ns):
+            return conhecida
+
+        assinatura = {'tamanho': estado.st_size, 'mtime_ns': estado.st_mtime_ns, 'hash': hash_conteudo(caminho)}
+        self.ficheiros[caminho] = assinatura
+        self.alterado = True
+        return assinatura
+
+    def hash(self, caminho):
+        assinatura = self.assinatura(caminho)
+        return assinatura['hash'] if assinatura else None
+
+    def etapa_atualizada(self, etapa, entradas=None):
+        """True se a etapa já correu com estas entradas e nada mudou desde então.
+
+        Com `entradas`, a lista de entradas também tem de ser a mesma.
+        """
+        registo = self.etapas.get(etapa)
+        if registo is None:
+            return False
+        if entradas is not None and sorted(entradas) != sorted(registo['entradas']):
+            return False
+
+        ficheiros = {**registo['entradas'], **registo['saidas']}
+        return all(self.hash(caminho) == esperado for caminho, esperado in ficheiros.items())
+
+    def etapas_atualizadas(self, prefixo):
+        """True se há etapas `prefixo:*` registadas e estão todas atualizadas"""
+        etapas = [etapa for etapa in self.etapas if etapa.split(':', 1)[0] == prefixo]
+        return bool(etapas) and all(self.etapa_atualizada(etapa) for etapa in etapas)
+
+    def registar_etapa(self, etapa, entradas, saidas, **dados):
+        self.etapas[etapa] = {
+            'entradas': {caminho: self.hash(caminho) for caminho in entradas},
+            'saidas': {caminho: self.hash(caminho) for caminho in saidas},
+            **dados
+        }
+        self.alterado = True
+
+    def salvar(self):
+        """Grava o manifesto (só se mudou), de forma atómica"""
+        if not self.alterado:
+            return
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'ficheiros': self.ficheiros, 'etapas': self.etapas}, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho)
+        self.alterado = False
+
+
+def imprimir_resumo(resumo):
+    total = resumo['total']
+    print(f"   Total de transações: {total}")
+    if total:
+        print(f"   Classificadas: {resumo['classificadas']} ({resumo['classificadas']/total*100:.1f}%)")
+        print(f"   Por classificar: {resumo['em_duvida']} ({resumo['em_duvida']/total*100:.1f}%)")
+        print(f"\n   Período: {resumo['periodo'][0]} a {resumo['periodo'][1]}")
+        print(f"   Bancos: {', '.join(resumo['bancos'])}")
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] not in ('verificar', 'resumo'):
+        print(__doc__.split('Uso:')[1].rstrip())
+        sys.exit(2)
+
+    comando, argumento = sys.argv[1:]
+    manifesto = Manifesto()
+    if comando == 'verificar':
+        if ':' in argumento:
+            atualizada = manifesto.etapa_atualizada(argumento)
+        else:
+            atualizada = manifesto.etapas_atualizadas(argumento)
+        manifesto.salvar()
+        sys.exit(0 if atualizada else 1)
+
+    resumo = manifesto.etapas.get(etapa_classificacao(argumento), {}).get('resumo')
+    if resumo is None:
+        print("   ⚠️  Sem resumo no manifesto")
+        sys.exit(1)
+    imprimir_resumo(resumo)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 MOTOR DE REGRAS V5_1
+Compila as regras de classificação num autómato Aho-Corasick partilhado
+pelo processador e pelo dashboard de validação
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from cache_classificacao import CAMINHO_CACHE, CacheClassificacao, chave_cache
+from perfil_regras import PerfilRegras
+
+CAMINHO_REGRAS = 'SISTEMA_MEMORIAS_REGRAS_CLASSIFICACAO_V5_1.json'
+
+
+def carregar_regras(caminho=CAMINHO_REGRAS):
+    """Lê as regras_classificacao_melhoradas do ficheiro V5_1"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        sistema = json.load(f)
+    return sistema['sistema_memorias_regras']['regras_classificacao_melhoradas']
+
+
+def hash_ficheiro(caminho=CAMINHO_REGRAS):
+    """SHA-256 do conteúdo do ficheiro de regras"""
+    with open(caminho, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+CAMPOS_REGRA = ('categoria', 'tipo', 'palavras_chave', 'confianca', 'valores_tipicos')
+VERSAO_ARTEFACTO = 1
+_artefactos = {}
+
+
+def caminho_artefacto(caminho=CAMINHO_REGRAS):
+    return os.path.splitext(caminho)[0] + '.compilado.pkl'
+
+
+def compilar_regras(caminho=CAMINHO_REGRAS):
+    """Gera o artefacto binário com o mínimo necessário para classificar.
+
+    Guarda só os campos usados no matching (CAMPOS_REGRA) e a lista de
+    categorias, mais o mtime/tamanho/hash do JSON de origem.
+    """
+    with open(caminho, 'rb') as f:
+        conteudo = f.read()
+    estado = os.stat(caminho)
+    regras = json.loads(conteudo)['sistema_memorias_regras']['regras_classificacao_melhoradas']
+
+    compactas = {
+        regra_id: {campo: regra[campo] for campo in CAMPOS_REGRA if campo in regra}
+        for regra_id, regra in regras.items()
+    }
+    artefacto = {
+        'versao': VERSAO_ARTEFACTO,
+        'mtime_ns': estado.st_mtime_ns,
+        'tamanho': estado.st_size,
+        'hash': hashlib.sha256(conteudo).hexdigest(),
+        'regras': compactas,
+        'categorias': sorted({regra['categoria'] for regra in compactas.values()})
+    }
+    _gravar_artefacto(caminho, artefacto)
+    return artefacto
+
+
+def _gravar_artefacto(caminho, artefacto):
+    destino = caminho_artefacto(caminho)
+    temporario = f"{destino}.tmp"
+    try:
+        with open(temporario, 'wb') as f:
+            pickle.dump(artefacto, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, destino)
+    except OSError:
+        pass
+
+
+def carregar_regras_compiladas(caminho=CAMINHO_REGRAS):
+    """Devolve o artefacto compilado, recompilando só se o JSON mudou.
+
+    Compara primeiro mtime e tamanho (um stat); se diferirem, compara o hash
+    do conteúdo antes de reparsear o JSON.
+    """
+    estado = os.stat(caminho)
+    assinatura = (estado.st_mtime_ns, estado.st_size)
+
+    artefacto = _artefactos.get(caminho)
+    if artefacto is None:
+        try:
+            with open(caminho_artefacto(caminho), 'rb') as f:
+                artefacto = pickle.load(f)
+            if artefacto.get('versao') != VERSAO_ARTEFACTO:
+                artefacto = None
+        except Exception:
+            artefacto = None
+
+    if artefacto is not None and (artefacto['mtime_ns'], artefacto['tamanho']) != assinatura:
+        if artefacto['hash'] == hash_ficheiro(caminho):
+            artefacto = dict(artefacto, mtime_ns=estado.st_mtime_ns, tamanho=estado.st_size)
+            _gravar_artefacto(caminho, artefacto)
+        else:
+            artefacto = None
+
+    if artefacto is None:
+        artefacto = compilar_regras(caminho)
+
+    _artefactos[caminho] = artefacto
+    return artefacto
+
+
+class _Automato:
+    """Autómato Aho-Corasick sobre palavras-chave já em minúsculas.
+
+    Cada estado terminal guarda uma máscara de bits com os índices das regras
+    cujas palavras-chave terminam nesse ponto (incluindo via ligações de falha).
+    """
+
+    def __init__(self, palavras):
+        self.goto = [{}]
+        self.falha = [0]
+        self.saida = [0]
+
+        for palavra, mascara in palavras:
+            estado = 0
+            for c in palavra:
+                proximo = self.goto[estado].get(c)
+                if proximo is None:
+                    proximo = len(self.goto)
+                    self.goto.append({})
+                    self.falha.append(0)
+                    self.saida.append(0)
+                    self.goto[estado][c] = proximo
+                estado = proximo
+            self.saida[estado] |= mascara
+
+        fila = deque(self.goto[0].values())
+        while fila:
+            estado = fila.popleft()
+            for c, proximo in self.goto[estado].items():
+                fila.append(proximo)
+                f = self.falha[estado]
+                while f and c not in self.goto[f]:
+                    f = self.falha[f]
+                destino = self.goto[f].get(c, 0)
+                self.falha[proximo] = destino if destino != proximo else 0
+                self.saida[proximo] |= self.saida[self.falha[proximo]]
+
+    def procurar(self, texto):
+        """Devolve a máscara de regras com pelo menos uma palavra-chave no texto"""
+        goto, falha, saida = self.goto, self.falha, self.saida
+        encontrados = saida[0]
+        estado = 0
+        for c in texto:
+            while estado and c not in goto[estado]:
+                estado = falha[estado]
+            estado = goto[estado].get(c, 0)
+            encontrados |= saida[estado]
+        return encontrados
+
+
+class MotorRegras:
+    """Classificador compilado a partir das regras V5_1.
+
+    Devolve exatamente a mesma categoria e confiança que o ciclo original
+    sobre as regras: a primeira regra (pela ordem do JSON) com a maior
+    confiança ganha.
+    """
+
+    def __init__(self, regras, hash_regras=None):
+        self.regras = regras
+        self.hash_regras = hash_regras
+        self.cache = None
+        self.perfil = None
+        self.ids = list(regras.keys())
+        self.categorias_regra = [regra.get('categoria') for regra in regras.values()]
+        self.confiancas = [float(regra.get('confianca', 0.5)) for regra in regras.values()]
+        self.valores_tipicos = [list(regra.get('valores_tipicos', [])) for regra in regras.values()]
+        self._categorias_array = np.array(self.categorias_regra + [None], dtype=object)
+        self._tipos = np.array([regra.get('tipo') for regra in regras.values()], dtype=object)
+
+        palavras_credit = []
+        palavras_debit = []
+        for i, regra in enumerate(regras.values()):
+            mascara = 1 << i
+            tipo = regra.get('tipo')
+            for palavra in regra.get('palavras_chave', []):
+                palavra = palavra.lower()
+                if tipo in ('credit', 'both'):
+                    palavras_credit.append((palavra, mascara))
+                if tipo in ('debit', 'both'):
+                    palavras_debit.append((palavra, mascara))
+
+        self._automato_credit = _Automato(palavras_credit)
+        self._automato_debit = _Automato(palavras_debit)
+
+    @classmethod
+    def de_ficheiro(cls, caminho=CAMINHO_REGRAS):
+        artefacto = carregar_regras_compiladas(caminho)
+        return cls(artefacto['regras'], hash_regras=artefacto['hash'])
+
+    def usar_cache(self, caminho=CAMINHO_CACHE, max_entradas=50000):
+        """Ativa a cache persistente de classificações (requer hash_regras)"""
+        self.cache = CacheClassificacao(self.hash_regras, caminho, max_entradas)
+        return self.cache
+
+    def ativar_perfil(self, max_tracos=10000):
+        """Liga a instrumentação por regra; devolve o PerfilRegras que acumula.
+
+        Enquanto o perfil está ativo a cache é ignorada (nem lida nem
+        escrita), para que todas as transações passem pelas regras.
+        """
+        self.perfil = PerfilRegras(self.ids, max_tracos)
+        return self.perfil
+
+    def desativar_perfil(self):
+        perfil, self.perfil = self.perfil, None
+        return perfil
+
+    def categorias(self):
+        """Categorias únicas definidas nas regras, ordenadas"""
+        return sorted(set(self.categorias_regra))
+
+    def regras_encontradas(self, descricao, credito):
+        """Máscara das regras do tipo certo com palavra-chave na descrição"""
+        automato = self._automato_credit if credito else self._automato_debit
+        return automato.procurar(str(descricao).lower())
+
+    def pontuar(self, i, valor):
+        """Confiança da regra i para um valor, incluindo o bónus de ±15%"""
+        confianca = self.confiancas[i]
+        for v_tipico in self.valores_tipicos[i]:
+            if abs(valor - v_tipico) / max(v_tipico, 0.01) < 0.15:
+                confianca += 0.1
+                break
+        return confianca
+
+    def _contar_avaliacoes(self, perfil, n_credit, n):
+        for i, tipo in enumerate(self._tipos):
+            perfil.avaliacoes[i] += {'credit': n_credit, 'debit': n - n_credit}.get(tipo, n)
+
+    def _melhor_regra(self, mascara, valor, perfil=None):
+        """(categoria, confiança) da primeira regra da máscara com a maior confiança.
+
+        Com `perfil`, conta também os acertos, o bónus, o tempo de pontuação
+        de cada regra e a vencedora.
+        """
+        melhor_categoria = None
+        melhor_confianca = 0.0
+        vencedora = None
+        while mascara:
+            bit = mascara & -mascara
+            i = bit.bit_length() - 1
+            mascara ^= bit
+
+            if perfil is None:
+                confianca = self.pontuar(i, valor)
+            else:
+                inicio = time.perf_counter()
+                confianca = self.pontuar(i, valor)
+                perfil.tempo_s[i] += time.perf_counter() - inicio
+                perfil.acertos[i] += 1
+                perfil.bonus[i] += int(confianca > self.confiancas[i])
+
+            if confianca > melhor_confianca:
+                melhor_confianca = confianca
+                melhor_categoria = self.categorias_regra[i]
+                vencedora = i
+
+        if perfil is not None:
+            if vencedora is None:
+                perfil.sem_regra += 1
+            else:
+                perfil.vitorias[vencedora] += 1
+        return melhor_categoria, melhor_confianca
+
+    def classificar(self, descricao, valor, credito):
+        """Devolve (categoria, confiança) ou (None, 0.0) se nenhuma regra aplicar"""
+        perfil = self.perfil
+        cache = self.cache if perfil is None else None
+        if cache is not None:
+            chave = chave_cache(descricao, valor, credito)
+            resultado = cache.obter(chave)
+            if resultado is not None:
+                return resultado
+
+        if perfil is None:
+            categoria, confianca = self._melhor_regra(self.regras_encontradas(descricao, credito), valor)
+            if cache is not None:
+                cache.guardar(chave, categoria, confianca)
+            return categoria, confianca
+
+        inicio = time.perf_counter()
+        mascara = self.regras_encontradas(descricao, credito)
+        perfil.tempo_procura_s += time.perf_counter() - inicio
+        self._contar_avaliacoes(perfil, int(bool(credito)), 1)
+        categoria, confianca = self._melhor_regra(mascara, valor, perfil)
+        perfil.transacoes += 1
+        encontradas = [i for i in range(mascara.bit_length()) if mascara >> i & 1]
+        perfil.tracar(descricao, valor, credito, encontradas, categoria, confianca, time.perf_counter() - inicio)
+        return categoria, confianca
+
+    def _matriz_encontradas(self, mascaras):
+        """Converte máscaras de regras (inteiros) numa matriz regras × entradas"""
+        matriz = np.zeros((len(self.ids), len(mascaras)), dtype=bool)
+        for inicio in range(0, len(self.ids), 62):
+            bloco = np.fromiter(
+                ((m >> inicio) & ((1 << 62) - 1) for m in mascaras),
+                dtype=np.int64,
+                count=len(mascaras)
+            )
+            for i in range(inicio, min(inicio + 62, len(self.ids))):
+                matriz[i] = (bloco >> (i - inicio)) & 1
+        return matriz
+
+    def classificar_lote(self, descricoes, valores, creditos):
+        """Classifica colunas inteiras de uma vez.
+
+        As palavras-chave são procuradas uma só vez por descrição única, o
+        bónus dos valores típicos é calculado por broadcasting e a regra
+        vencedora sai de um argmax sobre a matriz regras × linhas (o argmax
+        devolve o primeiro máximo, tal como o ciclo por linha).
+        Devolve (categorias, confiancas) como arrays NumPy; categoria None
+        quando nenhuma regra aplica.
+        """
+        codigos, brutas = pd.factorize(np.asarray(descricoes, dtype=object), use_na_sentinel=False)
+        descricoes = pd.Series(np.array([str(d).lower() for d in brutas], dtype=object)[codigos])
+        valores = np.asarray(valores, dtype=float)
+        creditos = np.asarray(creditos, dtype=bool)
+
+        if self.cache is None or self.perfil is not None:
+            return self._classificar_lote(descricoes, valores, creditos)
+
+        # Mesmas chaves que chave_cache, incluindo 'nan' para montantes ilegíveis
+        finitos = np.isfinite(valores)
+        centimos = pd.Series(np.rint(np.where(finitos, valores, 0) * 100).astype(np.int64)).astype(str)
+        chaves = (
+            pd.Series(np.where(creditos, 'c', 'd'))
+            + '|' + centimos.where(finitos, 'nan')
+            + '|' + descricoes.astype(str)
+        )
+        codigos, unicas = pd.factorize(chaves)
+        resultados = [self.cache.obter(chave) for chave in unicas]
+
+        em_falta = np.array([j for j, resultado in enumerate(resultados) if resultado is None], dtype=np.int64)
+        if len(em_falta):
+            _, primeiras = np.unique(codigos, return_index=True)
+            linhas = primeiras[em_falta]
+            categorias, confiancas = self._classificar_lote(descricoes.iloc[linhas], valores[linhas], creditos[linhas])
+            for j, categoria, confianca in zip(em_falta, categorias, confiancas):
+                self.cache.guardar(unicas[j], categoria, confianca)
+                resultados[j] = (categoria, float(confianca))
+
+        categorias = np.empty(len(resultados), dtype=object)
+        categorias[:] = [resultado[0] for resultado in resultados]
+        confiancas = np.array([resultado[1] for resultado in resultados], dtype=float)
+        return categorias[codigos], confiancas[codigos]
+
+    def _classificar_lote(self, descricoes, valores, creditos):
+        if not len(self.ids):
+            return np.full(len(valores), None, dtype=object), np.zeros(len(valores))
+
+        perfil = self.perfil
+        inicio = time.perf_counter()
+
+        codigos, unicas = pd.factorize(descricoes)
+        usadas_credit = np.zeros(len(unicas), dtype=bool)
+        usadas_credit[codigos[creditos]] = True
+        usadas_debit = np.zeros(len(unicas), dtype=bool)
+        usadas_debit[codigos[~creditos]] = True
+        encontradas_credit = self._matriz_encontradas([
+            self._automato_credit.procurar(d) if usada else 0 for d, usada in zip(unicas, usadas_credit)
+        ])
+        encontradas_debit = self._matriz_encontradas([
+            self._automato_debit.procurar(d) if usada else 0 for d, usada in zip(unicas, usadas_debit)
+        ])
+        encontradas = np.where(creditos[None, :], encontradas_credit[:, codigos], encontradas_debit[:, codigos])
+
+        if perfil is not None:
+            perfil.tempo_procura_s += time.perf_counter() - inicio
+            self._contar_avaliacoes(perfil, int(creditos.sum()), len(creditos))
+
+        confiancas = np.zeros(encontradas.shape, dtype=float)
+        for i, base in enumerate(self.confiancas):
+            inicio_regra = time.perf_counter() if perfil is not None else 0.0
+            linhas = np.flatnonzero(encontradas[i])
+            if not len(linhas):
+                continue
+            confiancas[i, linhas] = base
+            tipicos = np.asarray(self.valores_tipicos[i], dtype=float)
+            if len(tipicos):
+                perto = (
+                    np.abs(valores[linhas][None, :] - tipicos[:, None])
+                    / np.maximum(tipicos, 0.01)[:, None] < 0.15
+                ).any(axis=0)
+                confiancas[i, linhas[perto]] = base + 0.1
+            if perfil is not None:
+                perfil.acertos[i] += len(linhas)
+                perfil.bonus[i] += int(perto.sum()) if len(tipicos) else 0
+                perfil.tempo_s[i] += time.perf_counter() - inicio_regra
+
+        vencedora = confiancas.argmax(axis=0)
+        melhor = confiancas[vencedora, np.arange(len(valores))]
+        vencedora[melhor <= 0.0] = len(self.ids)
+        categorias = self._categorias_array[vencedora]
+        confiancas_finais = np.where(melhor > 0.0, melhor, 0.0)
+
+        if perfil is not None:
+            vitorias = np.bincount(vencedora, minlength=len(self.ids) + 1)
+            for i in range(len(self.ids)):
+                perfil.vitorias[i] += int(vitorias[i])
+            perfil.sem_regra += int(vitorias[-1])
+            perfil.transacoes += len(valores)
+            duracao = (time.perf_counter() - inicio) / max(len(valores), 1)
+            for linha in range(min(len(valores), perfil.max_tracos - len(perfil.tracos))):
+                perfil.tracar(descricoes.iloc[linha], valores[linha], creditos[linha],
+                              np.flatnonzero(encontradas[:, linha]), categorias[linha],
+                              confiancas_finais[linha], duracao)
+
+        return categorias, confiancas_finais
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 PERFIL DO MOTOR DE REGRAS
+Contadores por regra (avaliações, palavras-chave encontradas, vitórias,
+bónus de valor típico, tempo) e traços por transação, só quando ativado
+"""
+
+import csv
+import json
+import os
+from datetime import datetime
+
+
+class PerfilRegras:
+    """Acumula estatísticas do MotorRegras.
+
+    `avaliacoes` conta as transações do tipo certo para a regra (as que o
+    ciclo original avaliaria); `tempo_s` é o tempo de pontuação da regra.
+    O tempo da procura de palavras-chave (partilhado por todas as regras)
+    fica em `tempo_procura_s`.
+    """
+
+    def __init__(self, ids, max_tracos=10000):
+        self.ids = list(ids)
+        self.max_tracos = max_tracos
+        self.avaliacoes = [0] * len(self.ids)
+        self.acertos = [0] * len(self.ids)
+        self.vitorias = [0] * len(self.ids)
+        self.bonus = [0] * len(self.ids)
+        self.tempo_s = [0.0] * len(self.ids)
+        self.transacoes = 0
+        self.sem_regra = 0
+        self.tempo_procura_s = 0.0
+        self.tracos = []
+
+    def tracar(self, descricao, valor, credito, encontradas, categoria, confianca, tempo_s):
+        if len(self.tracos) < self.max_tracos:
+            self.tracos.append({
+                'descricao': str(descricao),
+                'valor': float(valor),
+                'tipo': 'credit' if credito else 'debit',
+                'regras_encontradas': [self.ids[i] for i in encontradas],
+                'categoria': categoria,
+                'confianca': round(float(confianca), 4),
+                'tempo_us': round(tempo_s * 1e6, 2)
+            })
+
+    def juntar(self, outro):
+        """Soma os contadores de outro perfil (ex.: de um worker)"""
+        for campo in ('avaliacoes', 'acertos', 'vitorias', 'bonus', 'tempo_s'):
+            atual = getattr(self, campo)
+            for i, valor in enumerate(getattr(outro, campo)):
+                atual[i] += valor
+        self.transacoes += outro.transacoes
+        self.sem_regra += outro.sem_regra
+        self.tempo_procura_s += outro.tempo_procura_s
+        self.tracos.extend(outro.tracos[:max(self.max_tracos - len(self.tracos), 0)])
+
+    def por_regra(self):
+        return [
+            {
+                'regra': regra_id,
+                'avaliacoes': self.avaliacoes[i],
+                'acertos_palavras_chave': self.acertos[i],
+                'vitorias': self.vitorias[i],
+                'bonus_valor_tipico': self.bonus[i],
+                'tempo_ms': round(self.tempo_s[i] * 1000, 3)
+            }
+            for i, regra_id in enumerate(self.ids)
+        ]
+
+    def gravar(self, pasta='data/processed', nome='perfil_regras'):
+        """Grava <nome>.json (resumo, regras e traços) e <nome>.csv (por regra)"""
+        os.makedirs(pasta, exist_ok=True)
+        regras = self.por_regra()
+
+        caminho_json = os.path.join(pasta, f'{nome}.json')
+        with open(caminho_json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'gerado': datetime.now().isoformat(),
+                'transacoes': self.transacoes,
+                'sem_regra': self.sem_regra,
+                'tempo_procura_ms': round(self.tempo_procura_s * 1000, 3),
+                'regras': regras,
+                'tracos': self.tracos
+            }, f, indent=2, ensure_ascii=False)
+
+        caminho_csv = os.path.join(pasta, f'{nome}.csv')
+        with open(caminho_csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(regras[0].keys()) if regras else ['regra'])
+            writer.writeheader()
+            writer.writerows(regras)
+
+        return caminho_json, caminho_csv
@@ -1,229 +1,163 @@
+import argparse
 import csv
-import re
-from datetime import datetime
+import itertools
+import sys
 
-def _parse_montante(montante_str: str):
-    s = (montante_str or '').strip()
-    if not s:
-        return None
+from adaptadores_bancos import ADAPTADORES, CAMPOS_SAIDA, EscritorParticoes, ler_exportacao, ler_millennium
+from indice_impressoes import CAMINHO_INDICE, IndiceImpressoes, imprimir_relatorio, origem_exportacao
+from manifesto_dados import Manifesto
 
-    s = re.sub(r'[€\s]', '', s)
-
-    if ',' in s and '.' in s:
-        s = s.replace('.', '').replace(',', '.')
-    elif ',' in s:
-        s = s.replace(',', '.')
-
-    try:
-        return float(s)
-    except Exception:
-        return None
+EXPORTACOES_PADRAO = [
+    ('millennium', 'data/raw/dezembro_2025/MOVS_0_212026.csv'),
+    ('millennium', 'data/raw/dezembro_2025/MOVS_0_212026 (1).csv'),
+    ('revolut', 'data/raw/novembro_2025/account-statement_2025-11-01_2025-12-31_pt-pt_281410.csv'),
+]
 
 def processar_millennium(input_file, output_file, banco_nome):
+    """Converte uma exportação Millennium num único CSV (sem partições)"""
     print(f'Processando {banco_nome}...')
-    transacoes = []
-    
+    transacoes = ler_millennium(input_file, banco_nome)
     try:
-        with open(input_file, 'r', encoding='utf-16-le') as f:
-            lines = f.readlines()
-    except:
-        try:
-            with open(input_file, 'r', encoding='latin-1') as f:
-                lines = f.readlines()
-        except:
-            with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-    
-    header_idx = None
-    for i, line in enumerate(lines):
-        if 'Data lançamento' in line and 'Data valor' in line:
-            header_idx = i
-            break
-    
-    if header_idx is None:
-        for i, line in enumerate(lines):
-            if 'Data lançamento' in line or 'Data de lançamento' in line:
-                header_idx = i
-                break
-    
-    if header_idx is None:
-        print(f'  ❌ Cabeçalho não encontrado')
-        print(f'  Linhas encontradas: {len(lines)}')
+        primeira = list(itertools.islice(transacoes, 1))
+    except ValueError as e:
+        print(f'  ❌ {e}')
         return False
-    
-    reader = csv.DictReader(lines[header_idx:], delimiter=';')
-    rows = list(reader)
-    
-    for row in rows:
-        if row is None or not row:
-            continue
-            
-        data_lanc = row.get('Data lançamento', '')
-        descricao = row.get('Descrição', '')
-        montante_str = row.get('Montante', '')
-        tipo = row.get('Tipo', '')
-        
-        if data_lanc:
-            data_lanc = data_lanc.strip()
-        if descricao:
-            descricao = descricao.strip()
-        if montante_str:
-            montante_str = montante_str.strip()
-        if tipo:
-            tipo = tipo.strip()
-        
-        if not data_lanc or not descricao or not montante_str:
-            continue
-        
-        try:
-            data = datetime.strptime(data_lanc, '%d-%m-%Y')
-        except:
-            continue
-        
-        montante = _parse_montante(montante_str)
-        if montante is None:
-            continue
-        
-        if montante > 0:
-            debit = 0.0
-            credit = montante
-            valor = montante
-        else:
-            debit = abs(montante)
-            credit = 0.0
-            valor = abs(montante)
-        
-        transacao = {
-            'Date': data.strftime('%Y-%m-%d'),
-            'Bank': banco_nome,
-            'Description': descricao,
-            'Valor': valor,
-            'Debit': debit,
-            'Credit': credit,
-            'Categoria': '',
-            'Confianca': 0.0,
-            'Observacao': ''
-        }
-        transacoes.append(transacao)
-    
-    print(f'  ✅ {len(transacoes)} transações extraídas')
-    
+
+    total = 0
     with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['Date', 'Bank', 'Description', 'Valor', 'Debit', 'Credit', 'Categoria', 'Confianca', 'Observacao']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=CAMPOS_SAIDA)
         writer.writeheader()
-        writer.writerows(transacoes)
-    
-    return True
+        for transacao in itertools.chain(primeira, transacoes):
+            writer.writerow(transacao)
+            total += 1
 
-def processar_revolut(input_file, output_file_nov, output_file_dez):
-    print('Processando Revolut...')
-    transacoes_nov = []
-    transacoes_dez = []
-    
-    with open(input_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-    
-    for row in rows:
-        data_inicio = row.get('Data de início', '').strip()
-        descricao = row.get('Descrição', '').strip()
-        montante_str = row.get('Montante', '').strip()
-        
-        if not data_inicio or not descricao or not montante_str:
-            continue
-        
-        try:
-            data = datetime.strptime(data_inicio.split(' ')[0], '%Y-%m-%d')
-        except:
-            continue
-        
-        mes = data.month
-        if mes not in [11, 12]:
-            continue
-        
-        montante_str = montante_str.replace(',', '.')
-        try:
-            montante = float(montante_str)
-        except:
-            continue
-        
-        if montante < 0:
-            debit = abs(montante)
-            credit = 0.0
-            valor = abs(montante)
-        else:
-            debit = 0.0
-            credit = montante
-            valor = montante
-        
-        transacao = {
-            'Date': data.strftime('%Y-%m-%d'),
-            'Bank': 'Revolut',
-            'Description': descricao,
-            'Valor': valor,
-            'Debit': debit,
-            'Credit': credit,
-            'Categoria': '',
-            'Confianca': 0.0,
-            'Observacao': ''
-        }
-        
-        if mes == 11:
-            transacoes_nov.append(transacao)
-        elif mes == 12:
-            transacoes_dez.append(transacao)
-    
-    print(f'  ✅ {len(transacoes_nov)} transações de Novembro')
-    print(f'  ✅ {len(transacoes_dez)} transações de Dezembro')
-    
-    with open(output_file_nov, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['Date', 'Bank', 'Description', 'Valor', 'Debit', 'Credit', 'Categoria', 'Confianca', 'Observacao']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(transacoes_nov)
-    
-    with open(output_file_dez, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['Date', 'Bank', 'Description', 'Valor', 'Debit', 'Credit', 'Categoria', 'Confianca', 'Observacao']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(transacoes_dez)
-    
+    print(f'  ✅ {total} transações extraídas')
     return True
 
-if __name__ == '__main__':
-    print('=== PREPARANDO CSVs NOVEMBRO E DEZEMBRO ===\n')
-    
+def etapa_ingestao(chave):
+    return f'ingestao:{chave}'
+
+def _por_banco(exportacoes):
+    bancos = {}
+    for chave, caminho in exportacoes:
+        bancos.setdefault(chave, []).append(caminho)
+    return bancos
+
+def exportacoes_alteradas(exportacoes, manifesto):
+    """Exportações dos bancos cuja ingestão não está atualizada no manifesto.
+
+    As exportações de um banco partilham as partições, por isso um banco é
+    refeito por inteiro se alguma exportação ou partição sua mudou.
+    """
+    alterados = {
+        chave for chave, caminhos in _por_banco(exportacoes).items()
+        if not manifesto.etapa_atualizada(etapa_ingestao(chave), caminhos)
+    }
+    return [(chave, caminho) for chave, caminho in exportacoes if chave in alterados]
+
+def preparar_exportacoes(exportacoes, raiz='data/raw', manifesto=None, indice=None):
+    """Lê cada exportação (banco, caminho) uma vez e reparte-a por mês.
+
+    As partições só são reescritas no fim, com as exportações lidas por
+    inteiro: uma exportação inválida a meio não deixa um mês truncado.
+    Com `manifesto`, regista a ingestão de cada banco (as exportações e as
+    partições escritas); uma exportação em falta ou inválida só volta a ser
+    lida quando mudar. Com `indice` (IndiceImpressoes), as transações já
+    ingeridas de outra exportação vão para a quarentena e as partições
+    reescritas mantêm as transações das exportações que não foram lidas
+    agora, incluindo as de uma exportação em falta ou inválida.
+    """
     success = True
-    
-    if processar_millennium(
-        'data/raw/dezembro_2025/MOVS_0_212026.csv',
-        'data/raw/novembro_2025/millennium_novembro_2025.csv',
-        'Millennium'
-    ):
-        print('  ✅ Millennium Novembro salvo\n')
-    else:
-        success = False
-    
-    if processar_millennium(
-        'data/raw/dezembro_2025/MOVS_0_212026 (1).csv',
-        'data/raw/dezembro_2025/millennium_dezembro_2025.csv',
-        'Millennium'
-    ):
-        print('  ✅ Millennium Dezembro salvo\n')
-    else:
-        success = False
-    
-    if processar_revolut(
-        'data/raw/novembro_2025/account-statement_2025-11-01_2025-12-31_pt-pt_281410.csv',
-        'data/raw/novembro_2025/revolut_novembro_2025.csv',
-        'data/raw/dezembro_2025/revolut_dezembro_2025.csv'
-    ):
-        print('  ✅ Revolut Novembro e Dezembro salvos\n')
-    else:
-        success = False
-    
-    if success:
-        print('=== ✅ TODOS OS CSVs PREPARADOS COM SUCESSO ===')
+    retidas = None
+    if indice is not None:
+        lidas = []
+        retidas = lambda chave, ano, mes: indice.retidas(chave, ano, mes, lidas)
+
+    with EscritorParticoes(raiz, retidas=retidas) as escritor:
+        for chave, caminho in exportacoes:
+            print(f'Processando {ADAPTADORES[chave][0]} ({caminho})...')
+            origem = origem_exportacao(caminho)
+            total = 0
+            try:
+                transacoes = ler_exportacao(chave, caminho)
+                if indice is not None:
+                    transacoes = indice.filtrar(chave, origem, transacoes)
+                for transacao in transacoes:
+                    escritor.escrever(chave, transacao)
+                    total += 1
+            except (OSError, ValueError) as e:
+                escritor.descartar()
+                if indice is not None:
+                    indice.descartar()
+                print(f'  ❌ {e}')
+                success = False
+                continue
+            escritor.concluir()
+            if indice is not None:
+                indice.confirmar()
+                lidas.append(origem)
+            print(f'  ✅ {total} transações extraídas')
+            if indice is not None and indice.duplicados[origem]:
+                print(f'  🚧 {indice.duplicados[origem]} duplicadas em quarentena')
+
+    for caminho, total in sorted(escritor.contagens.items()):
+        print(f'  💾 {caminho}: {total} transações')
+
+    if indice is not None and sum(indice.duplicados.values()):
+        print()
+        imprimir_relatorio(indice.relatorio())
+
+    if manifesto is not None:
+        for chave, caminhos in _por_banco(exportacoes).items():
+            manifesto.registar_etapa(etapa_ingestao(chave), caminhos, escritor.particoes.get(chave, []))
+        manifesto.salvar()
+    return success
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prepara as exportações dos bancos em data/raw/<mes>_<ano>/')
+    parser.add_argument(
+        '--exportacao',
+        nargs=2,
+        action='append',
+        metavar=('BANCO', 'FICHEIRO'),
+        help=f"Exportação a preparar (pode repetir); bancos: {', '.join(sorted(ADAPTADORES))}"
+    )
+    parser.add_argument('--raiz', default='data/raw', help='Pasta das partições')
+    parser.add_argument(
+        '--indice',
+        default=CAMINHO_INDICE,
+        help='Índice de impressões para detetar transações já ingeridas (SQLite)'
+    )
+    parser.add_argument('--sem-indice', action='store_true', help='Não verifica duplicados entre exportações')
+    parser.add_argument(
+        '--alteradas',
+        action='store_true',
+        help='Só prepara os bancos cujas exportações ou partições mudaram (data/manifesto.json)'
+    )
+    args = parser.parse_args()
+
+    exportacoes = [tuple(e) for e in args.exportacao] if args.exportacao else EXPORTACOES_PADRAO
+    for chave, _ in exportacoes:
+        if chave not in ADAPTADORES:
+            parser.error(f"banco desconhecido: {chave}")
+
+    print('=== PREPARANDO CSVs ===\n')
+
+    manifesto = Manifesto()
+    if args.alteradas:
+        exportacoes = exportacoes_alteradas(exportacoes, manifesto)
+        if not exportacoes:
+            print('⏭️  Nenhuma exportação alterada')
+
+    indice = None if args.sem_indice else IndiceImpressoes(args.indice)
+    try:
+        sucesso = preparar_exportacoes(exportacoes, args.raiz, manifesto, indice)
+    finally:
+        if indice is not None:
+            indice.fechar()
+
+    if sucesso:
+        print('\n=== ✅ TODOS OS CSVs PREPARADOS COM SUCESSO ===')
     else:
-        print('=== ❌ ERROS NO PROCESSAMENTO ===')
+        print('\n=== ❌ ERROS NO PROCESSAMENTO ===')
+        sys.exit(1)
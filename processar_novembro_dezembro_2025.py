@@ -5,55 +5,86 @@
 Aplica aprendizagem V5_1 para classificar transações
 """
 
+import argparse
+import os
 import pandas as pd
+import numpy as np
 import json
 import csv
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from adaptadores_bancos import descobrir_particoes
+from armazem_transacoes import RAIZ_ARMAZEM, gravar_transacoes, ler_transacoes
+from aprendizagem_compilada import CAMINHO_APRENDIZAGEM, CONFIANCA_APRENDIZAGEM, TabelaAprendizagem
+from identificadores import calcular_ids
+from livro_transacoes import descarregar_livro
+from manifesto_dados import Manifesto, etapa_classificacao
+from motor_regras import CAMINHO_REGRAS, MotorRegras
+from transferencias_internas import JANELA_DIAS, marcar_transferencias
+
+COLUNAS_SAIDA = ['Date', 'Bank', 'Description', 'Valor', 'Debit', 'Credit',
+                 'Categoria', 'Confianca', 'Observacao', 'Id', 'HashRegras']
+
 class ProcessadorNovembroDezembro:
     def __init__(self):
         """Inicializa o processador com as regras V5_1"""
-        with open('SISTEMA_MEMORIAS_REGRAS_CLASSIFICACAO_V5_1.json', 'r', encoding='utf-8') as f:
-            self.sistema = json.load(f)
-
-        self.regras = self.sistema['sistema_memorias_regras']['regras_classificacao_melhoradas']
-        self.transacoes_processadas = []
+        self.motor = MotorRegras.de_ficheiro()
+        self.motor.usar_cache()
+        self.regras = self.motor.regras
+        self.aprendizagem = TabelaAprendizagem()
+        self.aprendizagem.atualizar()
+        self.lotes_processados = []
         self.transacoes_em_duvida = []
+        self.anteriores = None
+        self.resumo = None
+
+    def carregar_anteriores(self, raiz):
+        """Carrega a classificação anterior (armazém Parquet) para o modo incremental"""
+        df = ler_transacoes(raiz=raiz, categoricas=False)
+        if df.empty:
+            return 0
+
+        df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+        df['Observacao'] = df['Observacao'].fillna('')
+        df['HashRegras'] = df['HashRegras'].fillna('')
+
+        self.anteriores = df[COLUNAS_SAIDA].drop_duplicates('Id', keep='last').set_index('Id')
+        return len(self.anteriores)
+
+    def _reaproveitaveis(self, ids):
+        """Linhas já classificadas com as regras atuais ou validadas manualmente"""
+        if self.anteriores is None:
+            return np.zeros(len(ids), dtype=bool)
+
+        existentes = ids.isin(self.anteriores.index).to_numpy()
+        anteriores = self.anteriores.reindex(ids[existentes])
+        atuais = (
+            anteriores['Observacao'].str.startswith('Validado manualmente')
+            | (
+                (anteriores['HashRegras'] == self.motor.hash_regras)
+                & (anteriores['Observacao'] != 'Classificado por aprendizagem')
+            )
+        ).to_numpy()
+
+        reaproveitar = np.zeros(len(ids), dtype=bool)
+        reaproveitar[np.flatnonzero(existentes)[atuais]] = True
+        return reaproveitar
 
     def classificar_transacao(self, transacao):
         """Classifica uma transação usando o sistema V5_1"""
-        descricao = transacao['Description'].lower()
-        valor = transacao['Valor']
-        tipo_transacao = 'credit' if transacao['Credit'] > 0 else 'debit'
-
-        melhor_categoria = None
-        melhor_confianca = 0.0
-
-        for _, regra in self.regras.items():
-            if regra.get('tipo') not in [tipo_transacao, 'both']:
-                continue
-
-            palavras_chave = regra.get('palavras_chave', [])
-            encontrou = False
-            for palavra in palavras_chave:
-                if palavra.lower() in descricao:
-                    encontrou = True
-                    break
-
-            if not encontrou:
-                continue
-
-            confianca = float(regra.get('confianca', 0.5))
-
-            valores_tipicos = regra.get('valores_tipicos', [])
-            for v_tipico in valores_tipicos:
-                if abs(valor - v_tipico) / max(v_tipico, 0.01) < 0.15:
-                    confianca += 0.1
-                    break
+        aprendida = self.aprendizagem.obter(transacao['Description'], transacao['Credit'] > 0)
+        if aprendida:
+            transacao['Categoria'] = aprendida
+            transacao['Confianca'] = CONFIANCA_APRENDIZAGEM
+            transacao['Observacao'] = 'Classificado por aprendizagem'
+            return True
 
-            if confianca > melhor_confianca:
-                melhor_confianca = confianca
-                melhor_categoria = regra.get('categoria')
+        melhor_categoria, melhor_confianca = self.motor.classificar(
+            transacao['Description'],
+            transacao['Valor'],
+            transacao['Credit'] > 0
+        )
 
         if melhor_categoria:
             transacao['Categoria'] = melhor_categoria
@@ -66,60 +97,132 @@ class ProcessadorNovembroDezembro:
         transacao['Observacao'] = 'Necessita revisão manual'
         return False
 
+    def classificar_lote(self, df):
+        """Classifica um DataFrame inteiro de uma vez (mesmo resultado que linha a linha)"""
+        lote = df[['Date', 'Bank', 'Description', 'Valor', 'Debit', 'Credit']].copy()
+        creditos = (lote['Credit'] > 0).to_numpy()
+
+        aprendidas = self.aprendizagem.procurar_lote(lote['Description'], creditos)
+        por_regras = pd.isna(aprendidas)
+
+        categorias = aprendidas.copy()
+        confiancas = np.full(len(lote), CONFIANCA_APRENDIZAGEM)
+        categorias[por_regras], confiancas[por_regras] = self.motor.classificar_lote(
+            lote['Description'].to_numpy()[por_regras],
+            lote['Valor'].to_numpy()[por_regras],
+            creditos[por_regras]
+        )
+        classificada = pd.notna(categorias) & (categorias != '')
+
+        lote['Categoria'] = np.where(classificada, categorias, 'Nao Categorizado')
+        lote['Confianca'] = np.where(classificada, confiancas, 0.0)
+        lote['Observacao'] = np.where(
+            ~por_regras, 'Classificado por aprendizagem',
+            np.where(classificada, 'Classificado automaticamente', 'Necessita revisão manual')
+        )
+        lote['Id'] = df['Id'] if 'Id' in df.columns else calcular_ids(lote)
+        lote['HashRegras'] = self.motor.hash_regras
+        return lote
+
+    def _aplicar_aprendizagem(self, lote):
+        """Sobrepõe as categorias aprendidas (exceto a linhas validadas manualmente)"""
+        aprendidas = self.aprendizagem.procurar_lote(lote['Description'], lote['Credit'] > 0)
+        aplicar = pd.notna(aprendidas) & ~lote['Observacao'].astype(str).str.startswith('Validado manualmente').to_numpy()
+        if not aplicar.any():
+            return 0
+
+        lote.loc[aplicar, 'Categoria'] = aprendidas[aplicar]
+        lote.loc[aplicar, 'Confianca'] = CONFIANCA_APRENDIZAGEM
+        lote.loc[aplicar, 'Observacao'] = 'Classificado por aprendizagem'
+        return int(aplicar.sum())
+
+    def classificar_ficheiro(self, caminho):
+        """Lê e classifica um CSV; devolve (lote, classificadas, em_duvida, mantidas)"""
+        df = pd.read_csv(caminho)
+        df['Id'] = calcular_ids(df)
+        reaproveitar = self._reaproveitaveis(df['Id'])
+
+        lote = self.classificar_lote(df[~reaproveitar])
+        classificadas = int((lote['Categoria'] != 'Nao Categorizado').sum())
+        em_duvida = len(lote) - classificadas
+
+        if reaproveitar.any():
+            mantidas = self.anteriores.loc[df.loc[reaproveitar, 'Id']].reset_index()
+            lote = pd.concat([mantidas, lote], ignore_index=True).set_index('Id').loc[df['Id']].reset_index()
+            self._aplicar_aprendizagem(lote)
+
+        return lote[COLUNAS_SAIDA], classificadas, em_duvida, int(reaproveitar.sum())
+
+    def _registar_lote(self, mes_nome, lote, classificadas, em_duvida, mantidas):
+        self.lotes_processados.append(lote)
+        print(f"\n📊 {mes_nome}: {len(lote)} transações")
+        print(f"   ✅ Classificadas: {classificadas}")
+        print(f"   ⚠️  Em dúvida: {em_duvida}")
+        if mantidas:
+            print(f"   ♻️  Mantidas da execução anterior: {mantidas}")
+
     def processar_csv(self, caminho, mes_nome):
         """Processa ficheiro CSV de um mês"""
-        print(f"\n📊 Processando {mes_nome}...")
-
         try:
-            df = pd.read_csv(caminho)
-            print(f"   ✅ Carregadas {len(df)} transações")
-
-            classificadas = 0
-            em_duvida = 0
-
-            for idx, row in df.iterrows():
-                transacao = {
-                    'Date': row['Date'],
-                    'Bank': row['Bank'],
-                    'Description': row['Description'],
-                    'Valor': row['Valor'],
-                    'Debit': row['Debit'],
-                    'Credit': row['Credit'],
-                    'Categoria': None,
-                    'Confianca': 0.0,
-                    'Observacao': ''
-                }
-
-                classificada = self.classificar_transacao(transacao)
-
-                if classificada:
-                    classificadas += 1
-                else:
-                    em_duvida += 1
-
-                self.transacoes_processadas.append(transacao)
-
-            print(f"   ✅ Classificadas: {classificadas}")
-            print(f"   ⚠️  Em dúvida: {em_duvida}")
-
+            self._registar_lote(mes_nome, *self.classificar_ficheiro(caminho))
             return True
 
         except Exception as e:
+            print(f"\n📊 {mes_nome}...")
             print(f"   ❌ Erro: {e}")
             return False
 
-    def consolidar_e_salvar(self, nome_arquivo):
-        """Consolida todas as transações e salva em CSV"""
+    def processar_em_paralelo(self, arquivos, processos=None, raiz_anteriores=None):
+        """Classifica várias partições num pool de processos.
+
+        Cada worker carrega as regras (e a classificação anterior, se houver)
+        uma única vez; os resultados são juntados pela ordem de `arquivos`,
+        independentemente da ordem em que os workers terminam.
+        """
+        caminhos = [arquivo for arquivo, _ in arquivos]
+        with ProcessPoolExecutor(
+            max_workers=processos,
+            initializer=_iniciar_worker,
+            initargs=(raiz_anteriores, self.motor.perfil is not None)
+        ) as executor:
+            resultados = executor.map(_classificar_particao, caminhos)
+            for (_, nome), (resultado, perfil) in zip(arquivos, resultados):
+                if perfil is not None:
+                    self.motor.perfil.juntar(perfil)
+                if isinstance(resultado, Exception):
+                    print(f"\n📊 {nome}...")
+                    print(f"   ❌ Erro: {resultado}")
+                    continue
+                self._registar_lote(nome, *resultado)
+
+    def consolidar_e_salvar(self, raiz=RAIZ_ARMAZEM, janela_transferencias=JANELA_DIAS):
+        """Consolida todas as transações e grava as partições (ano, mês, banco) no armazém.
+
+        Antes de gravar, emparelha as transferências internas entre contas
+        (janela em dias; None não emparelha) e lista os pares que não marca
+        por um dos lados já ter outra categoria confiante. Devolve os caminhos das
+        partições escritas.
+        """
         print(f"\n💾 Salvando transações consolidadas...")
 
-        df = pd.DataFrame(self.transacoes_processadas)
+        df = pd.concat(self.lotes_processados, ignore_index=True)
+        if janela_transferencias is not None:
+            pares, conflitos = marcar_transferencias(df, janela_transferencias)
+            print(f"   🔗 {len(pares)} transferências internas emparelhadas")
+            if len(conflitos):
+                print(f"   ⚠️  {len(conflitos)} pares com um lado classificado noutra categoria (não marcados):")
+                for par in conflitos.itertuples(index=False):
+                    debito, credito = df.loc[par.debito], df.loc[par.credito]
+                    print(f"      {debito['Debit']:.2f}€ {debito['Date']} {debito['Bank']} '{debito['Description']}' "
+                          f"[{debito['Categoria']}] -> {credito['Date']} {credito['Bank']} "
+                          f"'{credito['Description']}' [{credito['Categoria']}]")
 
-        output_path = f'data/processed/{nome_arquivo}'
-        df.to_csv(output_path, index=False, encoding='utf-8')
+        escritos = gravar_transacoes(df, raiz)
+        self.motor.cache.salvar()
 
-        print(f"   ✅ Salvo: {output_path}")
+        print(f"   ✅ Salvo: {len(escritos)} partições em {raiz}")
 
-        resumo = self.gerar_resumo(df)
+        resumo = self.resumo = self.gerar_resumo(df)
         print("\n📈 RESUMO DA CLASSIFICAÇÃO:")
         print("=" * 60)
         print(f"Total de transações: {len(df)}")
@@ -130,7 +233,7 @@ class ProcessadorNovembroDezembro:
             if cat != 'Nao Categorizado':
                 print(f"  - {cat}: {count}")
 
-        return output_path
+        return escritos
 
     def gerar_resumo(self, df):
         """Gera resumo estatístico"""
@@ -143,32 +246,129 @@ class ProcessadorNovembroDezembro:
             'total': len(df),
             'classificadas': classificadas,
             'em_duvida': em_duvida,
-            'categorias': categorias
+            'categorias': categorias,
+            'periodo': [str(df['Date'].min()), str(df['Date'].max())] if len(df) else None,
+            'bancos': [str(banco) for banco in df['Bank'].unique()]
         }
 
+_processador_worker = None
+
+def _iniciar_worker(raiz_anteriores, perfil=False):
+    global _processador_worker
+    _processador_worker = ProcessadorNovembroDezembro()
+    if raiz_anteriores:
+        _processador_worker.carregar_anteriores(raiz_anteriores)
+    if perfil:
+        _processador_worker.motor.ativar_perfil()
+
+def _classificar_particao(caminho):
+    """Classifica uma partição no worker; devolve (resultado, perfil da partição)"""
+    motor = _processador_worker.motor
+    try:
+        resultado = _processador_worker.classificar_ficheiro(caminho)
+    except Exception as e:
+        resultado = e
+    if motor.perfil is None:
+        return resultado, None
+    perfil = motor.perfil
+    motor.ativar_perfil(perfil.max_tracos)
+    return resultado, perfil
+
 def main():
+    parser = argparse.ArgumentParser(description="Classifica as transações de novembro e dezembro 2025")
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help="Só classifica transações novas ou com regras desatualizadas; mantém validações manuais"
+    )
+    parser.add_argument(
+        '--backfill',
+        action='store_true',
+        help="Classifica todas as partições data/raw/<mes>_<ano>/ em paralelo"
+    )
+    parser.add_argument(
+        '--processos',
+        type=int,
+        default=None,
+        help="Número de processos no modo --backfill (por omissão: nº de CPUs)"
+    )
+    parser.add_argument(
+        '--perfil',
+        action='store_true',
+        help="Regista contadores por regra e traços por transação em data/processed/perfil_regras.*"
+    )
+    parser.add_argument(
+        '--armazem',
+        default=RAIZ_ARMAZEM,
+        help="Pasta do armazém Parquet (partições ano=/mes=/banco=)"
+    )
+    parser.add_argument(
+        '--janela-transferencias',
+        type=int,
+        default=JANELA_DIAS,
+        help="Dias máximos entre o débito e o crédito de uma transferência interna"
+    )
+    parser.add_argument(
+        '--sem-transferencias',
+        action='store_true',
+        help="Não emparelha transferências internas entre contas"
+    )
+    args = parser.parse_args()
+
     print("=" * 60)
     print("🏺 PROCESSADOR DE NOVEMBRO E DEZEMBRO 2025")
     print("=" * 60)
 
-    processador = ProcessadorNovembroDezembro()
-
-    arquivos = [
-        ('data/raw/novembro_2025/millennium_novembro_2025.csv', 'Millennium Novembro'),
-        ('data/raw/novembro_2025/revolut_novembro_2025.csv', 'Revolut Novembro'),
-        ('data/raw/dezembro_2025/millennium_dezembro_2025.csv', 'Millennium Dezembro'),
-        ('data/raw/dezembro_2025/revolut_dezembro_2025.csv', 'Revolut Dezembro')
-    ]
-
-    for arquivo, nome in arquivos:
-        processador.processar_csv(arquivo, nome)
+    raiz_anteriores = args.armazem if args.incremental else None
 
-    output = processador.consolidar_e_salvar('novembro_dezembro_2025_classificado.csv')
+    processador = ProcessadorNovembroDezembro()
+    if args.perfil:
+        processador.motor.ativar_perfil()
+    if raiz_anteriores:
+        # Validações do dashboard ainda só no livro/registo de edições passam primeiro para o armazém
+        descarregadas = descarregar_livro(raiz=raiz_anteriores)
+        if descarregadas:
+            print(f"\n📒 {len(descarregadas)} partições editadas no livro gravadas no armazém")
+        anteriores = processador.carregar_anteriores(raiz_anteriores)
+        print(f"\n♻️  Modo incremental: {anteriores} transações anteriores carregadas")
+
+    if args.backfill:
+        arquivos = descobrir_particoes()
+        print(f"\n🚀 Backfill: {len(arquivos)} partições, {args.processos or os.cpu_count()} processos")
+        processador.processar_em_paralelo(arquivos, args.processos, raiz_anteriores)
+    else:
+        arquivos = [
+            ('data/raw/novembro_2025/millennium_novembro_2025.csv', 'Millennium Novembro'),
+            ('data/raw/novembro_2025/revolut_novembro_2025.csv', 'Revolut Novembro'),
+            ('data/raw/dezembro_2025/millennium_dezembro_2025.csv', 'Millennium Dezembro'),
+            ('data/raw/dezembro_2025/revolut_dezembro_2025.csv', 'Revolut Dezembro')
+        ]
+
+        for arquivo, nome in arquivos:
+            processador.processar_csv(arquivo, nome)
+
+    escritos = processador.consolidar_e_salvar(
+        args.armazem,
+        None if args.sem_transferencias else args.janela_transferencias
+    )
+
+    manifesto = Manifesto()
+    manifesto.registar_etapa(
+        etapa_classificacao(args.armazem),
+        [arquivo for arquivo, _ in arquivos] + [CAMINHO_REGRAS, CAMINHO_APRENDIZAGEM],
+        escritos,
+        resumo=processador.resumo
+    )
+    manifesto.salvar()
+
+    if args.perfil:
+        caminho_json, caminho_csv = processador.motor.perfil.gravar()
+        print(f"\n🔬 Perfil das regras: {caminho_json} e {caminho_csv}")
 
     print("\n✅ PROCESSAMENTO CONCLUÍDO!")
-    print(f"📁 Ficheiro salvo: {output}")
+    print(f"📁 Armazém: {args.armazem} ({len(escritos)} partições)")
     print("\n💡 PRÓXIMOS PASSOS:")
-    print("1. Revise as transações em dúvida no CSV")
+    print("1. Revise as transações em dúvida no dashboard")
     print("2. Corrija as categorias conforme necessário")
     print("3. Importe para o sistema de aprendizagem")
 
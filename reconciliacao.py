@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 RECONCILIAÇÃO RAW VS PROCESSADO
+Lê cada partição data/raw/<mes>_<ano>/ uma vez e, numa só passagem
+vetorizada, calcula por banco/mês o número de linhas, as somas de débito e
+crédito (em cêntimos) e uma soma de verificação independente da ordem
+(soma módulo 2**64 do hash de cada transação). Compara com o armazém
+Parquet e mostra só as partições que diferem
+
+Uso:
+    python3 reconciliacao.py
+    python3 reconciliacao.py --todas              # também as partições iguais
+    python3 reconciliacao.py --raiz data/raw --armazem data/processed/transacoes
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from adaptadores_bancos import descobrir_particoes
+from armazem_transacoes import RAIZ_ARMAZEM, ler_transacoes
+from identificadores import descricao_canonica
+
+COLUNAS_RECONCILIACAO = ['Date', 'Bank', 'Description', 'Debit', 'Credit']
+CHAVE = ['Bank', 'ano', 'mes']
+METRICAS = ['linhas', 'debito', 'credito', 'verificacao']
+
+
+def ler_raw(raiz='data/raw'):
+    """Todas as partições raw (só as colunas da reconciliação), cada ficheiro lido uma vez"""
+    tabelas = [
+        pd.read_csv(caminho, usecols=COLUNAS_RECONCILIACAO, dtype={'Date': str, 'Bank': str, 'Description': str},
+                    keep_default_na=False, encoding='utf-8')
+        for caminho, _ in descobrir_particoes(raiz)
+    ]
+    if not tabelas:
+        return pd.DataFrame(columns=COLUNAS_RECONCILIACAO)
+    return pd.concat(tabelas, ignore_index=True)
+
+
+def resumo_particoes(df):
+    """Linhas, débito, crédito (cêntimos) e soma de verificação por (Bank, ano, mes).
+
+    Datas e descrições são normalizadas como nos Ids (dia ISO, descrição
+    canónica) para que o raw e o armazém deem o mesmo hash à mesma
+    transação.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=METRICAS, index=pd.MultiIndex.from_tuples([], names=CHAVE))
+
+    datas = pd.to_datetime(df['Date'], format='mixed')
+    debito = np.round(pd.to_numeric(df['Debit']).to_numpy(dtype=float) * 100).astype(np.int64)
+    credito = np.round(pd.to_numeric(df['Credit']).to_numpy(dtype=float) * 100).astype(np.int64)
+    bancos = df['Bank'].astype(str)
+    hashes = pd.util.hash_pandas_object(pd.DataFrame({
+        'Date': datas.dt.strftime('%Y-%m-%d'),
+        'Bank': bancos,
+        'Description': descricao_canonica(df['Description']),
+        'Debit': debito,
+        'Credit': credito,
+    }), index=False).to_numpy()
+
+    chaves = pd.DataFrame({'Bank': bancos, 'ano': datas.dt.year, 'mes': datas.dt.month})
+    codigos, grupos = pd.MultiIndex.from_frame(chaves).factorize(sort=True)
+    ordem = np.argsort(codigos, kind='stable')
+    inicios = np.flatnonzero(np.r_[True, np.diff(codigos[ordem]) != 0])
+
+    # reduceat em uint64 soma módulo 2**64: a ordem das linhas não conta
+    return pd.DataFrame({
+        'linhas': np.diff(np.r_[inicios, len(ordem)]),
+        'debito': np.add.reduceat(debito[ordem], inicios),
+        'credito': np.add.reduceat(credito[ordem], inicios),
+        'verificacao': np.add.reduceat(hashes[ordem], inicios),
+    }, index=grupos)
+
+
+def reconciliar(raiz='data/raw', armazem=RAIZ_ARMAZEM):
+    """Resumo raw e processado lado a lado, com `igual` por partição (banco, ano, mês)"""
+    raw = resumo_particoes(ler_raw(raiz))
+    processado = resumo_particoes(ler_transacoes(COLUNAS_RECONCILIACAO, raiz=armazem, categoricas=False))
+    comparacao = raw.add_suffix('_raw').join(processado.add_suffix('_processado'), how='outer')
+    comparacao['igual'] = np.logical_and.reduce([
+        comparacao[f'{metrica}_raw'].eq(comparacao[f'{metrica}_processado']).to_numpy() for metrica in METRICAS
+    ])
+    return comparacao
+
+
+def _euros(centimos):
+    return f"{centimos / 100:.2f}€"
+
+
+def imprimir_reconciliacao(comparacao, todas=False):
+    diferentes = comparacao[~comparacao['igual']]
+    print(f"📊 {len(comparacao)} partições (banco, mês); {len(diferentes)} com diferenças")
+    for (banco, ano, mes), linha in (comparacao if todas else diferentes).iterrows():
+        marca = '✅' if linha['igual'] else '⚠️ '
+        print(f"\n{marca} {banco} {ano}-{mes:02d}")
+        for nome, metrica, formato in (('Linhas', 'linhas', str), ('Débito', 'debito', _euros),
+                                       ('Crédito', 'credito', _euros)):
+            raw, processado = linha[f'{metrica}_raw'], linha[f'{metrica}_processado']
+            valores = [formato(int(v)) if pd.notna(v) else '—' for v in (raw, processado)]
+            print(f"   {nome}: raw {valores[0]} | processado {valores[1]}")
+        if not linha['igual'] and linha['linhas_raw'] == linha['linhas_processado']:
+            print("   Mesmas contagens, transações diferentes (soma de verificação)")
+    if diferentes.empty:
+        print("✅ Raw e processado coincidem em todas as partições")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcilia as partições raw com o armazém processado")
+    parser.add_argument('--raiz', default='data/raw', help="Pasta das partições raw")
+    parser.add_argument('--armazem', default=RAIZ_ARMAZEM, help="Pasta do armazém Parquet")
+    parser.add_argument('--todas', action='store_true', help="Mostra também as partições iguais")
+    args = parser.parse_args()
+
+    imprimir_reconciliacao(reconciliar(args.raiz, args.armazem), args.todas)
+
+
+if __name__ == '__main__':
+    main()
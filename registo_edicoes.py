@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 REGISTO DE EDIÇÕES
+Registo só de acrescento (JSONL) das edições feitas no dashboard: cada
+gravação acrescenta uma linha com (Id, valores antes, valores depois,
+momento), em vez de regravar ficheiros. Desfazer/refazer também são
+linhas acrescentadas; o registo é reaplicado sobre partições recarregadas
+e esvaziado (compactado) quando as edições chegam ao armazém Parquet
+"""
+
+import json
+import os
+from datetime import datetime
+
+CAMINHO_REGISTO = 'data/processed/edicoes.jsonl'
+
+
+class RegistoEdicoes:
+    """Registo de edições com pilhas de desfazer/refazer.
+
+    Linhas do ficheiro:
+        {"seq": 1, "tipo": "edicao", "momento": ..., "alteracoes": [{"Id", "antes", "depois"}]}
+        {"seq": 2, "tipo": "desfazer", "momento": ..., "alvo": 1}
+        {"seq": 3, "tipo": "refazer", "momento": ..., "alvo": 1}
+
+    Uma edição nova esvazia a pilha de refazer, como num editor. Outro
+    processo pode esvaziar o ficheiro (descarregar_livro) ou acrescentar-lhe
+    linhas: antes de cada escrita, o registo é relido se o ficheiro já não
+    é o que foi lido/escrito por último (inode e tamanho), e um desfazer ou
+    refazer cujo alvo não está na pilha é ignorado ao ler.
+    """
+
+    def __init__(self, caminho=CAMINHO_REGISTO):
+        self.caminho = caminho
+        self._carregar()
+
+    def _assinatura(self, estado):
+        return (estado.st_dev, estado.st_ino, estado.st_size)
+
+    def _carregar(self):
+        self.edicoes = {}
+        self.desfazer_pilha = []
+        self.refazer_pilha = []
+        self.ultimo_seq = 0
+        self.linhas = 0
+        self._lido = None
+        if not os.path.exists(self.caminho):
+            return
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            self._lido = self._assinatura(os.fstat(f.fileno()))
+            for linha in f:
+                try:
+                    registo = json.loads(linha)
+                except json.JSONDecodeError:
+                    # Última linha cortada por uma escrita interrompida
+                    continue
+                self._aplicar_registo(registo)
+
+    def recarregar(self):
+        """Relê o registo se o ficheiro mudou desde a última leitura/escrita; devolve True se releu"""
+        try:
+            atual = self._assinatura(os.stat(self.caminho))
+        except FileNotFoundError:
+            atual = None
+        if atual == self._lido:
+            return False
+        self._carregar()
+        return True
+
+    def _aplicar_registo(self, registo):
+        self.ultimo_seq = max(self.ultimo_seq, registo['seq'])
+        self.linhas += 1
+        if registo['tipo'] == 'edicao':
+            self.edicoes[registo['seq']] = registo['alteracoes']
+            self.desfazer_pilha.append(registo['seq'])
+            self.refazer_pilha.clear()
+        elif registo['tipo'] == 'desfazer' and registo['alvo'] in self.desfazer_pilha:
+            self.desfazer_pilha.remove(registo['alvo'])
+            self.refazer_pilha.append(registo['alvo'])
+        elif registo['tipo'] == 'refazer' and registo['alvo'] in self.refazer_pilha:
+            self.refazer_pilha.remove(registo['alvo'])
+            self.desfazer_pilha.append(registo['alvo'])
+
+    def _acrescentar(self, registo):
+        registo = {'seq': self.ultimo_seq + 1, 'momento': datetime.now().isoformat(), **registo}
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registo, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+            self._lido = self._assinatura(os.fstat(f.fileno()))
+        self._aplicar_registo(registo)
+        return registo
+
+    def registar(self, alteracoes):
+        """Acrescenta uma edição [{'Id', 'antes', 'depois'}]; devolve o seq"""
+        self.recarregar()
+        return self._acrescentar({'tipo': 'edicao', 'alteracoes': alteracoes})['seq']
+
+    def desfazer(self):
+        """Acrescenta o desfazer da última edição ativa; devolve [(Id, valores)] a repor"""
+        self.recarregar()
+        if not self.desfazer_pilha:
+            return []
+        alvo = self.desfazer_pilha[-1]
+        self._acrescentar({'tipo': 'desfazer', 'alvo': alvo})
+        return [(alteracao['Id'], alteracao['antes']) for alteracao in reversed(self.edicoes[alvo])]
+
+    def refazer(self):
+        """Acrescenta o refazer da última edição desfeita; devolve [(Id, valores)] a aplicar"""
+        self.recarregar()
+        if not self.refazer_pilha:
+            return []
+        alvo = self.refazer_pilha[-1]
+        self._acrescentar({'tipo': 'refazer', 'alvo': alvo})
+        return [(alteracao['Id'], alteracao['depois']) for alteracao in self.edicoes[alvo]]
+
+    def estado_final(self):
+        """{Id: valores} resultante de todas as edições ativas, pela ordem em que foram feitas"""
+        estado = {}
+        for seq in sorted(self.desfazer_pilha):
+            for alteracao in self.edicoes[seq]:
+                estado.setdefault(alteracao['Id'], {}).update(alteracao['depois'])
+        return estado
+
+    def compactar(self):
+        """Esvazia o registo (as edições já estão no armazém)"""
+        if os.path.exists(self.caminho):
+            temporario = f"{self.caminho}.tmp"
+            open(temporario, 'w', encoding='utf-8').close()
+            os.replace(temporario, self.caminho)
+        self._carregar()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 RESUMO POR CATEGORIA
+Débito, crédito e saldo por (ano, mês, categoria, banco) num só groupby
+sobre as transações; as tabelas por mês (na ordem oficial das categorias
+do Excel) e os totais mensais saem desse agregado, sem voltar a filtrar
+as transações por categoria
+"""
+
+import pandas as pd
+
+from transferencias_internas import CATEGORIA_TRANSFERENCIA
+
+ORDEM_CATEGORIAS = [
+    'Casa - Renda Fontanelas',
+    'Casa - Renda Monte da Caparica',
+    'Casa - Supermercado Bilal',
+    'Casa - Supermercado Daniela',
+    'Casa - Luz',
+    'Casa - Internet (Net)',
+    'Casa - Limpeza',
+    'Casa - Outros',
+    'Pessoal Bilal - Comer fora',
+    'Pessoal Bilal - Vestuário/calçado',
+    'Pessoal Bilal - Férias/viagens/Passeios',
+    'Pessoal Bilal - Livros/Cinema/Concertos',
+    'Pessoal Bilal - Donativos/Quotas',
+    'Pessoal Bilal - Barbeiro',
+    'Pessoal Bilal - Presentes',
+    'Pessoal Bilal - Outros',
+    'Créditos/Seguros Bilal - Pessoal Millennium',
+    'Créditos/Seguros Bilal - Wizink',
+    'Créditos/Seguros Bilal - Seg vida',
+    'Créditos/Seguros Bilal - Cliente frequente',
+    'Créditos/Seguros Bilal - Despesas bancárias Bilal',
+    'Créditos/Seguros Bilal - Despesas Bancárias Bilal',
+    'Deslocações Bilal - Transportes',
+    'Deslocações Bilal - Via Verde',
+    'Deslocações Bilal - Carro',
+    'Deslocações Bilal - Combustível',
+    'Deslocações Bilal - Estacionamento',
+    'Deslocações Bilal - ACP',
+    'Saúde - Consultas Bilal',
+    'Saúde - Consultas Daniela',
+    'Saúde - Farmácia/Prod.Nat./Exames',
+    'Saúde - Pruvit',
+    'Saúde - Ginásio',
+    'Saúde - Lifewave',
+    'Noah - Pensão de Alimentos',
+    'Noah - Pensão de alimentos',
+    'Noah - Desporto',
+    'Noah - Consultas',
+    'Noah - Roupa',
+    'Noah - Outros',
+    'Despesas Profissionais Bilal - Mensalidades (Replit, GPT, etc.)',
+    'Despesas Profissionais Bilal - Mensalidade (Replit, GPT, etc.)',
+    'Despesas Profissionais Bilal - Formação Bilal',
+    'Despesas Profissionais Bilal - Seg. Social Bilal',
+    'Despesas Profissionais Bilal - Produtos (Lifewave/Pruvit, etc.)',
+    'Despesas Profissionais Bilal - Marketing digital',
+    'Despesas Profissionais Bilal - BNI',
+    'Receitas - Sessões Bilal',
+    'Receitas - Limpezas Espaços',
+    'Receitas - Workshop TMD',
+    'Receitas - Aulas Individuais',
+    'Receitas - Soluções IA',
+    'Receitas - Lifewave',
+    'Receitas - Pruvit',
+    'Receitas - Rendas Fontanelas',
+    'Receitas - Electricidade Fontanelas',
+    'Receitas - Renda Monte da Caparica',
+    'Despesas de Crédito',
+    'Pessoal Bilal - Transferências',
+    'Estorno/Devolução',
+    'Transferência Interna'
+]
+CHAVE_AGREGADO = ['Ano', 'Mes', 'Categoria', 'Bank']
+
+
+def agregar(df):
+    """Débito, crédito, saldo e nº de transações por (Ano, Mes, Categoria, Bank), numa passagem"""
+    datas = pd.to_datetime(df['Date'])
+    agregado = pd.DataFrame({
+        'Ano': datas.dt.year,
+        'Mes': datas.dt.month,
+        'Categoria': df['Categoria'].astype(str),
+        'Bank': df['Bank'].astype(str),
+        'Debit': df['Debit'].astype(float),
+        'Credit': df['Credit'].astype(float),
+    }).groupby(CHAVE_AGREGADO, sort=True).agg(
+        Debit=('Debit', 'sum'), Credit=('Credit', 'sum'), Transacoes=('Debit', 'size')
+    )
+    agregado['Saldo'] = agregado['Credit'] - agregado['Debit']
+    return agregado
+
+
+def _sem_transferencias(agregado, incluir_transferencias):
+    if incluir_transferencias:
+        return agregado
+    return agregado[agregado.index.get_level_values('Categoria') != CATEGORIA_TRANSFERENCIA]
+
+
+def resumo_mes(agregado, ano, mes, incluir_transferencias=True, ordem=ORDEM_CATEGORIAS):
+    """Categorias com movimentos em (ano, mes), na ordem oficial: Categoria, Debit, Credit, Saldo.
+
+    Categorias fora de `ordem` (ex.: 'Nao Categorizado') ficam de fora, como
+    no Excel.
+    """
+    agregado = _sem_transferencias(agregado, incluir_transferencias)
+    ano_mes = (agregado.index.get_level_values('Ano') == ano) & (agregado.index.get_level_values('Mes') == mes)
+    por_categoria = agregado[ano_mes].groupby(level='Categoria')[['Debit', 'Credit', 'Saldo', 'Transacoes']].sum()
+    resumo = por_categoria.reindex(ordem).dropna(subset=['Transacoes'])
+    return resumo[['Debit', 'Credit', 'Saldo']].rename_axis('Categoria').reset_index()
+
+
+def totais_mensais(agregado, incluir_transferencias=True, categorias=None):
+    """Débito, crédito e saldo por (Ano, Mes); `categorias` limita às categorias dadas"""
+    agregado = _sem_transferencias(agregado, incluir_transferencias)
+    if categorias is not None:
+        agregado = agregado[agregado.index.get_level_values('Categoria').isin(categorias)]
+    return agregado.groupby(level=['Ano', 'Mes'])[['Debit', 'Credit', 'Saldo']].sum()
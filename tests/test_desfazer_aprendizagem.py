@@ -0,0 +1,107 @@
+"""Desfazer uma validação no livro não pode deixar a escolha ativa na aprendizagem"""
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from aprendizagem_compilada import acrescentar_registos
+from livro_transacoes import LivroTransacoes, consultar_transacoes, descarregar_livro
+from motor_regras import CAMINHO_REGRAS
+from registo_edicoes import RegistoEdicoes
+from processar_novembro_dezembro_2025 import ProcessadorNovembroDezembro
+
+RAIZ_REPO = Path(__file__).resolve().parent.parent
+CAMINHO_RAW = 'data/raw/novembro_2025/millennium_novembro_2025.csv'
+DESCRICAO = 'IMPOSTO DO SELO'
+CATEGORIA = 'Casa - Luz'
+
+
+@pytest.fixture
+def pasta(tmp_path, monkeypatch):
+    shutil.copy(RAIZ_REPO / CAMINHO_REGRAS, tmp_path / CAMINHO_REGRAS)
+    monkeypatch.chdir(tmp_path)
+    Path(CAMINHO_RAW).parent.mkdir(parents=True)
+    pd.DataFrame({
+        'Date': ['2025-11-03', '2025-11-10', '2025-11-17', '2025-11-20'],
+        'Bank': 'Millennium',
+        'Description': [DESCRICAO, DESCRICAO, DESCRICAO, 'COMPRA 6340 LIDL MONTE CAPARICA'],
+        'Valor': [0.12, 0.30, 0.05, 45.5],
+        'Debit': [0.12, 0.30, 0.05, 45.5],
+        'Credit': 0.0,
+    }).to_csv(CAMINHO_RAW, index=False)
+    _processar(incremental=False)
+    return tmp_path
+
+
+def _processar(incremental):
+    processador = ProcessadorNovembroDezembro()
+    if incremental:
+        descarregar_livro()
+        processador.carregar_anteriores('data/processed/transacoes')
+    assert processador.processar_csv(CAMINHO_RAW, 'Millennium Novembro')
+    processador.consolidar_e_salvar('data/processed/transacoes', janela_transferencias=None)
+    return consultar_transacoes(raiz='data/processed/transacoes')
+
+
+def _validar_um(livro):
+    """O que o botão Guardar do dashboard faz: escolha na aprendizagem + edição no livro"""
+    linha = livro.consultar(descricoes=[DESCRICAO.lower()]).iloc[0]
+    acrescentar_registos([{
+        'registo': 'escolha',
+        'sessao': 'teste',
+        'transacao': {'descricao': DESCRICAO, 'tipo': 'debit'},
+        'escolha_utilizador': {'categoria': CATEGORIA},
+        'categoria_anterior': linha['Categoria'],
+    }])
+    livro.atualizar([(linha['Id'], {'Categoria': CATEGORIA, 'Observacao': 'Validado manualmente'})])
+
+
+def test_desfazer_e_reprocessar_nao_reaplica_escolha(pasta):
+    livro = LivroTransacoes(raiz='data/processed/transacoes')
+    livro.sincronizar()
+    _validar_um(livro)
+    livro.desfazer()
+    livro.fechar()
+
+    df = _processar(incremental=True)
+    assert not (df['Categoria'] == CATEGORIA).any()
+    assert not (df['Observacao'] == 'Classificado por aprendizagem').any()
+
+
+def test_refazer_volta_a_aplicar_escolha(pasta):
+    livro = LivroTransacoes(raiz='data/processed/transacoes')
+    livro.sincronizar()
+    _validar_um(livro)
+    livro.desfazer()
+    livro.refazer()
+    livro.fechar()
+
+    df = _processar(incremental=True)
+    selo = df[df['Description'] == DESCRICAO]
+    assert (selo['Categoria'] == CATEGORIA).all()
+    assert sorted(selo['Observacao']) == ['Classificado por aprendizagem'] * 2 + ['Validado manualmente']
+
+
+def test_desfazer_depois_de_descarregar_noutro_processo(pasta):
+    livro = LivroTransacoes(raiz='data/processed/transacoes')
+    livro.sincronizar()
+    _validar_um(livro)
+    descarregar_livro()  # atualizar_dados.py com o dashboard aberto
+
+    assert livro.desfazer() == []
+    livro.fechar()
+    assert RegistoEdicoes().linhas == 0
+
+    df = _processar(incremental=True)
+    assert (df[df['Description'] == DESCRICAO]['Categoria'] == CATEGORIA).all()
+
+
+def test_registo_ignora_desfazer_sem_alvo(tmp_path):
+    caminho = tmp_path / 'edicoes.jsonl'
+    caminho.write_text('{"seq": 1, "tipo": "desfazer", "momento": "", "alvo": 7}\n', encoding='utf-8')
+
+    registo = RegistoEdicoes(str(caminho))
+    assert registo.desfazer_pilha == [] and registo.refazer_pilha == []
+    assert registo.desfazer() == []
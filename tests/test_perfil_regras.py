@@ -0,0 +1,32 @@
+"""O perfil conta as regras mesmo com a cache persistente quente"""
+
+import numpy as np
+
+from motor_regras import MotorRegras
+
+REGRAS = {
+    'supermercado': {'categoria': 'Alimentação', 'tipo': 'debit', 'confianca': 0.8,
+                     'palavras_chave': ['lidl', 'continente'], 'valores_tipicos': [45.0]},
+    'salario': {'categoria': 'Salário', 'tipo': 'credit', 'confianca': 0.9, 'palavras_chave': ['salario']},
+}
+DESCRICOES = ['COMPRA LIDL', 'COMPRA CONTINENTE', 'SALARIO NOVEMBRO', 'CAFE']
+VALORES = np.array([45.5, 12.0, 1500.0, 1.2])
+CREDITOS = np.array([False, False, True, False])
+
+
+def test_perfil_ignora_cache_quente(tmp_path):
+    motor = MotorRegras(REGRAS, hash_regras='teste')
+    motor.usar_cache(str(tmp_path / 'cache.db'))
+    esperado = [motor.classificar(*linha) for linha in zip(DESCRICOES, VALORES, CREDITOS)]
+
+    perfil = motor.ativar_perfil()
+    assert [motor.classificar(*linha) for linha in zip(DESCRICOES, VALORES, CREDITOS)] == esperado
+    assert (perfil.transacoes, perfil.sem_regra, len(perfil.tracos)) == (4, 1, 4)
+    assert perfil.acertos == [2, 1] and perfil.vitorias == [2, 1] and perfil.bonus == [1, 0]
+    assert perfil.avaliacoes == [3, 1]
+
+    perfil_lote = motor.ativar_perfil()
+    categorias, confiancas = motor.classificar_lote(DESCRICOES, VALORES, CREDITOS)
+    assert list(zip(categorias, confiancas)) == esperado
+    for campo in ('transacoes', 'sem_regra', 'acertos', 'vitorias', 'bonus', 'avaliacoes'):
+        assert getattr(perfil_lote, campo) == getattr(perfil, campo)
@@ -0,0 +1,56 @@
+"""Uma exportação em falta não pode apagar do índice (nem da partição) as transações que já deu"""
+
+import csv
+import os
+
+import pytest
+
+from indice_impressoes import IndiceImpressoes
+from preparar_csvs_nov_dez import preparar_exportacoes
+
+CABECALHO = 'Tipo,Produto,Data de início,Data de Conclusão,Descrição,Montante,Comissão,Moeda,Estado,Saldo\n'
+PARTICAO = 'raw/dezembro_2025/revolut_dezembro_2025.csv'
+
+
+def _exportacao(caminho, linhas):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(CABECALHO)
+        for data, descricao, montante in linhas:
+            f.write(f'CARD_PAYMENT,Atual,{data} 10:00:00,{data},{descricao},{montante},0,EUR,CONCLUÍDA,0\n')
+
+
+def _descricoes():
+    with open(PARTICAO, newline='', encoding='utf-8') as f:
+        return sorted(linha['Description'] for linha in csv.DictReader(f))
+
+
+@pytest.fixture
+def indice(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _exportacao('a.csv', [('2025-12-01', 'Cafe A', '-2.50'), ('2025-12-02', 'Cafe B', '-3.50')])
+    _exportacao('b.csv', [('2025-12-03', 'Cafe C', '-1.20')])
+    with IndiceImpressoes('indice.db') as indice:
+        assert preparar_exportacoes([('revolut', 'a.csv')], 'raw', indice=indice)
+        yield indice
+
+
+def test_exportacao_em_falta_mantem_as_transacoes_retidas(indice):
+    os.rename('a.csv', 'a_antiga.csv')
+
+    assert not preparar_exportacoes([('revolut', 'a.csv'), ('revolut', 'b.csv')], 'raw', indice=indice)
+    assert _descricoes() == ['Cafe A', 'Cafe B', 'Cafe C']
+
+    # A partição volta a ser reescrita sem a exportação: as linhas de a.csv continuam no índice
+    assert preparar_exportacoes([('revolut', 'b.csv')], 'raw', indice=indice)
+    assert _descricoes() == ['Cafe A', 'Cafe B', 'Cafe C']
+
+
+def test_exportacao_invalida_a_meio_nao_trunca_a_particao(indice):
+    with open('a.csv', 'ab') as f:
+        f.write(b'CARD_PAYMENT,Atual,2025-12-04 10:00:00,2025-12-04,Cafe \xff,-1.00,0,EUR,CONCLU\xcdDA,0\n')
+
+    assert not preparar_exportacoes([('revolut', 'a.csv')], 'raw', indice=indice)
+    assert _descricoes() == ['Cafe A', 'Cafe B']
+
+    assert preparar_exportacoes([('revolut', 'b.csv')], 'raw', indice=indice)
+    assert _descricoes() == ['Cafe A', 'Cafe B', 'Cafe C']
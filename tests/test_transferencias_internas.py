@@ -0,0 +1,51 @@
+"""Emparelhamento de transferências internas: só linhas elegíveis são marcadas"""
+
+import pandas as pd
+
+from transferencias_internas import CATEGORIA_TRANSFERENCIA, marcar_transferencias
+
+
+def _transacoes():
+    return pd.DataFrame({
+        'Id': ['a', 'b', 'c', 'd'],
+        'Date': ['2025-11-13', '2025-11-13', '2025-11-03', '2025-11-03'],
+        'Bank': ['Revolut', 'Millennium', 'Revolut', 'Millennium'],
+        'Description': ['LifeWave', 'TRF. P/O OSCAR COSTA - CIRURGIA MAXILO FA CIAL',
+                        'To Bilal Machraa', 'Bilal Machraa'],
+        'Debit': [330.22, 0.0, 800.0, 0.0],
+        'Credit': [0.0, 330.22, 0.0, 800.0],
+        'Categoria': ['Saúde - Lifewave', 'Nao Categorizado', 'Nao Categorizado', 'Nao Categorizado'],
+        'Confianca': [0.98, 0.0, 0.0, 0.0],
+        'Observacao': ['Classificado automaticamente', 'Necessita revisão manual', '', ''],
+    })
+
+
+def test_classificacao_confiante_e_reportada_nao_sobrescrita():
+    df = _transacoes()
+    pares, conflitos = marcar_transferencias(df)
+
+    assert list(zip(pares['debito'], pares['credito'])) == [(2, 3)]
+    assert list(zip(conflitos['debito'], conflitos['credito'])) == [(0, 1)]
+    assert df['Categoria'].tolist() == ['Saúde - Lifewave', 'Nao Categorizado',
+                                        CATEGORIA_TRANSFERENCIA, CATEGORIA_TRANSFERENCIA]
+
+
+def test_validadas_manualmente_ficam_de_fora():
+    df = _transacoes()
+    df.loc[3, 'Observacao'] = 'Validado manualmente'
+    pares, conflitos = marcar_transferencias(df)
+
+    assert pares.empty
+    assert df.loc[3, 'Categoria'] == 'Nao Categorizado'
+
+
+def test_par_sem_sinal_de_transferencia_nao_e_marcado():
+    df = _transacoes()
+    df.loc[4] = ['e', '2025-11-21', 'Millennium', 'COMPRA 4521 RESTAURANTE O PATEO', 42.0, 0.0,
+                 'Nao Categorizado', 0.0, 'Necessita revisão manual']
+    df.loc[5] = ['f', '2025-11-22', 'Revolut', 'Payment from Joana Silva', 0.0, 42.0, '', 0.0, '']
+    pares, conflitos = marcar_transferencias(df)
+
+    assert list(zip(pares['debito'], pares['credito'])) == [(2, 3)]
+    assert not conflitos['debito'].isin([4]).any()
+    assert df.loc[4, 'Categoria'] == 'Nao Categorizado' and df.loc[5, 'Categoria'] == ''
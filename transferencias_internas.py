@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏺 TRANSFERÊNCIAS INTERNAS
+Emparelha um débito numa conta com um crédito do mesmo montante noutra conta
+(ex.: Millennium -> carregamento Revolut) dentro de uma janela de dias. Os
+créditos são ordenados por (montante, dia) e cada débito procura o seu
+intervalo com searchsorted (junção por fusão com janela, O(n log n)), sem
+comparar todos os pares. Os dois lados ficam 'Transferência Interna' com o
+mesmo identificador de ligação na Observacao
+
+Só entram linhas por classificar, já classificadas como transferência ou
+com cara de transferência (TRF, carregamento, nome próprio) sem uma
+classificação confiante, e pelo menos um lado de cada par tem de ter cara
+de transferência ou já ser transferência interna (um débito e um crédito
+quaisquer do mesmo montante, ex.: um jantar e o reembolso de um amigo,
+não chegam). Os pares em que um lado tem uma classificação
+confiante de outra categoria são só reportados, nunca sobrescritos
+
+Uso:
+    python3 transferencias_internas.py                # pares no livro/armazém
+    python3 transferencias_internas.py --janela 2 --csv pares.csv
+"""
+
+import argparse
+import hashlib
+import re
+
+import numpy as np
+import pandas as pd
+
+CATEGORIA_TRANSFERENCIA = 'Transferência Interna'
+CONFIANCA_TRANSFERENCIA = 0.95
+JANELA_DIAS = 3
+PREFIXO_LIGACAO = 'Transferência interna '
+CONFIANCA_SEGURA = 0.70
+PADRAO_TRANSFERENCIA = re.compile(
+    r'\bTRF\b|\bTRANSF|CARREGAMENTO|\bTOP[ -]?UP\b|^TO\s|BILAL MACHRAA', re.IGNORECASE
+)
+
+
+def _ligacao(id_debito, id_credito):
+    return 'TI-' + hashlib.sha1(f"{id_debito}|{id_credito}".encode('utf-8')).hexdigest()[:10]
+
+
+def emparelhar_transferencias(df, janela=JANELA_DIAS, elegiveis=None, ancoras=None):
+    """Pares (débito, crédito) de contas diferentes com o mesmo montante e datas a <= `janela` dias.
+
+    Devolve um DataFrame com os índices de `df` dos dois lados, a diferença
+    em dias e o identificador de ligação (a partir dos Ids, se houver).
+    Cada transação entra no máximo num par; cada débito, por ordem de
+    data, fica com o crédito livre mais próximo. `elegiveis` (máscara
+    booleana) limita as linhas consideradas; com `ancoras` (máscara), pelo
+    menos um lado de cada par tem de ser âncora.
+    """
+    colunas = ['debito', 'credito', 'dias', 'Ligacao']
+    elegiveis = np.ones(len(df), dtype=bool) if elegiveis is None else np.asarray(elegiveis, dtype=bool)
+    if df.empty:
+        return pd.DataFrame(columns=colunas)
+
+    dias = (pd.to_datetime(df['Date'], format='mixed').to_numpy().astype('datetime64[D]')
+            .astype(np.int64))
+    debitos = np.round(df['Debit'].to_numpy(dtype=float) * 100).astype(np.int64)
+    creditos = np.round(df['Credit'].to_numpy(dtype=float) * 100).astype(np.int64)
+    bancos = pd.factorize(df['Bank'].astype(str))[0]
+
+    # Chave única (cêntimos, dia): a janela de um débito é um intervalo contíguo
+    deslocamento = 1 << 20
+    dias = dias - dias.min()
+    lado_credito = np.flatnonzero(elegiveis & (creditos > 0))
+    chaves_credito = creditos[lado_credito] * deslocamento + dias[lado_credito]
+    ordem = np.argsort(chaves_credito, kind='stable')
+    lado_credito, chaves_credito = lado_credito[ordem], chaves_credito[ordem]
+
+    lado_debito = np.flatnonzero(elegiveis & (debitos > 0))
+    lado_debito = lado_debito[np.lexsort((dias[lado_debito], debitos[lado_debito]))]
+    chaves_debito = debitos[lado_debito] * deslocamento + dias[lado_debito]
+    inicios = np.searchsorted(chaves_credito, chaves_debito - janela, side='left')
+    fins = np.searchsorted(chaves_credito, chaves_debito + janela, side='right')
+
+    ancoras = np.ones(len(df), dtype=bool) if ancoras is None else np.asarray(ancoras, dtype=bool)
+    usados = np.zeros(len(lado_credito), dtype=bool)
+    pares = []
+    for debito, inicio, fim in zip(lado_debito.tolist(), inicios.tolist(), fins.tolist()):
+        melhor, distancia = -1, janela + 1
+        for posicao in range(inicio, fim):
+            credito = lado_credito[posicao]
+            if usados[posicao] or bancos[credito] == bancos[debito] or not (ancoras[debito] or ancoras[credito]):
+                continue
+            d = abs(int(dias[credito]) - int(dias[debito]))
+            if d < distancia:
+                melhor, distancia = posicao, d
+        if melhor >= 0:
+            usados[melhor] = True
+            pares.append((debito, int(lado_credito[melhor]), distancia))
+
+    if not pares:
+        return pd.DataFrame(columns=colunas)
+
+    posicoes = np.array(pares, dtype=np.int64)
+    ids = (df['Id'] if 'Id' in df.columns else pd.Series(df.index, index=df.index)).astype(str).to_numpy()
+    ligacoes = [_ligacao(ids[d], ids[c]) for d, c in posicoes[:, :2].tolist()]
+    return pd.DataFrame({
+        'debito': df.index[posicoes[:, 0]],
+        'credito': df.index[posicoes[:, 1]],
+        'dias': posicoes[:, 2],
+        'Ligacao': ligacoes,
+    })
+
+
+def _validadas(df):
+    return df['Observacao'].fillna('').astype(str).str.startswith('Validado manualmente').to_numpy()
+
+
+def _parece_transferencia(df):
+    return df['Description'].astype(str).str.contains(PADRAO_TRANSFERENCIA).to_numpy()
+
+
+def _ja_transferencia(df):
+    return (df['Categoria'].fillna('').astype(str) == CATEGORIA_TRANSFERENCIA).to_numpy()
+
+
+def sinais_transferencia(df):
+    """Máscara das linhas com cara de transferência ou já transferência interna (âncoras de um par)"""
+    return _parece_transferencia(df) | _ja_transferencia(df)
+
+
+def elegiveis_transferencia(df):
+    """Máscara das linhas que podem passar a transferência interna.
+
+    Por classificar, já transferência interna, ou com descrição de
+    transferência e confiança abaixo de CONFIANCA_SEGURA; nunca as
+    validadas manualmente.
+    """
+    sem_categoria = df['Categoria'].fillna('').astype(str).isin(['', 'Nao Categorizado']).to_numpy()
+    confiante = (pd.to_numeric(df['Confianca'], errors='coerce').fillna(0) >= CONFIANCA_SEGURA).to_numpy()
+    return ~_validadas(df) & (sem_categoria | _ja_transferencia(df) | (_parece_transferencia(df) & ~confiante))
+
+
+def pares_transferencias(df, janela=JANELA_DIAS):
+    """Pares a marcar: só linhas elegíveis, com pelo menos um lado com sinal de transferência"""
+    return emparelhar_transferencias(
+        df, janela, elegiveis=elegiveis_transferencia(df), ancoras=sinais_transferencia(df)
+    )
+
+
+def conflitos_transferencias(df, janela=JANELA_DIAS, pares=None):
+    """Pares com o mesmo montante e datas próximas em que um lado não é elegível (a rever, não marcados).
+
+    Como nos pares marcados, um dos lados tem de ter sinal de transferência.
+    As linhas de `pares` (já marcadas) e as validadas manualmente ficam de fora.
+    """
+    elegiveis = elegiveis_transferencia(df)
+    livres = ~_validadas(df)
+    if pares is not None and len(pares):
+        livres &= ~df.index.isin(np.concatenate([pares['debito'].to_numpy(), pares['credito'].to_numpy()]))
+    candidatos = emparelhar_transferencias(df, janela, elegiveis=livres, ancoras=sinais_transferencia(df))
+    if candidatos.empty:
+        return candidatos
+    posicoes = df.index.get_indexer
+    ambos = elegiveis[posicoes(candidatos['debito'])] & elegiveis[posicoes(candidatos['credito'])]
+    return candidatos[~ambos].reset_index(drop=True)
+
+
+def marcar_transferencias(df, janela=JANELA_DIAS):
+    """Classifica os pares elegíveis como transferência interna (altera `df`).
+
+    Devolve (pares marcados, pares em conflito), estes últimos com um lado
+    classificado com confiança noutra categoria e deixados como estão.
+    """
+    pares = pares_transferencias(df, janela)
+    conflitos = conflitos_transferencias(df, janela, pares)
+    if pares.empty:
+        return pares, conflitos
+
+    indices = np.concatenate([pares['debito'].to_numpy(), pares['credito'].to_numpy()])
+    ligacoes = np.concatenate([pares['Ligacao'].to_numpy(), pares['Ligacao'].to_numpy()])
+    df.loc[indices, 'Categoria'] = CATEGORIA_TRANSFERENCIA
+    df.loc[indices, 'Confianca'] = CONFIANCA_TRANSFERENCIA
+    df.loc[indices, 'Observacao'] = [PREFIXO_LIGACAO + ligacao for ligacao in ligacoes]
+    return pares, conflitos
+
+
+def _relatorio(df, pares):
+    lados = ['Date', 'Bank', 'Description', 'Categoria']
+    return pd.concat([
+        pares[['Ligacao', 'dias']].reset_index(drop=True),
+        df.loc[pares['debito'], lados + ['Debit']].add_prefix('debito_').reset_index(drop=True),
+        df.loc[pares['credito'], lados + ['Credit']].add_prefix('credito_').reset_index(drop=True),
+    ], axis=1)
+
+
+def _imprimir_pares(relatorio):
+    for linha in relatorio.itertuples(index=False):
+        print(f"  {linha.Ligacao}: {linha.debito_Debit:.2f}€  "
+              f"{linha.debito_Bank} {linha.debito_Date:%Y-%m-%d} '{linha.debito_Description}' "
+              f"[{linha.debito_Categoria}] -> "
+              f"{linha.credito_Bank} {linha.credito_Date:%Y-%m-%d} '{linha.credito_Description}' "
+              f"[{linha.credito_Categoria}]")
+
+
+def main():
+    from livro_transacoes import consultar_transacoes
+
+    parser = argparse.ArgumentParser(description="Emparelha transferências internas entre contas")
+    parser.add_argument('--janela', type=int, default=JANELA_DIAS, help="Dias máximos entre débito e crédito")
+    parser.add_argument('--csv', help="Grava os pares neste CSV")
+    args = parser.parse_args()
+
+    df = consultar_transacoes(['Id', 'Date', 'Bank', 'Description', 'Debit', 'Credit', 'Categoria',
+                               'Confianca', 'Observacao'])
+    pares = pares_transferencias(df, args.janela)
+    print(f"🔗 {len(pares)} transferências internas emparelhadas (janela de {args.janela} dias)")
+    relatorio = _relatorio(df, pares)
+    _imprimir_pares(relatorio)
+
+    conflitos = conflitos_transferencias(df, args.janela, pares)
+    if len(conflitos):
+        print(f"\n⚠️  {len(conflitos)} pares com um lado classificado noutra categoria (não marcados):")
+        _imprimir_pares(_relatorio(df, conflitos))
+    if args.csv:
+        relatorio.to_csv(args.csv, index=False, encoding='utf-8')
+        print(f"📄 Pares: {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
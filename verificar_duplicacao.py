@@ -1,13 +1,18 @@
+import os
+
 import pandas as pd
 from pathlib import Path
 
+from indice_impressoes import CAMINHO_INDICE, IndiceImpressoes, imprimir_relatorio
+from livro_transacoes import consultar_transacoes
+
 def verificar_duplicacao():
     print("="*80)
     print("VERIFICAR DUPLICAÇÃO DE DADOS")
     print("="*80)
     
-    processed_file = Path("/Users/bilal/Programaçao/financas pessoais/data/processed/novembro_dezembro_2025_classificado.csv")
-    df = pd.read_csv(processed_file)
+    # Sem Id/HashRegras: o Id distingue sempre linhas iguais
+    df = consultar_transacoes(['Date', 'Bank', 'Description', 'Valor', 'Debit', 'Credit', 'Categoria', 'Confianca', 'Observacao'])
     
     print(f"\n📊 TOTAL LINHAS PROCESSADO: {len(df)}")
     
@@ -60,5 +65,12 @@ def verificar_duplicacao():
     else:
         print("✅ NÃO há linhas com débito e crédito ambos = 0")
 
+    print("\n🔍 DUPLICADOS ENTRE EXPORTAÇÕES (QUARENTENA DA INGESTÃO):")
+    if os.path.exists(CAMINHO_INDICE):
+        with IndiceImpressoes(CAMINHO_INDICE) as indice:
+            imprimir_relatorio(indice.relatorio())
+    else:
+        print(f"ℹ️  Sem índice de impressões ({CAMINHO_INDICE}); corra preparar_csvs_nov_dez.py")
+
 if __name__ == "__main__":
     verificar_duplicacao()
@@ -1,8 +1,6 @@
-import pandas as pd
+from livro_transacoes import consultar_transacoes
 
-df = pd.read_csv('/Users/bilal/Programaçao/financas pessoais/data/processed/novembro_dezembro_2025_classificado.csv')
-
-df['Date'] = pd.to_datetime(df['Date'])
+df = consultar_transacoes(anos=[2025], meses=[11, 12])
 
 df_novembro = df[df['Date'].dt.month == 11]
 df_dezembro = df[df['Date'].dt.month == 12]
@@ -21,7 +19,7 @@ def analisar_receitas(df, mes):
     print("RECEITAS POR CATEGORIA")
     print(f"{'='*80}")
     
-    receitas_por_categoria = receitas.groupby('Categoria').agg({
+    receitas_por_categoria = receitas.groupby('Categoria', observed=True).agg({
         'Credit': 'sum',
         'Description': 'count'
     }).rename(columns={'Credit': 'Total', 'Description': 'Nº Transações'})